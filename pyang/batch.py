@@ -0,0 +1,411 @@
+"""Validation of all modules in a repository in one session"""
+
+import os
+import multiprocessing
+
+from . import error
+from . import statements
+from . import util
+from . import depgraph
+
+class ModuleResult(object):
+    """The result of validating one (sub)module"""
+
+    def __init__(self, node, module):
+        self.node = node
+        """the module's ModuleNode in the dependency graph"""
+        self.module = module
+        """the parsed and validated Statement"""
+        self.dependencies = []
+        """keys of the modules this module directly depends on"""
+        self.errors = []
+        """list of (pos, tag, args)"""
+        self.report = {}
+        """extra data about the module, e.g., added by plugins as members
+        for the module in the JSON report of --validate-repository; the
+        values must be serializable as JSON"""
+
+    @property
+    def name(self):
+        return self.node.name
+
+    @property
+    def revision(self):
+        return self.node.revision
+
+    @property
+    def ref(self):
+        return self.node.ref
+
+    def detach(self):
+        """Drop all references to statements, so that the result can be
+        sent to another process.  The error arguments are formatted as
+        strings, except numbers which may be formatted with %d."""
+        self.module = None
+        self.errors = detach_errors(self.errors)
+
+def detach_errors(errors):
+    """Return a copy of the list of (pos, tag, args) `errors` without
+    references to statements, as described in ModuleResult.detach()"""
+    res = []
+    for epos, etag, eargs in errors:
+        if isinstance(eargs, tuple):
+            eargs = tuple(_detach_arg(a) for a in eargs)
+        else:
+            eargs = _detach_arg(eargs)
+        res.append((_detach_pos(epos), etag, eargs))
+    return res
+
+def _detach_arg(arg):
+    if isinstance(arg, (str, int, float)):
+        return arg
+    return str(arg)
+
+def _detach_pos(pos):
+    new = error.Position(pos.ref)
+    new.line = pos.line
+    if pos.uses_pos is not None:
+        new.uses_pos = _detach_pos(pos.uses_pos)
+    return new
+
+def handle_filename(handle):
+    """Return the filename of `handle`, a FileRepository handle from
+    `Context.revs`"""
+    if handle[0] == 'parsed':
+        return handle[2]
+    return handle[1]
+
+def in_directories(handle, dirs):
+    """Return True if `handle`, a FileRepository handle from `Context.revs`,
+    refers to a file in one of the directories `dirs`, or in a
+    subdirectory."""
+    filename = os.path.abspath(handle_filename(handle))
+    for d in dirs:
+        d = os.path.join(os.path.abspath(d), '')
+        if filename.startswith(d):
+            return True
+    return False
+
+def _error_ref(pos):
+    # an error in a statement expanded from a grouping is reported
+    # for the module where the grouping is used
+    while pos.uses_pos is not None:
+        pos = pos.uses_pos
+    return pos.ref
+
+def validate_repository(ctx, select=None, jobs=1, post_validate=None):
+    """Parse and validate each module in the repository exactly once.
+
+    The modules are enumerated from `ctx.revs`.  If `select` is given,
+    only modules for which select(modulename, revision, handle) returns
+    True are validated; other modules are still used to resolve imports
+    and includes.
+
+    All selected modules are parsed first, then validated in dependency
+    order, so that a module shared by many modules is validated once.
+
+    If `jobs` is greater than 1, the modules are validated by that many
+    worker processes; see validate_parallel().
+
+    If `post_validate` is given, it is called as post_validate(ctx,
+    graph, results) in each process that validated modules, with the
+    results for those modules, while the results still refer to the
+    validated statements.  It can add errors to the results.
+
+    Returns (graph, results), where `graph` is the DependencyGraph of the
+    selected modules, and `results` is a list of ModuleResult, in
+    dependency order.
+    """
+    parallel = jobs > 1 and 'fork' in multiprocessing.get_all_start_methods()
+    graph, parsed, handles = parse_modules(ctx, select, header_only=parallel)
+    order = graph.topological_order()
+    if parallel:
+        return graph, validate_parallel(ctx, graph, parsed, handles, order,
+                                        jobs, post_validate)
+    validate_modules(ctx, graph, parsed, order)
+    # check the context as a whole, e.g., for duplicate namespaces
+    ctx.validate()
+    results = collect_results(ctx, graph, parsed, order)
+    if post_validate is not None:
+        post_validate(ctx, graph, results)
+    return graph, results
+
+def parse_modules(ctx, select=None, header_only=False):
+    """Parse the modules in the repository.
+
+    If `header_only` is True, YANG modules are parsed with
+    YangParser.parse_header(), which is enough to build the dependency
+    graph, and the modules are not added to the context.  Use
+    load_module() to parse such a module completely.
+
+    Returns (graph, parsed, handles), where `graph` is the
+    DependencyGraph of the parsed modules, `parsed` is a dict of
+    (modulename, revision):<class Statement>, and `handles` is a dict of
+    (modulename, revision):(modulename, revision, handle), where `handle`
+    can be given to load_module().
+    """
+    graph = depgraph.DependencyGraph()
+    parsed = {}
+    handles = {}
+    for modulename in sorted(ctx.revs):
+        revs = ctx.revs[modulename]
+        for i, (rev, handle) in enumerate(revs):
+            if handle is None:
+                continue
+            if select is not None and not select(modulename, rev, handle):
+                continue
+            if header_only:
+                handle = ctx._read_header(handle,
+                                          error.Position(modulename))
+                if handle is None:
+                    continue
+                module = handle[1]
+                revs[i] = (rev or util.get_latest_revision(module), handle)
+            else:
+                module = load_module(ctx, modulename, rev, handle)
+                if module is None:
+                    continue
+                if rev is None:
+                    # make sure that the module isn't parsed again just to
+                    # find its revision
+                    handle = ('parsed', module, module.pos.ref, None)
+                    revs[i] = (util.get_latest_revision(module), handle)
+            node = graph.add_module(module, module.pos.ref)
+            if node.key not in parsed:
+                parsed[node.key] = module
+                handles[node.key] = (modulename, rev, handle)
+    return graph, parsed, handles
+
+def dependency_graph(ctx, modules):
+    """Return the DependencyGraph of `modules` and of all modules they
+    depend on, directly or indirectly.
+
+    `modules` is a list of (sub)module Statements, which can be parsed
+    with Context.parse_header().  The modules they depend on are taken
+    from the context if they are loaded; otherwise they are found in
+    `ctx.revs`, and only their headers are parsed.  No modules are added
+    to the context.  A dependency which is not found is reported as an error,
+    and is not in the graph.
+    """
+    graph = depgraph.DependencyGraph()
+    queue = [graph.add_module(m, m.pos.ref) for m in modules]
+    searched = set()
+    while queue:
+        node = queue.pop(0)
+        for name, rev in node.imports + node.includes:
+            if (name, rev) in searched:
+                continue
+            searched.add((name, rev))
+            module = ctx.read_module_header(name, rev)
+            if module is None:
+                pos = error.Position(node.ref)
+                if rev is None:
+                    error.err_add(ctx.errors, pos, 'MODULE_NOT_FOUND', name)
+                else:
+                    error.err_add(ctx.errors, pos, 'MODULE_NOT_FOUND_REV',
+                                  (name, rev))
+                continue
+            key = (name, util.get_latest_revision(module))
+            if key not in graph.nodes:
+                queue.append(graph.add_module(module, module.pos.ref))
+    return graph
+
+def load_module(ctx, modulename, rev, handle):
+    """Parse the module `handle` from `ctx.revs` completely, and add it
+    to the context as a primary module.
+
+    Returns the module, or None on failure."""
+    if handle[0] == 'parsed' and handle[3] is None:
+        # already parsed by Context._ensure_revs()
+        module = ctx.add_parsed_module(handle[1])
+        if module is not None:
+            module.i_is_primary_module = True
+        return module
+    if handle[0] == 'parsed':
+        ref, text = handle[2], handle[3]
+        if getattr(handle[1], 'is_header_only', False):
+            in_format = 'yang'
+        else:
+            # a YIN module, only the header is parsed
+            in_format = 'yin'
+    else:
+        try:
+            ref, in_format, text = ctx._read_from_handle(handle)
+        except ctx.repository.ReadError as ex:
+            error.err_add(ctx.errors, error.Position(modulename),
+                          'READ_ERROR', str(ex))
+            return None
+    return ctx.add_module(ref, text, in_format, modulename, rev,
+                          expect_failure_error=False, primary_module=True)
+
+def validate_modules(ctx, graph, parsed, keys):
+    """Validate the modules `keys`, which are in dependency order"""
+    for key in keys:
+        node = graph.nodes[key]
+        if (node.keyword == 'submodule' and
+            graph.resolve(node.belongs_to) is not None):
+            # validated as a part of the module it belongs to
+            continue
+        statements.validate_module(ctx, parsed[key])
+    # validate submodules that are not included by any module
+    for key in keys:
+        module = parsed[key]
+        if module.keyword == 'submodule' and not module.i_is_validated:
+            statements.validate_module(ctx, module)
+
+def collect_results(ctx, graph, parsed, keys, errors=None):
+    """Return a list of ModuleResult for the modules `keys`.
+
+    Each error in `errors` (default `ctx.errors`) is added to the
+    result of the module it was reported in."""
+    if errors is None:
+        errors = ctx.errors
+    results = []
+    refs = {}
+    for key in keys:
+        res = ModuleResult(graph.nodes[key], parsed[key])
+        res.dependencies = graph.dependencies(key)
+        results.append(res)
+        refs[res.ref] = res
+    for epos, etag, eargs in errors:
+        res = refs.get(_error_ref(epos))
+        if res is not None:
+            res.errors.append((epos, etag, eargs))
+    for res in results:
+        res.errors.sort(key=lambda e: e[0].line)
+    return results
+
+def partition(graph, order, n):
+    """Split the modules in `graph` into `n` lists for validation in
+    parallel.
+
+    Validating a module means validating all modules it depends on,
+    directly or indirectly, in the same context.  Each module is put in
+    the list where this adds the least work, counted in modules, while
+    keeping the lists balanced.  Submodules are put in the same list as
+    the module they belong to.
+
+    `order` is the topological order of the graph.  Each returned list
+    is in this order.
+    """
+    closures = {}
+    for key in order:
+        closure = set([key])
+        for dep in graph.dependencies(key):
+            closure |= closures[dep]
+        closures[key] = closure
+
+    loaded = [set() for _i in range(n)]
+    load = [0] * n
+    assigned = {}
+    # start with the modules that depend on the most modules
+    for key in reversed(order):
+        node = graph.nodes[key]
+        owner = None
+        if node.keyword == 'submodule':
+            owner = assigned.get(graph.resolve(node.belongs_to))
+        if owner is None:
+            costs = [len(closures[key] - loaded[i]) for i in range(n)]
+            owner = min(range(n), key=lambda i: (load[i] + costs[i], i))
+            load[owner] += costs[owner]
+            loaded[owner] |= closures[key]
+        assigned[key] = owner
+    parts = [[] for _i in range(n)]
+    for key in order:
+        parts[assigned[key]].append(key)
+    return [part for part in parts if part]
+
+# set in the parent process before the worker processes are forked
+_worker_state = None
+
+def _validate_worker(keys):
+    ctx, graph, parsed, handles, post_validate = _worker_state
+    nerrors = len(ctx.errors)
+    for key in keys:
+        module = load_module(ctx, *handles[key])
+        if module is not None:
+            parsed[key] = module
+    validate_modules(ctx, graph, parsed, keys)
+    results = collect_results(ctx, graph, parsed, keys)
+    if post_validate is not None:
+        post_validate(ctx, graph, results)
+    for res in results:
+        res.detach()
+    # errors in the modules of other workers, which may be reported only
+    # while validating the modules which depend on them, e.g., an error
+    # in a leafref path in a grouping, found when the grouping is used
+    keyset = set(keys)
+    other_refs = set(node.ref for key, node in graph.nodes.items()
+                     if key not in keyset)
+    other_errors = [e for e in ctx.errors[nerrors:]
+                    if _error_ref(e[0]) in other_refs]
+    return results, detach_errors(other_errors)
+
+def validate_parallel(ctx, graph, parsed, handles, order, jobs,
+                      post_validate=None):
+    """Validate the modules in `jobs` worker processes.
+
+    `parsed` and `handles` are from parse_modules(), where only the
+    headers of the modules may have been parsed.
+
+    The modules are split with partition(), and each worker parses and
+    validates its modules in a copy of `ctx`, inherited from this
+    process.  The workers send back the results with all references to
+    statements removed.
+
+    Validated modules are not sent between the processes since they
+    refer to other modules in their context, and to compiled patterns,
+    which cannot be serialized.  Instead, a module which many modules
+    depend on is validated at most once in each worker.
+
+    An error in a module which is reported while validating a module
+    in another worker is merged into the result of the module it was
+    reported in, unless that module's worker also reported it.
+
+    `post_validate` is called in the workers, as described in
+    validate_repository().
+
+    Returns a list of detached ModuleResult, in the order `order`.
+    """
+    global _worker_state
+    nerrors = len(ctx.errors)
+    _worker_state = (ctx, graph, parsed, handles, post_validate)
+    try:
+        mp = multiprocessing.get_context('fork')
+        with mp.Pool(jobs) as pool:
+            partial_results = pool.map(_validate_worker,
+                                       partition(graph, order, jobs), 1)
+    finally:
+        _worker_state = None
+    byref = {}
+    for results, _other_errors in partial_results:
+        for res in results:
+            byref[res.ref] = res
+    for _results, other_errors in partial_results:
+        _merge_errors(byref, other_errors)
+    # add errors reported by checks of the context as a whole; the
+    # headers are enough for these checks
+    for key in order:
+        ctx.add_parsed_module(parsed[key])
+    ctx.check_namespaces()
+    _merge_errors(byref, detach_errors(ctx.errors[nerrors:]))
+    return [byref[graph.nodes[key].ref] for key in order]
+
+def _merge_errors(byref, errors):
+    # add the detached `errors` to the results in `byref` of the modules
+    # they were reported in, except errors already in the results
+    seen = {}
+    for epos, etag, eargs in errors:
+        res = byref.get(_error_ref(epos))
+        if res is None:
+            continue
+        keys = seen.get(res.ref)
+        if keys is None:
+            keys = set((p.label(), t, a) for p, t, a in res.errors)
+            seen[res.ref] = keys
+        key = (epos.label(), etag, eargs)
+        if key not in keys:
+            keys.add(key)
+            res.errors.append((epos, etag, eargs))
+    for ref in seen:
+        byref[ref].errors.sort(key=lambda e: e[0].line)
@@ -25,7 +25,10 @@ class Context(object):
 
         self.strict = False
         self.repository = repository
-        self.errors = []
+        self.errors = error.ErrorList()
+        self.error_filter = None
+        """function (pos, tag) -> bool, called when an error is added;
+        the error is dropped if it returns False.  See set_error_filter()"""
         self.canonical = False
         self.verify_revision_history = False
         self.max_line_len = None
@@ -39,6 +42,9 @@ class Context(object):
         self.max_status = None
         self.keep_comments = False
         self.keep_arg_substrings = False
+        self.instance_schemas = {}
+        """dict of tuple of (modulename,revision):<class instance.Schema>
+        see instance.compile_schema()"""
 
         for mod, rev, handle in self.repository.get_modules_and_revisions(self):
             if mod not in self.revs:
@@ -49,7 +55,8 @@ class Context(object):
     def internal_reset(self):
         self.modules = {}
         self.revs = {}
-        self.errors = []
+        self.instance_schemas = {}
+        self.errors = error.ErrorList(filter=self.error_filter)
         for mod, rev, handle in self.repository.get_modules_and_revisions(
                 self):
             if mod not in self.revs:
@@ -57,6 +64,17 @@ class Context(object):
             revs = self.revs[mod]
             revs.append((rev, handle))
 
+    def set_error_filter(self, error_filter):
+        """Set a function which decides which errors to keep.
+
+        `error_filter` is called as error_filter(pos, tag) for each error
+        added to `errors` from now on, and the error is dropped if it
+        returns False.  Use this for errors that will never be reported,
+        e.g., ignored error codes, so that they are not kept at all.
+        """
+        self.error_filter = error_filter
+        self.errors.filter = error_filter
+
     def add_module(self, ref, text, in_format=None,
                    expect_modulename=None, expect_revision=None,
                    expect_failure_error=True,
@@ -65,20 +83,13 @@ class Context(object):
 
         `ref` is a string which is used to identify the source of
               the text for the user.  used in error messages
-        `text` is the raw text data
+        `text` is the raw text data, or a binary file with a YIN module,
+              which is read in chunks and closed
         `in_format` is one of 'yang' or 'yin'.
 
         Returns the parsed and validated module on success, and None on error.
         """
-        if in_format is None:
-            in_format = util.guess_format(text)
-
-        if in_format == 'yin':
-            p = yin_parser.YinParser()
-        else:
-            p = yang_parser.YangParser()
-
-        module = p.parse(self, ref, text)
+        module = self._parse_text(ref, text, in_format)
         if module is None:
             return None
 
@@ -118,6 +129,30 @@ class Context(object):
 
         return self.add_parsed_module(module)
 
+    def _read_from_handle(self, handle):
+        # like Repository.get_module_from_handle(), but a YIN module is
+        # returned as a binary file if the repository can open it, see
+        # Repository.open_module_from_handle()
+        res = self.repository.open_module_from_handle(handle)
+        if res is None:
+            return self.repository.get_module_from_handle(handle)
+        ref, fd = res
+        return ref, 'yin', fd
+
+    def _parse_text(self, ref, text, in_format, extra=None):
+        # parse `text` from _read_from_handle(); a binary file is
+        # closed when it has been parsed
+        if not isinstance(text, str):
+            with text:
+                return yin_parser.YinParser(extra).parse_file(self, ref, text)
+        if in_format is None:
+            in_format = util.guess_format(text)
+        if in_format == 'yin':
+            p = yin_parser.YinParser(extra)
+        else:
+            p = yang_parser.YangParser(extra)
+        return p.parse(self, ref, text)
+
     def add_parsed_module(self, module):
         if module is None:
             return None
@@ -169,35 +204,95 @@ class Context(object):
     def _ensure_revs(self, revs):
         i = 0
         length = len(revs)
-        repository = self.repository
         while i < length:
             rev, handle = revs[i]
             if rev is None:
-                # now we must read the revision from the module
-                try:
-                    ref, in_format, text = repository.get_module_from_handle(
-                        handle)
-                except repository.ReadError as ex:
-                    i += 1
-                    continue
-
-                if in_format is None:
-                    in_format = util.guess_format(text)
-
-                if in_format == 'yin':
-                    yintext = text
-                    p = yin_parser.YinParser(
-                        {'no_include': True, 'no_extensions': True})
-                else:
-                    yintext = None
-                    p = yang_parser.YangParser()
-
-                module = p.parse(self, ref, text)
-                if module is not None:
-                    rev = util.get_latest_revision(module)
-                    revs[i] = (rev, ('parsed', module, ref, yintext))
+                # now we must read the revision from the module; only
+                # the revisions are needed here, the module is parsed
+                # again if it is used
+                parsed = self._read_header(handle)
+                if parsed is not None:
+                    rev = util.get_latest_revision(parsed[1])
+                    revs[i] = (rev, parsed)
             i += 1
 
+    def parse_header(self, ref, text, in_format=None):
+        """Parse enough of the (sub)module in `text` to know its name,
+        revisions, imports and includes.
+
+        The module is not added to the context.  Returns the Statement, or
+        None on failure."""
+        if in_format is None:
+            in_format = util.guess_format(text)
+        if in_format == 'yin':
+            p = yin_parser.YinParser(
+                {'no_include': True, 'no_extensions': True})
+        else:
+            p = yang_parser.YangParser({'header_only': True})
+        return p.parse(self, ref, text)
+
+    def _read_header(self, handle, pos=None):
+        # read the (sub)module `handle` from the repository, parse its
+        # header, and return a 'parsed' handle.  the text is kept unless
+        # the complete module was parsed.  a read error is reported at
+        # `pos` if it is given.
+        if handle[0] == 'parsed':
+            return handle
+        try:
+            ref, in_format, text = self.repository.get_module_from_handle(
+                handle)
+        except self.repository.ReadError as ex:
+            if pos is not None:
+                error.err_add(self.errors, pos, 'READ_ERROR', str(ex))
+            return None
+        if in_format is None:
+            in_format = util.guess_format(text)
+        module = self.parse_header(ref, text, in_format)
+        if module is None:
+            return None
+        if in_format != 'yin' and not getattr(module, 'is_header_only', False):
+            text = None
+        return ('parsed', module, ref, text)
+
+    def read_module_header(self, modulename, revision=None):
+        """Returns the (sub)module `modulename` with at least its header
+        statements, or None if it is not found
+
+        The module in the context is returned if there is one.
+        Otherwise the module is read from the repository, and only the
+        header of a YANG module is parsed, see YangParser.parse_header().
+        Such a module is not added to the context, but it is kept so
+        that it is not read again.
+
+        If `revision` is None, the latest revision is returned, or any
+        revision if none of them has a revision statement."""
+
+        module = self.get_module(modulename, revision)
+        if module is not None:
+            return module
+        revs = self.revs.get(modulename)
+        if not revs:
+            return None
+        if revision is None:
+            (revision, handle) = self._get_latest_rev(revs)
+            if handle is None:
+                # no revision statement in any of them
+                (revision, handle) = revs[0]
+        else:
+            self._ensure_revs(revs)
+            x = util.keysearch(revision, 0, revs)
+            handle = None if x is None else x[1]
+        if handle is None:
+            return None
+        if handle[0] != 'parsed':
+            parsed = self._read_header(handle, error.Position(modulename))
+            if parsed is None:
+                return None
+            self._set_parsed(modulename, handle, parsed[1], parsed[2],
+                             parsed[3])
+            handle = parsed
+        return handle[1]
+
     def search_module(self, pos, modulename, revision=None,
                       primary_module=False):
         """Searches for a module named `modulename` in the repository
@@ -243,24 +338,29 @@ class Context(object):
         elif handle[0] == 'parsed':
             module = handle[1]
             ref = handle[2]
-            yintext = handle[3]
+            text = handle[3]
             if modulename != module.arg:
                 error.err_add(self.errors, module.pos, 'BAD_MODULE_NAME',
                               (module.arg, ref, modulename))
                 module = None
-            elif yintext is None:
+            elif text is None:
                 module = self.add_parsed_module(handle[1])
+            elif getattr(module, 'is_header_only', False):
+                # the revision was read from the module
+                module = self.add_module(ref, text, 'yang', modulename,
+                                         None, True, primary_module)
+                self._set_parsed(modulename, handle, module, ref)
             else:
                 p = yin_parser.YinParser()
                 self.yin_module_map[module.arg] = []
-                module = p.parse(self, ref, yintext)
+                module = p.parse(self, ref, text)
                 if module is not None:
                     module = self.add_parsed_module(module)
+                    self._set_parsed(modulename, handle, module, ref)
         else:
             # get it from the repo
             try:
-                ref, in_format, text = self.repository.get_module_from_handle(
-                    handle)
+                ref, in_format, text = self._read_from_handle(handle)
                 module = self.add_module(
                     ref, text, in_format, modulename, revision,
                     True, primary_module)
@@ -287,7 +387,9 @@ class Context(object):
     def read_module(self, modulename, revision=None, extra=None):
         """Searches for a module named `modulename` in the repository
 
-        The module is just read, and not compiled at all.
+        The module is just read, and not compiled at all.  If `extra`
+        contains 'header_only', a YANG module may be returned with only
+        its header statements; see YangParser.parse_header().
         Returns the module if found, and None otherwise"""
 
         if modulename not in self.revs:
@@ -318,24 +420,43 @@ class Context(object):
 
         if handle[0] == 'parsed':
             module = handle[1]
-            return module
+            if (not getattr(module, 'is_header_only', False) or
+                (extra is not None and 'header_only' in extra)):
+                return module
+            ref, text = handle[2], handle[3]
         else:
             # get it from the repos
             try:
-                ref, in_format, text = self.repository.get_module_from_handle(
-                    handle)
-
-                if in_format is None:
-                    in_format = util.guess_format(text)
-
-                if in_format == 'yin':
-                    p = yin_parser.YinParser(extra)
-                else:
-                    p = yang_parser.YangParser(extra)
-
-                return p.parse(self, ref, text)
+                ref, in_format, text = self._read_from_handle(handle)
             except self.repository.ReadError as ex:
                 return None
+            if in_format is None:
+                in_format = util.guess_format(text)
+            if in_format == 'yin':
+                # parsed as requested by `extra`, and not kept
+                return self._parse_text(ref, text, in_format, extra)
+        module = yang_parser.YangParser(extra).parse(self, ref, text)
+        if module is not None:
+            if getattr(module, 'is_header_only', False):
+                self._set_parsed(modulename, handle, module, ref, text)
+            else:
+                self._set_parsed(modulename, handle, module, ref)
+        return module
+
+    def _set_parsed(self, modulename, handle, module, ref, text=None):
+        # replace `handle` in `revs` with a 'parsed' handle for `module`,
+        # so that it is not parsed again.  `text` is kept if only the
+        # header of the module is parsed.  a module which does not match
+        # its name and revision in `revs` is not kept, so that the error
+        # is reported by search_module().
+        if module is None or module.arg != modulename:
+            return
+        revs = self.revs[modulename]
+        for i, (rev, h) in enumerate(revs):
+            if h is handle:
+                if rev == util.get_latest_revision(module):
+                    revs[i] = (rev, ('parsed', module, ref, text))
+                return
 
     def validate(self):
         modules = []
@@ -347,7 +468,10 @@ class Context(object):
             # may add new modules by import
             statements.validate_module(self, m)
 
-        # check for duplicate namespaces across all loaded modules
+        self.check_namespaces()
+
+    def check_namespaces(self):
+        """Check for duplicate namespaces across all loaded modules"""
         uri_map = {}
         for k in self.modules:
             m = self.modules[k]
@@ -0,0 +1,220 @@
+"""A graph of modules and their import and include dependencies"""
+
+from . import util
+
+class ModuleNode(object):
+    """A (sub)module in a DependencyGraph"""
+
+    def __init__(self, name, revision, keyword='module', belongs_to=None,
+                 ref=None):
+        self.name = name
+        self.revision = revision
+        self.keyword = keyword
+        self.belongs_to = belongs_to
+        """for a submodule, the name of the module it belongs to"""
+        self.ref = ref
+        """identifies the source of the module, e.g., a filename"""
+        self.imports = []
+        """list of (modulename, revision-date | None)"""
+        self.includes = []
+        """list of (submodulename, revision-date | None)"""
+
+    @property
+    def key(self):
+        return (self.name, self.revision)
+
+    def __str__(self):
+        return '%s@%s' % (self.name, self.revision)
+
+class DependencyGraph(object):
+    """A graph of modules, with an edge from each (sub)module to the
+    modules it imports and the submodules it includes.
+
+    Nodes are keyed by (modulename, revision).  An import or include
+    without revision-date refers to the latest revision in the graph.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        """dict of (modulename, revision):<class ModuleNode>"""
+        self._revisions = {}
+        """dict of modulename:[revision]"""
+        self._dependents = None
+        """dict of key:[key], built when needed"""
+        self._dependencies = {}
+        """dict of (key, imports, includes):[key], see dependencies()"""
+
+    def add_node(self, node):
+        """Add `node` to the graph.
+
+        Returns the node in the graph, which is another node if a node
+        with the same name and revision is already present."""
+        other = self.nodes.get(node.key)
+        if other is not None:
+            return other
+        self.nodes[node.key] = node
+        self._revisions.setdefault(node.name, []).append(node.revision)
+        self._dependents = None
+        self._dependencies = {}
+        return node
+
+    def add_module(self, module, ref=None):
+        """Add a node for `module`, a parsed (sub)module Statement"""
+        node = ModuleNode(module.arg, util.get_latest_revision(module),
+                          module.keyword, ref=ref)
+        if module.keyword == 'submodule':
+            b = module.search_one('belongs-to')
+            if b is not None:
+                node.belongs_to = b.arg
+        for keyword, deps in (('import', node.imports),
+                              ('include', node.includes)):
+            for s in module.search(keyword):
+                r = s.search_one('revision-date')
+                deps.append((s.arg, r.arg if r is not None else None))
+        return self.add_node(node)
+
+    def resolve(self, name, revision=None):
+        """Return the key of the node `name`, or None if not found.
+
+        If `revision` is None, the latest revision is used."""
+        revs = self._revisions.get(name)
+        if not revs:
+            return None
+        if revision is None:
+            dated = [r for r in revs if r != 'unknown']
+            revision = max(dated) if dated else revs[0]
+        elif revision not in revs:
+            return None
+        return (name, revision)
+
+    def dependencies(self, key, imports=True, includes=True):
+        """Return the keys of the nodes that `key` directly depends on.
+
+        Dependencies that are not found in the graph are skipped."""
+        res = self._dependencies.get((key, imports, includes))
+        if res is None:
+            node = self.nodes[key]
+            res = []
+            deps = []
+            if imports:
+                deps.extend(node.imports)
+            if includes:
+                deps.extend(node.includes)
+            for name, rev in deps:
+                dep = self.resolve(name, rev)
+                if dep is not None and dep != key and dep not in res:
+                    res.append(dep)
+            self._dependencies[(key, imports, includes)] = res
+        return list(res)
+
+    def dependents(self, key):
+        """Return the keys of the nodes that directly depend on `key`,
+        in name order."""
+        if self._dependents is None:
+            dependents = dict((k, []) for k in self.nodes)
+            for k in sorted(self.nodes):
+                for dep in self.dependencies(k):
+                    dependents[dep].append(k)
+            self._dependents = dependents
+        return self._dependents[key]
+
+    def closure(self, keys, dependencies=None):
+        """Return the keys of the nodes that `keys` depend on, directly
+        or indirectly.
+
+        `dependencies` is a function that returns the keys a key
+        directly depends on, by default dependencies().  The keys are
+        returned in the order they are found: first the direct
+        dependencies of a node, then the dependencies of each of them.
+        Each node is visited once, so this is linear in the size of the
+        graph.  The nodes `keys` are not included, even if they are part
+        of a cycle.
+        """
+        if dependencies is None:
+            dependencies = self.dependencies
+        res = []
+        seen = set(keys)
+        def expand(key):
+            new = []
+            for dep in dependencies(key):
+                if dep not in seen:
+                    seen.add(dep)
+                    new.append(dep)
+            res.extend(new)
+            return iter(new)
+        for key in keys:
+            stack = [expand(key)]
+            while stack:
+                dep = next(stack[-1], None)
+                if dep is None:
+                    stack.pop()
+                else:
+                    stack.append(expand(dep))
+        return res
+
+    def reverse_closure(self, keys):
+        """Return the keys of the nodes that depend on `keys`, directly or
+        indirectly, in the order they are found."""
+        return self.closure(keys, self.dependents)
+
+    def closures(self, dependencies=None, reverse=False):
+        """Return a dict of key:[key] with the closure of each node.
+
+        This is faster than calling closure() for each node, since the
+        closure of a node is computed from the closures of its direct
+        dependencies, in topological order.  Each closure has the direct
+        dependencies first, then the closure of each of them.
+
+        If `reverse` is True, the closures of dependents(), i.e., what
+        reverse_closure() returns for each node, are computed instead,
+        and `dependencies` is not used.
+        """
+        order = self.topological_order()
+        if reverse:
+            dependencies = self.dependents
+            order.reverse()
+        elif dependencies is None:
+            dependencies = self.dependencies
+        res = {}
+        for key in order:
+            deps = dependencies(key)
+            if all(dep in res for dep in deps):
+                closure = dict.fromkeys(deps)
+                for dep in deps:
+                    closure.update(dict.fromkeys(res[dep]))
+                closure.pop(key, None)
+                res[key] = list(closure)
+            else:
+                # part of a cycle
+                res[key] = self.closure([key], dependencies)
+        return res
+
+    def topological_order(self):
+        """Return all keys, each one after the keys it depends on.
+
+        Nodes that are part of a dependency cycle are added last, in
+        name order.  Otherwise, independent nodes are in name order.
+        """
+        deps = {}
+        dependents = {}
+        for key in self.nodes:
+            deps[key] = set(self.dependencies(key))
+            dependents.setdefault(key, [])
+            for dep in deps[key]:
+                dependents.setdefault(dep, []).append(key)
+        ready = sorted(key for key in deps if not deps[key])
+        res = []
+        while ready:
+            # process one "generation" at a time, in a stable order
+            res.extend(ready)
+            next_ready = []
+            for key in ready:
+                for dependent in dependents[key]:
+                    deps[dependent].discard(key)
+                    if not deps[dependent]:
+                        next_ready.append(dependent)
+            ready = sorted(next_ready)
+        if len(res) < len(self.nodes):
+            done = set(res)
+            res.extend(sorted(key for key in self.nodes if key not in done))
+        return res
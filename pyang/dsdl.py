@@ -0,0 +1,212 @@
+"""In-process generation of DSDL schemas and validation of instances
+
+This module does what the yang2dsdl script does with xsltproc and
+xmllint, but with lxml in the current process.  The XSLT stylesheets
+are parsed and compiled once, and reused for all schemas and instance
+documents; the stylesheets compiled from the Schematron and DSRL
+schemas of a Schemas object are reused for all its instance documents.
+
+Example:
+
+    schemas = dsdl.Schemas.from_modules(ctx, modules, target='config')
+    schemas.write('.')
+    for msg in schemas.validate('config.xml'):
+        print(msg)
+"""
+
+import copy
+import os
+import sys
+
+from lxml import etree
+
+import pyang
+from .translators import dsdl
+
+targets = ('data', 'config', 'get-reply', 'get-data-reply',
+           'get-config-reply', 'edit-config', 'rpc', 'rpc-reply',
+           'notification')
+
+rng_ns = 'http://relaxng.org/ns/structure/1.0'
+svrl_ns = 'http://purl.oclc.org/dsdl/svrl'
+
+def _share_dir(envvar, name):
+    d = os.environ.get(envvar)
+    if d is not None:
+        return d
+    # a source tree, as in yang2dsdl
+    prefix = os.path.dirname(os.path.dirname(os.path.abspath(pyang.__file__)))
+    if (os.path.isdir(os.path.join(prefix, '.git')) and
+        os.path.isfile(os.path.join(prefix, 'setup.py'))):
+        return os.path.join(prefix, name)
+    for prefix in (sys.prefix, '/usr/local', '/usr'):
+        d = os.path.join(prefix, 'share', 'yang', name)
+        if os.path.isdir(d):
+            return d
+    return os.path.join(sys.prefix, 'share', 'yang', name)
+
+def xslt_dir():
+    """Return the directory with the XSLT stylesheets; see
+    PYANG_XSLT_DIR in yang2dsdl(1)."""
+    return _share_dir('PYANG_XSLT_DIR', 'xslt')
+
+def schema_dir():
+    """Return the directory with the RELAX NG library; see
+    PYANG_RNG_LIBDIR in yang2dsdl(1)."""
+    return _share_dir('PYANG_RNG_LIBDIR', 'schema')
+
+_stylesheets = {}
+
+def stylesheet(name):
+    """Return the compiled XSLT stylesheet `name` from xslt_dir().
+
+    Each stylesheet is compiled once per process."""
+    path = os.path.join(xslt_dir(), name)
+    xslt = _stylesheets.get(path)
+    if xslt is None:
+        xslt = etree.XSLT(etree.parse(path))
+        _stylesheets[path] = xslt
+    return xslt
+
+def _transform(name, doc, **params):
+    params = dict((k.replace('_', '-'), etree.XSLT.strparam(v))
+                  for k, v in params.items())
+    return stylesheet(name)(doc, **params)
+
+class Schemas(object):
+    """The RELAX NG, Schematron and DSRL schemas for one target,
+    generated from a hybrid DSDL schema."""
+
+    def __init__(self, hybrid, target='data', basename=None):
+        """`hybrid` is the hybrid DSDL schema, an lxml tree or a
+        filename, as produced by `pyang -f dsdl`."""
+        if target not in targets:
+            raise ValueError('invalid target: %s' % target)
+        if not isinstance(hybrid, etree._ElementTree):
+            hybrid = etree.parse(hybrid)
+        self.target = target
+        if basename is None:
+            basename = str(_transform('basename.xsl', hybrid))
+        self.basename = basename
+        params = dict(target=target, basename=basename,
+                      schema_dir=schema_dir())
+        self.rng = _transform('gen-relaxng.xsl', hybrid, **params)
+        """the RELAX NG schema"""
+        self.gdefs = _transform('gen-relaxng.xsl', hybrid, gdefs_only='1',
+                                **params)
+        """the global definitions of the RELAX NG schema"""
+        self.sch = None
+        """the Schematron schema, None for edit-config"""
+        self.dsrl = None
+        """the DSRL schema, None for edit-config"""
+        if target != 'edit-config':
+            self.sch = _transform('gen-schematron.xsl', hybrid,
+                                  target=target)
+            self.dsrl = _transform('gen-dsrl.xsl', hybrid, target=target)
+        self._relaxng = None
+        self._sch_xslt = None
+        self._dsrl_xslt = None
+
+    @classmethod
+    def from_modules(cls, ctx, modules, target='data', basename=None,
+                     no_dublin_core=True, no_documentation=True,
+                     lax_yang_version=False):
+        """Generate the schemas from the validated `modules`"""
+        hybrid = dsdl.HybridDSDLSchema().from_modules(
+            modules, no_dublin_core, no_documentation,
+            lax_yang_version=lax_yang_version)
+        tree = etree.ElementTree(
+            etree.fromstring(hybrid.serialize().encode('utf-8')))
+        return cls(tree, target, basename)
+
+    @property
+    def gdefs_filename(self):
+        """The name yang2dsdl uses for the global definitions"""
+        if self.target in ('config', 'get-config-reply'):
+            return '%s-gdefs-config.rng' % self.basename
+        if self.target == 'edit-config':
+            return '%s-gdefs-edit.rng' % self.basename
+        return '%s-gdefs.rng' % self.basename
+
+    def write(self, directory='.'):
+        """Write the schemas to `directory`, with the same names as
+        yang2dsdl."""
+        btname = os.path.join(directory,
+                              '%s-%s' % (self.basename, self.target))
+        self.rng.write_output(btname + '.rng')
+        self.gdefs.write_output(os.path.join(directory, self.gdefs_filename))
+        if self.sch is not None:
+            self.sch.write_output(btname + '.sch')
+            self.dsrl.write_output(btname + '.dsrl')
+
+    def relaxng(self):
+        """Return the compiled RELAX NG schema.
+
+        The includes of the global definitions are replaced by their
+        content, as in the simplification of RELAX NG includes, so that
+        the schema doesn't have to be written to a file."""
+        if self._relaxng is None:
+            rng = etree.ElementTree(copy.deepcopy(self.rng.getroot()))
+            gdefs = self.gdefs.getroot()
+            for inc in list(rng.iter('{%s}include' % rng_ns)):
+                # each embedded grammar includes the global definitions
+                if inc.get('href') == self.gdefs_filename:
+                    div = etree.Element('{%s}div' % rng_ns,
+                                        dict(gdefs.attrib),
+                                        nsmap=gdefs.nsmap)
+                    div.extend(copy.deepcopy(ch) for ch in gdefs)
+                    inc.getparent().replace(inc, div)
+            self._relaxng = etree.RelaxNG(rng)
+        return self._relaxng
+
+    def _dsrl_stylesheet(self):
+        if self._dsrl_xslt is None:
+            self._dsrl_xslt = etree.XSLT(
+                _transform('dsrl2xslt.xsl', self.dsrl))
+        return self._dsrl_xslt
+
+    def _sch_stylesheet(self):
+        if self._sch_xslt is None:
+            expanded = _transform('iso_abstract_expand.xsl', self.sch)
+            self._sch_xslt = etree.XSLT(
+                _transform('iso_svrl_for_xslt1.xsl', expanded))
+        return self._sch_xslt
+
+    def validate(self, instance):
+        """Validate `instance`, an lxml tree or a filename, in the same
+        steps as yang2dsdl: grammar and datatypes with RELAX NG, then,
+        unless the target is edit-config, semantic constraints with
+        Schematron, after default values are added with DSRL.
+
+        Returns a list of error messages, which is empty if the instance
+        is valid.  If the grammar is not valid, the semantic constraints
+        are not checked.
+        """
+        if not isinstance(instance, etree._ElementTree):
+            instance = etree.parse(instance)
+        relaxng = self.relaxng()
+        if not relaxng.validate(instance):
+            return ['%s:%d: %s' % (e.filename, e.line, e.message)
+                    for e in relaxng.error_log]
+        if self.sch is None:
+            return []
+        with_defaults = self._dsrl_stylesheet()(instance)
+        svrl = self._sch_stylesheet()(with_defaults)
+        msgs = []
+        context = None
+        for elem in svrl.getroot():
+            if elem.tag == '{%s}fired-rule' % svrl_ns:
+                context = elem.get('context')
+            elif elem.tag == '{%s}failed-assert' % svrl_ns:
+                msgs.append('Failed assert at "%s": %s' %
+                            (context, _svrl_text(elem)))
+            elif elem.tag == '{%s}successful-report' % svrl_ns:
+                msgs.append('Validity error at "%s": %s' %
+                            (context, _svrl_text(elem)))
+        return msgs
+
+def _svrl_text(elem):
+    text = elem.find('{%s}text' % svrl_ns)
+    if text is None:
+        return ''
+    return ''.join(text.itertext()).strip()
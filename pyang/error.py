@@ -53,6 +53,183 @@ class EmitError(Exception):
         self.msg = msg
         self.exit_code = exit_code
 
+### error lists
+
+def _error_key(pos, tag, args):
+    return (pos.ref, pos.line, pos.top, tag, args)
+
+class ErrorList(list):
+    """A list of (pos, tag, args) errors, indexed on what `err_add` uses
+    to detect duplicates.
+
+    With a plain list, `err_add` has to scan all errors added so far,
+    which is quadratic in the number of errors.
+
+    If `filter` is set, it is called as filter(pos, tag) by `err_add`,
+    and the error is dropped if it returns False.
+    """
+
+    def __init__(self, errors=(), filter=None):
+        list.__init__(self, errors)
+        self.filter = filter
+        self._reindex()
+
+    def _reindex(self):
+        self._keys = set()
+        self._unhashable_keys = []
+        for e in self:
+            self._add_key(e)
+
+    def _add_key(self, e):
+        key = _error_key(*e)
+        try:
+            self._keys.add(key)
+        except TypeError:
+            # args contains e.g. a list
+            self._unhashable_keys.append(key)
+
+    def has_error(self, pos, tag, args):
+        key = _error_key(pos, tag, args)
+        try:
+            return key in self._keys
+        except TypeError:
+            return key in self._unhashable_keys
+
+    def append(self, e):
+        list.append(self, e)
+        self._add_key(e)
+
+    def insert(self, i, e):
+        list.insert(self, i, e)
+        self._add_key(e)
+
+    def extend(self, errors):
+        errors = list(errors)
+        list.extend(self, errors)
+        for e in errors:
+            self._add_key(e)
+
+    def __iadd__(self, errors):
+        self.extend(errors)
+        return self
+
+    def remove(self, e):
+        list.remove(self, e)
+        self._reindex()
+
+    def pop(self, *args):
+        e = list.pop(self, *args)
+        self._reindex()
+        return e
+
+    def clear(self):
+        list.clear(self)
+        self._reindex()
+
+    def __setitem__(self, i, e):
+        list.__setitem__(self, i, e)
+        self._reindex()
+
+    def __delitem__(self, i):
+        list.__delitem__(self, i)
+        self._reindex()
+
+class ErrorAggregate(object):
+    """All reports of one error at one definition position.
+
+    Statements copied from a grouping by `uses` keep the position of the
+    original definition, with `uses_pos` set to the instantiation site,
+    so a single defect in a grouping is reported once per `uses`.  An
+    aggregate keeps the first report, the number of reports, a sample
+    of the instantiation sites, and a sample of the other arguments
+    the error was reported with, since the message may depend on the
+    site.  The messages are formatted on demand.
+    """
+    __slots__ = (
+        'pos',
+        'tag',
+        'args',
+        'count',
+        'sites',
+        'other_args',
+        'more_args',
+    )
+
+    def __init__(self, pos, tag, args):
+        self.pos = pos
+        self.tag = tag
+        self.args = args
+        self.count = 0
+        self.sites = []
+        self.other_args = []
+        self.more_args = False
+
+    def add(self, pos, max_sites, args=None):
+        self.count += 1
+        if pos.uses_pos is not None and len(self.sites) < max_sites:
+            self.sites.append(pos.uses_pos)
+        if (args is not None and args != self.args and
+            args not in self.other_args):
+            if len(self.other_args) + 1 < max_sites:
+                self.other_args.append(args)
+            else:
+                self.more_args = True
+
+    def label(self, basename=False):
+        if self.count == 1:
+            return self.pos.label(basename)
+        # report the definition position, not the first instantiation
+        pos = copy.copy(self.pos)
+        pos.uses_pos = None
+        return pos.label(basename)
+
+    def msg(self):
+        """Return the message of the first report, followed by the
+        other messages in the sample, if any."""
+        msgs = [err_to_str(self.tag, self.args)]
+        for args in self.other_args:
+            msgs.append(err_to_str(self.tag, args))
+        if self.more_args:
+            msgs.append('...')
+        return '; '.join(msgs)
+
+    def sites_str(self, basename=False):
+        """Return a string describing where the error was instantiated,
+        or '' if it was reported once."""
+        if self.count == 1:
+            return ''
+        sites = [site.label(basename) for site in self.sites]
+        if self.count > len(sites):
+            sites.append('...')
+        return ' (reported %d times, used at %s)' % \
+            (self.count, ', '.join(sites))
+
+def aggregate_errors(errors, max_sites=3):
+    """Aggregate errors in copied statements by definition position.
+
+    `errors` is a list of (pos, tag, args).  Returns a list of
+    ErrorAggregate, in the order of first occurrence.  Errors reported
+    in statements expanded from a grouping are keyed by the position of
+    their definition and their tag, and keep a sample of their distinct
+    messages; all other errors get an aggregate of their own.
+    """
+    res = []
+    aggregates = {}
+    for pos, tag, args in errors:
+        if pos.uses_pos is None:
+            agg = None
+            key = None
+        else:
+            key = (pos.ref, pos.line, tag)
+            agg = aggregates.get(key)
+        if agg is None:
+            agg = ErrorAggregate(pos, tag, args)
+            res.append(agg)
+            if key is not None:
+                aggregates[key] = agg
+        agg.add(pos, max_sites, args)
+    return res
+
 ### error codes
 
 ## level:
@@ -540,6 +717,71 @@ error_codes = \
     'STRICT_XPATH_FUNCTION':
       (2,
        'XPath function "%s" is not allowed for strict YANG compliance'),
+
+    ## errors in instance documents, reported by pyang.instance
+    'INST_PARSE_ERROR':
+      (1,
+       'cannot parse the instance document: %s'),
+
+    'INST_BAD_JSON':
+      (3,
+       '%s: the value must be a JSON %s'),
+
+    'INST_UNKNOWN_NODE':
+      (3,
+       '%s: unknown data node'),
+
+    'INST_NOT_CONFIG':
+      (3,
+       '%s: state data is not allowed in configuration'),
+
+    'INST_TYPE_VALUE':
+      (3,
+       '%s: %s'),
+
+    'INST_TOO_MANY':
+      (3,
+       '%s: the node is present more than once'),
+
+    'INST_MISSING_KEY':
+      (3,
+       '%s: the key "%s" is missing'),
+
+    'INST_DUPLICATE_KEY':
+      (3,
+       '%s: the keys are the same as in %s'),
+
+    'INST_NOT_UNIQUE':
+      (3,
+       '%s: the unique constraint "%s" is violated, see %s'),
+
+    'INST_DUPLICATE_VALUE':
+      (3,
+       '%s: the value "%s" is already present'),
+
+    'INST_MANDATORY':
+      (3,
+       '%s: the mandatory node "%s" is missing'),
+
+    'INST_MANDATORY_CHOICE':
+      (3,
+       '%s: no case of the mandatory choice "%s" is present'),
+
+    'INST_MULTIPLE_CASES':
+      (3,
+       '%s: nodes from more than one case of the choice "%s"'),
+
+    'INST_MIN_ELEMENTS':
+      (3,
+       '%s: %d instance(s) of "%s", but min-elements is %d'),
+
+    'INST_MAX_ELEMENTS':
+      (3,
+       '%s: %d instances of "%s", but max-elements is %d'),
+
+    'INST_LEAFREF':
+      (3,
+       '%s: the leafref value "%s" does not refer to an existing %s'),
     }
 
 def add_error_code(tag, level, fmt):
@@ -563,13 +805,17 @@ def err_to_str(tag, args):
         return 'unknown error %s' % tag
 
 def err_add(errors, pos, tag, args):
-    error = (copy.copy(pos), tag, args)
-    # surely this can be done more elegant??
-    for p, t, a in errors:
-        if (p.line == pos.line and p.ref == pos.ref and
-            p.top == pos.top and t == tag and a == args):
+    if isinstance(errors, ErrorList):
+        if errors.filter is not None and not errors.filter(pos, tag):
+            return
+        if errors.has_error(pos, tag, args):
             return
-    errors.append(error)
+    else:
+        for p, t, a in errors:
+            if (p.line == pos.line and p.ref == pos.ref and
+                p.top == pos.top and t == tag and a == args):
+                return
+    errors.append((copy.copy(pos), tag, args))
 
 def is_warning(level):
     return not is_error(level)
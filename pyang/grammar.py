@@ -822,22 +822,33 @@ def sort_canonical(keyword, stmts):
         (_arg_type, subspec) = stmt_map[keyword]
     except KeyError:
         return stmts
-    res = []
     # keep the order of data definition statements and case
     keep = [s[0] for s in data_def_stmts] + ['case']
+    rank = {}
     for kw, _spec in flatten_spec(subspec):
-        # keep comments before a statement together with that statement
+        if kw not in keep and kw not in rank:
+            rank[kw] = len(rank)
+    # the statements with each keyword in the spec, in their order
+    sorted_stmts = [[] for _kw in rank]
+    # all other statements (extensions)
+    rest = []
+    # keep comments before a statement together with that statement
+    comments = []
+    for s in stmts:
+        if s.keyword == '_comment':
+            comments.append(s)
+            continue
+        i = rank.get(s.keyword)
+        if i is None:
+            rest.extend(comments)
+            rest.append(s)
+        else:
+            sorted_stmts[i].extend(comments)
+            sorted_stmts[i].append(s)
         comments = []
-        for s in stmts:
-            if s.keyword == '_comment':
-                comments.append(s)
-            elif s.keyword == kw and kw not in keep:
-                res.extend(comments)
-                comments = []
-                res.append(s)
-            else:
-                comments = []
-
-    # then copy all other statements (extensions)
-    res.extend([stmt for stmt in stmts if stmt not in res])
+    rest.extend(comments)
+    res = []
+    for group in sorted_stmts:
+        res.extend(group)
+    res.extend(rest)
     return res
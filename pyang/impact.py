@@ -0,0 +1,298 @@
+"""Impact analysis of changes to modules and their definitions
+
+An Index records, for each module in a repository, the modules it
+imports and includes, and which top-level typedefs and groupings each
+of its schema nodes and definitions uses.  It is built from validated
+modules: a node uses the groupings in its `i_uses`, and the typedefs
+reached from its type through `i_typedef`, directly or through other
+typedefs and union member types.
+
+The index can be saved to a file.  When it is updated, only the
+modules whose files have changed, and the modules which depend on them,
+are validated again; the result of a query doesn't depend on whether
+the index was loaded or built from scratch.
+
+Definitions are identified as "modulename:name", where modulename is
+the module the definition belongs to, also if it is defined in a
+submodule.  The definitions and nodes of a submodule are recorded for
+the module, with the file and line where they are defined.  Typedefs
+and groupings which are not defined at the top level of a (sub)module
+are not identified, but what they use is attributed to the nodes and
+definitions that use them.
+"""
+
+import io
+import json
+import os
+
+from . import batch
+from . import statements
+
+INDEX_VERSION = 2
+
+def module_entry(module):
+    """Return the index entry of the validated (sub)module `module`"""
+    entry = {
+        "name": module.arg,
+        "keyword": module.keyword,
+        "imports": sorted(set(s.arg for s in module.search('import'))),
+        "includes": sorted(set(s.arg for s in module.search('include'))),
+        "definitions": {},
+        "nodes": [],
+    }
+    if module.keyword != 'module':
+        # the definitions and nodes of a submodule are recorded for the
+        # module it belongs to
+        return entry
+    modulename = module.arg
+    defs = entry["definitions"]
+    for keyword, stmts in (('typedef', module.i_typedefs),
+                           ('grouping', module.i_groupings)):
+        for name in sorted(stmts):
+            stmt = stmts[name]
+            uses = set()
+            if keyword == 'typedef':
+                _add_type_uses(stmt.search_one('type'), uses)
+            else:
+                for node in _walk(stmt):
+                    uses |= _node_uses(node)
+            uses.discard(_definition_id(stmt))
+            d = {
+                "keyword": keyword,
+                "uses": sorted(uses),
+            }
+            _add_location(d, stmt.pos, module)
+            defs["%s:%s" % (modulename, name)] = d
+    roots = [module]
+    for aug in module.search('augment'):
+        roots.append(aug)
+    for inc in module.search('include'):
+        rev = inc.search_one('revision-date')
+        submodule = statements.modulename_to_module(
+            module, inc.arg, rev.arg if rev is not None else None)
+        if submodule is not None:
+            roots.extend(submodule.search('augment'))
+    for root in roots:
+        for node in _walk(root):
+            if node.i_module.i_modulename != modulename:
+                continue
+            uses = _node_uses(node)
+            if uses:
+                n = {
+                    "path": statements.mk_path_str(node, with_prefixes=True),
+                    "uses": sorted(uses),
+                }
+                _add_location(n, _pos(node), module)
+                entry["nodes"].append(n)
+    return entry
+
+def _add_location(d, pos, module):
+    # the "file" is recorded only if it is not the module's file
+    d["line"] = pos.line
+    if pos.ref != module.pos.ref:
+        d["file"] = os.path.abspath(pos.ref)
+
+def _walk(stmt):
+    # all schema nodes below stmt, in document order
+    stack = [iter(getattr(stmt, 'i_children', []))]
+    while stack:
+        node = next(stack[-1], None)
+        if node is None:
+            stack.pop()
+        else:
+            yield node
+            stack.append(iter(getattr(node, 'i_children', [])))
+
+def _pos(node):
+    # a node expanded from a grouping is at the outermost uses statement
+    pos = node.pos
+    while pos.uses_pos is not None:
+        pos = pos.uses_pos
+    return pos
+
+def _definition_id(stmt):
+    if stmt.parent is None or stmt.parent.keyword not in ('module',
+                                                          'submodule'):
+        return None
+    return "%s:%s" % (stmt.i_module.i_modulename, stmt.arg)
+
+def _node_uses(node):
+    uses = set()
+    for u in getattr(node, 'i_uses', []):
+        grouping = getattr(u, 'i_grouping', None)
+        if grouping is not None:
+            _add_definition(grouping, uses)
+    _add_type_uses(node.search_one('type'), uses)
+    uses.discard(None)
+    return uses
+
+def _add_type_uses(type_, uses):
+    seen = set()
+    stack = [type_]
+    while stack:
+        t = stack.pop()
+        if t is None or id(t) in seen:
+            continue
+        seen.add(id(t))
+        typedef = getattr(t, 'i_typedef', None)
+        if typedef is not None:
+            _add_definition(typedef, uses)
+            stack.append(typedef.search_one('type'))
+        # union member types
+        stack.extend(t.search('type'))
+    uses.discard(None)
+
+def _add_definition(stmt, uses):
+    uses.add(_definition_id(stmt))
+
+class Index(object):
+    """The index entries of the modules in a repository, by filename"""
+
+    def __init__(self):
+        self.files = {}
+        """dict of absolute filename:entry; each entry is a dict as
+        returned by module_entry(), with the file's "mtime" and "size"
+        """
+
+    @classmethod
+    def load(cls, filename):
+        """Load an index saved with save().  An index saved by another
+        version of this module is not used, and an empty Index is
+        returned instead."""
+        index = cls()
+        with io.open(filename, "r", encoding="utf-8") as fd:
+            data = json.load(fd)
+        if data.get("version") == INDEX_VERSION:
+            index.files = data["files"]
+        return index
+
+    def save(self, filename):
+        tmpfile = filename + ".tmp"
+        with io.open(tmpfile, "w", encoding="utf-8") as fd:
+            json.dump({"version": INDEX_VERSION, "files": self.files}, fd,
+                      sort_keys=True)
+        os.rename(tmpfile, filename)
+
+    def update(self, ctx, jobs=1):
+        """Update the index with the modules in `ctx.revs`.
+
+        The modules in files which are new or have changed since they
+        were indexed are validated, and so are the modules which import
+        or include them, directly or indirectly.  Entries of files which
+        are no longer in the repository are removed.
+
+        Returns the number of validated (sub)modules.
+        """
+        files = {}
+        for modulename in ctx.revs:
+            for _rev, handle in ctx.revs[modulename]:
+                if handle is None:
+                    continue
+                filename = os.path.abspath(batch.handle_filename(handle))
+                files[filename] = modulename
+        changed = set()
+        for filename in list(self.files):
+            if filename not in files:
+                changed.add(self.files.pop(filename)["name"])
+        stats = {}
+        for filename, modulename in files.items():
+            st = os.stat(filename)
+            stats[filename] = (st.st_mtime, st.st_size)
+            entry = self.files.get(filename)
+            if (entry is None or entry["name"] != modulename or
+                (entry["mtime"], entry["size"]) != stats[filename]):
+                changed.add(modulename)
+        stale = changed | set(self.dependents(changed))
+        stale_files = set(filename for filename, modulename in files.items()
+                          if modulename in stale)
+        if not stale_files:
+            return 0
+        _graph, results = batch.validate_repository(
+            ctx, lambda _name, _rev, handle:
+            os.path.abspath(batch.handle_filename(handle)) in stale_files,
+            jobs=jobs, post_validate=_add_entries)
+        for filename in stale_files:
+            # a file which cannot be parsed is indexed without
+            # dependencies, so that it isn't parsed again until it changes
+            self.files[filename] = {
+                "name": files[filename], "keyword": None,
+                "imports": [], "includes": [], "definitions": {},
+                "nodes": [],
+            }
+        for res in results:
+            entry = res.report.get("impact")
+            filename = os.path.abspath(res.ref)
+            if entry is not None and filename in stale_files:
+                self.files[filename] = entry
+        for filename in stale_files:
+            mtime, size = stats[filename]
+            self.files[filename]["mtime"] = mtime
+            self.files[filename]["size"] = size
+        return len(results)
+
+    def dependents(self, modulenames):
+        """Return the names of the (sub)modules which import or include
+        any of `modulenames`, directly or indirectly, in name order."""
+        dependents = {}
+        for entry in self.files.values():
+            for dep in entry["imports"] + entry["includes"]:
+                dependents.setdefault(dep, set()).add(entry["name"])
+        res = set()
+        queue = list(modulenames)
+        while queue:
+            for name in dependents.get(queue.pop(), ()):
+                if name not in res:
+                    res.add(name)
+                    queue.append(name)
+        return sorted(res - set(modulenames))
+
+    def impact(self, modulenames, definitions=None):
+        """Return what is impacted by changes to the modules
+        `modulenames`, or to the `definitions` in them.
+
+        `definitions` is a list of names of typedefs and groupings.  If
+        it is not given, any definition in the modules may change.
+
+        Returns a list of (filename, entry, defs, nodes), in name order,
+        where `defs` are the definitions in the module that use the
+        changed definitions, and `nodes` the schema nodes that use them.
+        Without `definitions`, all modules which depend on `modulenames`
+        are returned, since any change to a module may impact them.
+        """
+        if definitions is None:
+            def match(uses):
+                return [u for u in uses
+                        if u.split(':', 1)[0] in modulenames]
+        else:
+            ids = set("%s:%s" % (m, d)
+                      for m in modulenames for d in definitions)
+            def match(uses):
+                return [u for u in uses if u in ids]
+        candidates = set(modulenames) | set(self.dependents(modulenames))
+        res = []
+        for filename in sorted(self.files,
+                               key=lambda f: (self.files[f]["name"], f)):
+            entry = self.files[filename]
+            if entry["name"] not in candidates:
+                continue
+            defs = []
+            for defid in sorted(entry["definitions"]):
+                used = match(entry["definitions"][defid]["uses"])
+                if used:
+                    defs.append((defid, entry["definitions"][defid], used))
+            nodes = []
+            for node in entry["nodes"]:
+                used = match(node["uses"])
+                if used:
+                    nodes.append((node, used))
+            if (defs or nodes or
+                (definitions is None and entry["name"] not in modulenames)):
+                res.append((filename, entry, defs, nodes))
+        return res
+
+def _add_entries(ctx, graph, results):
+    # called by batch.validate_repository() while the results refer to
+    # the validated modules
+    for res in results:
+        if res.module is not None:
+            res.report["impact"] = module_entry(res.module)
@@ -0,0 +1,774 @@
+"""Validation of instance data against validated modules
+
+compile_schema() builds a Schema from the validated statement trees
+(`i_children`) of a set of modules.  A Schema validates any number of
+XML or JSON instance documents: the values of leafs and leaf-lists are
+checked with the types' TypeSpec.str_to_val() and validate(), and the
+list keys, unique constraints, mandatory nodes, min-elements,
+max-elements and leafref targets are checked in the whole document.
+
+"when" and "must" expressions are not evaluated, so a node with a
+"when" expression is never mandatory.  A leafref value must be equal to
+some instance of the target leaf; the predicates of the path are not
+evaluated.
+"""
+
+import bisect
+import json
+import re
+
+from lxml import etree
+
+from . import error
+from . import types
+from . import util
+from .error import err_add
+
+nc_uri = 'urn:ietf:params:xml:ns:netconf:base:1.0'
+
+_int_re = re.compile(r'^\s*[-+]?[0-9]+\s*$')
+
+_json_numbers = ('int8', 'int16', 'int32', 'uint8', 'uint16', 'uint32')
+
+class SchemaNode(object):
+    """A data node in a Schema"""
+
+    def __init__(self, stmt):
+        self.stmt = stmt
+        self.keyword = stmt.keyword
+        self.name = stmt.arg
+        self.module = stmt.i_module.i_modulename
+        self.config = getattr(stmt, 'i_config', None) is not False
+        self.children = {}
+        """dict of (modulename, name):<class SchemaNode>"""
+        self.mandatory = []
+        """children that must be present, not in a choice"""
+        self.choices = []
+        """list of <class Choice>"""
+        self.type_spec = None
+        self.json_type = None
+        """the JSON type of the values; None if any type is accepted"""
+        self.keys = []
+        """for a list, the (modulename, name) of each key"""
+        self.uniques = []
+        """for a list, (unique statement, list of paths to the leafs),
+        where each path is a list of (modulename, name)"""
+        self.min_elements = 0
+        self.max_elements = None
+        self.leafref = None
+        """the SchemaNode of the leafref target, if an instance is required
+        """
+
+    @property
+    def key(self):
+        return (self.module, self.name)
+
+    def is_mandatory(self):
+        """Return True if the node must exist when its parent exists."""
+        if _has_when(self.stmt):
+            return False
+        if self.keyword in ('leaf', 'anyxml', 'anydata'):
+            m = self.stmt.search_one('mandatory')
+            return m is not None and m.arg == 'true'
+        if self.keyword in ('list', 'leaf-list'):
+            return self.min_elements > 0
+        if self.keyword == 'container':
+            return (self.stmt.search_one('presence') is None and
+                    (len(self.mandatory) > 0 or
+                     any(c.mandatory for c in self.choices)))
+        return False
+
+class Choice(object):
+    """A choice among the children of a SchemaNode"""
+
+    def __init__(self, stmt):
+        self.name = stmt.arg
+        m = stmt.search_one('mandatory')
+        self.mandatory = (m is not None and m.arg == 'true' and
+                          not _has_when(stmt))
+        self.cases = []
+        """list of <class Case>"""
+
+class Case(object):
+    """A case in a Choice"""
+
+    def __init__(self, stmt):
+        self.name = stmt.arg
+        self.keys = set()
+        """keys of all data nodes in the case, also in nested choices"""
+        self.mandatory = []
+        self.choices = []
+
+def _has_when(stmt):
+    if stmt.search_one('when') is not None:
+        return True
+    augment = getattr(stmt, 'i_augment', None)
+    if augment is not None and augment.search_one('when') is not None:
+        return True
+    for uses in getattr(stmt, 'i_uses', []):
+        if uses.search_one('when') is not None:
+            return True
+    return False
+
+def _root_spec(spec):
+    while spec.base is not None and not isinstance(spec, types.PathTypeSpec):
+        spec = spec.base
+    return spec
+
+def _leafref_target_spec(spec):
+    # return the type spec and module of a leafref's target, or None
+    target = getattr(spec, 'i_target_node', None)
+    if target is None:
+        return None
+    type_ = target.search_one('type')
+    if type_ is None or getattr(type_, 'i_type_spec', None) is None:
+        return None
+    return type_.i_type_spec, target.i_module
+
+def _json_type(spec):
+    root = _root_spec(spec)
+    if isinstance(root, types.PathTypeSpec):
+        target = _leafref_target_spec(root)
+        return None if target is None else _json_type(target[0])
+    if root.name in _json_numbers:
+        return 'number'
+    if root.name in ('boolean', 'empty'):
+        return root.name
+    if root.name == 'union':
+        return None
+    return 'string'
+
+class Instance(object):
+    """A data node in an instance document"""
+
+    def __init__(self, schema, pos, path, jpath=None):
+        self.schema = schema
+        """the SchemaNode of the instance"""
+        self.pos = pos
+        """the Position of the instance; None in a JSON document, where
+        it is computed from `jpath` when an error is reported"""
+        self.path = path
+        self.jpath = jpath
+        """in a JSON document, the member names and array indexes from
+        the top-level object to the instance"""
+        self.value = None
+        """for a leaf or leaf-list, the value as a string"""
+        self.children = {}
+        """dict of (modulename, name):[<class Instance>]"""
+
+    def child_value(self, path):
+        """Return the value of the leaf at `path`, a list of
+        (modulename, name), or None."""
+        inst = self
+        for key in path:
+            insts = inst.children.get(key)
+            if not insts:
+                return None
+            inst = insts[0]
+        return inst.value
+
+class Schema(object):
+    """The data nodes of a set of modules, compiled for the validation
+    of instance documents."""
+
+    def __init__(self, ctx, modules):
+        self.ctx = ctx
+        self.modules = {}
+        """dict of modulename:<class Statement>, for all modules in ctx"""
+        self.namespaces = {}
+        """dict of namespace URI:modulename"""
+        for m in ctx.modules.values():
+            if m.keyword != 'module':
+                continue
+            other = self.modules.get(m.arg)
+            if (other is None or util.get_latest_revision(m) >
+                util.get_latest_revision(other)):
+                self.modules[m.arg] = m
+            ns = m.search_one('namespace')
+            if ns is not None:
+                self.namespaces[ns.arg] = m.arg
+        self._nodes = {}
+        """dict of id(statement):<class SchemaNode>"""
+        self.root = _RootNode()
+        for module in modules:
+            self._compile_content(module, self.root, self.root)
+        self.targets = set()
+        """ids of the SchemaNodes that are leafref targets"""
+        for snode in self._nodes.values():
+            stmt = snode.stmt
+            leafref = getattr(stmt, 'i_leafref', None)
+            if leafref is None or not leafref.require_instance:
+                continue
+            target = getattr(leafref, 'i_target_node', None)
+            snode.leafref = self._nodes.get(id(target))
+            if snode.leafref is not None:
+                self.targets.add(id(snode.leafref))
+
+    def _compile_content(self, stmt, node, content):
+        # add the data nodes in stmt.i_children to node.children, and
+        # the mandatory nodes and choices to `content`
+        for ch in stmt.i_children:
+            if ch.keyword == 'choice':
+                choice = Choice(ch)
+                for case_stmt in ch.i_children:
+                    case = Case(case_stmt)
+                    before = set(node.children)
+                    self._compile_content(case_stmt, node, case)
+                    case.keys = set(node.children) - before
+                    choice.cases.append(case)
+                content.choices.append(choice)
+            elif ch.keyword in ('leaf', 'leaf-list', 'container', 'list',
+                                'anyxml', 'anydata'):
+                snode = self._compile_node(ch)
+                node.children[snode.key] = snode
+                if snode.is_mandatory():
+                    content.mandatory.append(snode)
+
+    def _compile_node(self, stmt):
+        snode = SchemaNode(stmt)
+        self._nodes[id(stmt)] = snode
+        if stmt.keyword in ('leaf', 'leaf-list'):
+            type_ = stmt.search_one('type')
+            if type_ is not None:
+                snode.type_spec = getattr(type_, 'i_type_spec', None)
+            if snode.type_spec is not None:
+                snode.json_type = _json_type(snode.type_spec)
+        if stmt.keyword in ('list', 'leaf-list'):
+            m = stmt.search_one('min-elements')
+            if m is not None:
+                snode.min_elements = int(m.arg)
+            m = stmt.search_one('max-elements')
+            if m is not None and m.arg != 'unbounded':
+                snode.max_elements = int(m.arg)
+        if stmt.keyword in ('container', 'list'):
+            self._compile_content(stmt, snode, snode)
+        if stmt.keyword == 'list':
+            for k in getattr(stmt, 'i_key', None) or []:
+                snode.keys.append((k.i_module.i_modulename, k.arg))
+            for u, leafs in getattr(stmt, 'i_unique', []):
+                snode.uniques.append((u, [self._path_from(stmt, leaf)
+                                          for leaf in leafs]))
+        return snode
+
+    @staticmethod
+    def _path_from(ancestor, stmt):
+        # the data node keys from `ancestor` down to `stmt`
+        path = []
+        while stmt is not ancestor:
+            if stmt.keyword not in ('choice', 'case'):
+                path.append((stmt.i_module.i_modulename, stmt.arg))
+            stmt = stmt.parent
+        path.reverse()
+        return path
+
+    def convert(self, spec, string, module, resolve):
+        """Check `string` against the type `spec`.
+
+        `resolve` is a function that returns the module name for a
+        prefix of an identityref value, or None.
+
+        Returns (value, None) where value is the value as a string, or
+        (None, message) if the value is not valid.
+        """
+        root = _root_spec(spec)
+        if isinstance(root, types.PathTypeSpec):
+            target = _leafref_target_spec(root)
+            if target is None:
+                return string, None
+            return self.convert(target[0], string, target[1], resolve)
+        name = root.name
+        if name == 'empty':
+            if string.strip() == '':
+                return '', None
+            return None, 'the value "%s" is not empty' % string
+        if name == 'union':
+            for t in root.types:
+                if getattr(t, 'i_type_spec', None) is None:
+                    continue
+                value, msg = self.convert(t.i_type_spec, string,
+                                          module, resolve)
+                if msg is None:
+                    return value, None
+            return None, 'the value "%s" does not match any member type' \
+                % string
+        if name == 'identityref':
+            return self._identityref(root, string.strip(), resolve)
+        if name == 'instance-identifier':
+            string = string.strip()
+            if not string.startswith('/'):
+                return None, ('the value "%s" is not an instance-identifier'
+                              % string)
+            return string, None
+        if isinstance(root, types.IntTypeSpec):
+            if _int_re.match(string) is None:
+                return None, 'the value "%s" is not an integer' % string
+            string = str(int(string))
+        elif name in ('decimal64', 'boolean'):
+            string = string.strip()
+        errors = []
+        pos = error.Position('')
+        val = spec.str_to_val(errors, pos, string, module)
+        if val is not None:
+            spec.validate(errors, pos, val, module)
+        if errors:
+            _pos, tag, args = errors[0]
+            return None, error.err_to_str(tag, args)
+        if name == 'decimal64':
+            return str(val), None
+        return string, None
+
+    def _identityref(self, spec, string, resolve):
+        prefix, sep, name = string.partition(':')
+        if not sep:
+            prefix, name = None, prefix
+        modname = resolve(prefix)
+        module = self.modules.get(modname)
+        ident = None
+        if module is not None:
+            ident = module.i_identities.get(name)
+        if ident is None:
+            return None, 'the identity "%s" is not found' % string
+        for base in getattr(spec, 'idbases', []):
+            base_ident = getattr(base, 'i_identity', None)
+            if (base_ident is not None and
+                not types.is_derived_from(ident, base_ident)):
+                return None, ('the identity "%s" is not derived from %s'
+                              % (string, base_ident.arg))
+        return '%s:%s' % (modname, name), None
+
+    def validate(self, errors, ref, source, in_format=None, target='data'):
+        """Validate the instance document `source`, a filename or a file
+        object, and add the errors to `errors`.
+
+        `ref` is used in the error positions.  `in_format` is 'xml' or
+        'json'; by default it is guessed from the extension of `ref`.
+        If `target` is 'config', state data is not allowed.
+
+        Returns the root Instance, or None if the document cannot be
+        parsed.
+        """
+        if in_format is None:
+            in_format = 'json' if ref.endswith('.json') else 'xml'
+        v = _Validator(self, errors, ref, target)
+        if in_format == 'json':
+            root = v.read_json(source)
+        else:
+            root = v.read_xml(source)
+        if root is not None:
+            v.check(root)
+            v.check_leafrefs()
+        return root
+
+class _RootNode(object):
+    # the parent of the top-level data nodes
+    def __init__(self):
+        self.module = None
+        self.keyword = None
+        self.config = True
+        self.children = {}
+        self.mandatory = []
+        self.choices = []
+
+def compile_schema(ctx, modules):
+    """Return the Schema of the validated `modules`.
+
+    The schemas are cached in `ctx.instance_schemas` per set of modules,
+    so that any number of instance documents can be validated with one
+    Schema.
+    """
+    key = tuple(sorted((m.arg, util.get_latest_revision(m))
+                       for m in modules))
+    schema = ctx.instance_schemas.get(key)
+    if schema is None:
+        schema = Schema(ctx, modules)
+        ctx.instance_schemas[key] = schema
+    return schema
+
+_json_ws_re = re.compile(r'[ \t\n\r]*')
+
+def _json_lines(text):
+    """Return a dict of jpath:line for the members and array items in
+    the JSON document `text`, which must be valid."""
+    newlines = [m.start() for m in re.finditer('\n', text)]
+    lines = {}
+    decoder = json.JSONDecoder()
+
+    def skip(i):
+        return _json_ws_re.match(text, i).end()
+
+    def value(i, jpath):
+        # return the end of the value at `i`
+        c = text[i]
+        if c == '{':
+            i = skip(i + 1)
+            while text[i] != '}':
+                name, end = json.decoder.scanstring(text, i + 1)
+                child = jpath + (name,)
+                lines[child] = bisect.bisect_left(newlines, i) + 1
+                i = skip(value(skip(skip(end) + 1), child))
+                if text[i] == ',':
+                    i = skip(i + 1)
+            return i + 1
+        if c == '[':
+            i = skip(i + 1)
+            index = 0
+            while text[i] != ']':
+                child = jpath + (index,)
+                lines[child] = bisect.bisect_left(newlines, i) + 1
+                i = skip(value(i, child))
+                if text[i] == ',':
+                    i = skip(i + 1)
+                index += 1
+            return i + 1
+        return decoder.raw_decode(text, i)[1]
+
+    start = skip(0)
+    lines[()] = bisect.bisect_left(newlines, start) + 1
+    value(start, ())
+    return lines
+
+class _Validator(object):
+    # the state of the validation of one document
+
+    def __init__(self, schema, errors, ref, target):
+        self.schema = schema
+        self.errors = errors
+        self.ref = ref
+        self.config_only = target == 'config'
+        self.leafrefs = []
+        """instances with a leafref value to check"""
+        self.target_values = {}
+        """dict of id(SchemaNode):set of values, for leafref targets"""
+        self.invalid = set()
+        """(id(Instance), key) of the children with a JSON value of the
+        wrong type; they are not reported as missing"""
+        self.json_text = None
+        self.json_lines = None
+        """dict of jpath:line, computed at the first error"""
+
+    def pos(self, line=0):
+        pos = error.Position(self.ref)
+        pos.line = line or 0
+        return pos
+
+    def json_pos(self, jpath):
+        if self.json_lines is None:
+            self.json_lines = _json_lines(self.json_text)
+        return self.pos(self.json_lines.get(jpath, 0))
+
+    def inst_pos(self, inst):
+        """Return the Position of `inst`, for an error."""
+        if inst.pos is None:
+            inst.pos = self.json_pos(inst.jpath)
+        return inst.pos
+
+    def has_child(self, inst, key):
+        return key in inst.children or (id(inst), key) in self.invalid
+
+    def child_path(self, inst, module, name):
+        if module != inst.schema.module:
+            return '%s/%s:%s' % (inst.path, module, name)
+        return '%s/%s' % (inst.path, name)
+
+    def add_child(self, inst, snode, pos, index=None, jpath=None):
+        path = self.child_path(inst, snode.module, snode.name)
+        if index is not None:
+            path += '[%d]' % (index + 1)
+        child = Instance(snode, pos, path, jpath)
+        inst.children.setdefault(snode.key, []).append(child)
+        return child
+
+    def set_value(self, inst, string, resolve):
+        snode = inst.schema
+        if snode.type_spec is None:
+            inst.value = string
+        else:
+            value, msg = self.schema.convert(
+                snode.type_spec, string, snode.stmt.i_module, resolve)
+            if msg is not None:
+                err_add(self.errors, self.inst_pos(inst), 'INST_TYPE_VALUE',
+                        (inst.path, msg))
+                return
+            inst.value = value
+        if snode.leafref is not None:
+            self.leafrefs.append(inst)
+        if id(snode) in self.schema.targets:
+            self.target_values.setdefault(id(snode), set()).add(inst.value)
+
+    ## XML
+
+    def read_xml(self, source):
+        try:
+            tree = etree.parse(source)
+        except (etree.XMLSyntaxError, IOError) as ex:
+            err_add(self.errors, self.pos(), 'INST_PARSE_ERROR', str(ex))
+            return None
+        elem = tree.getroot()
+        root = Instance(self.schema.root, self.pos(elem.sourceline), '')
+        if elem.tag == '{%s}rpc-reply' % nc_uri:
+            for ch in elem:
+                if ch.tag in ('{%s}data' % nc_uri, '{%s}config' % nc_uri):
+                    elem = ch
+                    break
+            else:
+                elem = None
+        if elem is None:
+            return root
+        if elem.tag in ('{%s}data' % nc_uri, '{%s}config' % nc_uri):
+            self.xml_children(elem, root)
+        else:
+            self.xml_node(elem, root, None)
+        return root
+
+    def xml_children(self, elem, inst):
+        indexes = {}
+        for ch in elem:
+            self.xml_node(ch, inst, indexes)
+
+    def xml_node(self, elem, inst, indexes):
+        if not isinstance(elem.tag, str):
+            # comment or processing instruction
+            return
+        qn = etree.QName(elem)
+        module = self.schema.namespaces.get(qn.namespace)
+        snode = inst.schema.children.get((module, qn.localname))
+        pos = self.pos(elem.sourceline)
+        if snode is None:
+            err_add(self.errors, pos, 'INST_UNKNOWN_NODE',
+                    self.child_path(inst, module or qn.namespace,
+                                    qn.localname))
+            return
+        index = None
+        if snode.keyword == 'list' and indexes is not None:
+            index = indexes.get(snode.key, 0)
+            indexes[snode.key] = index + 1
+        child = self.add_child(inst, snode, pos, index)
+        if snode.keyword in ('leaf', 'leaf-list'):
+            nsmap = elem.nsmap
+            def resolve(prefix):
+                return self.schema.namespaces.get(nsmap.get(prefix))
+            self.set_value(child, elem.text or '', resolve)
+        elif snode.keyword in ('container', 'list'):
+            self.xml_children(elem, child)
+
+    ## JSON
+
+    def read_json(self, source):
+        try:
+            if isinstance(source, str):
+                with open(source, encoding='utf-8') as f:
+                    text = f.read()
+            else:
+                text = source.read()
+                if isinstance(text, bytes):
+                    text = text.decode('utf-8')
+            doc = json.loads(text)
+        except (ValueError, IOError) as ex:
+            pos = self.pos(getattr(ex, 'lineno', 0))
+            err_add(self.errors, pos, 'INST_PARSE_ERROR', str(ex))
+            return None
+        self.json_text = text
+        root = Instance(self.schema.root, None, '', ())
+        if not isinstance(doc, dict):
+            err_add(self.errors, self.inst_pos(root), 'INST_BAD_JSON',
+                    ('/', 'object'))
+            return None
+        self.json_members(doc, root)
+        return root
+
+    def json_members(self, obj, inst):
+        for name, val in obj.items():
+            if name.startswith('@'):
+                # metadata annotation
+                continue
+            jpath = inst.jpath + (name,)
+            module, sep, local = name.partition(':')
+            if not sep:
+                module, local = inst.schema.module, module
+            snode = inst.schema.children.get((module, local))
+            if snode is None:
+                err_add(self.errors, self.json_pos(jpath), 'INST_UNKNOWN_NODE',
+                        self.child_path(inst, module, local))
+                continue
+            path = self.child_path(inst, module, local)
+            kw = snode.keyword
+            if kw == 'container':
+                if not isinstance(val, dict):
+                    self.bad_json(inst, snode, jpath, path, 'object')
+                    continue
+                self.json_members(
+                    val, self.add_child(inst, snode, None, jpath=jpath))
+            elif kw == 'list':
+                if (not isinstance(val, list) or
+                    not all(isinstance(e, dict) for e in val)):
+                    self.bad_json(inst, snode, jpath, path, 'array of objects')
+                    continue
+                for i, entry in enumerate(val):
+                    self.json_members(
+                        entry, self.add_child(inst, snode, None, i,
+                                              jpath + (i,)))
+            elif kw == 'leaf':
+                self.json_value(inst, snode, jpath, path, val)
+            elif kw == 'leaf-list':
+                if not isinstance(val, list):
+                    self.bad_json(inst, snode, jpath, path, 'array')
+                    continue
+                for i, v in enumerate(val):
+                    self.json_value(inst, snode, jpath + (i,), path, v)
+            else:
+                self.add_child(inst, snode, None, jpath=jpath)
+
+    def bad_json(self, inst, snode, jpath, path, expected):
+        err_add(self.errors, self.json_pos(jpath), 'INST_BAD_JSON',
+                (path, expected))
+        self.invalid.add((id(inst), snode.key))
+
+    def json_value(self, inst, snode, jpath, path, val):
+        if val is True or val is False:
+            jtype, string = 'boolean', 'true' if val else 'false'
+        elif val == [None]:
+            jtype, string = 'empty', ''
+        elif isinstance(val, int):
+            jtype, string = 'number', str(val)
+        elif isinstance(val, str):
+            jtype, string = 'string', val
+        else:
+            jtype, string = None, None
+        if string is None or (snode.json_type is not None and
+                              jtype != snode.json_type):
+            expected = {'number': 'number', 'boolean': 'boolean',
+                        'empty': '[null]'}.get(snode.json_type,
+                                               'string')
+            self.bad_json(inst, snode, jpath, path, expected)
+            return
+        child = self.add_child(inst, snode, None, jpath=jpath)
+        def resolve(prefix):
+            if prefix is None:
+                return snode.module
+            return prefix
+        self.set_value(child, string, resolve)
+
+    ## checks
+
+    def check(self, inst):
+        """Check the constraints in the subtree `inst`."""
+        snode = inst.schema
+        self.check_content(snode, inst)
+        for key, insts in inst.children.items():
+            csnode = snode.children[key]
+            if self.config_only and not csnode.config:
+                err_add(self.errors, self.inst_pos(insts[0]),
+                        'INST_NOT_CONFIG', insts[0].path)
+                continue
+            kw = csnode.keyword
+            if kw in ('list', 'leaf-list'):
+                self.check_elements(csnode, inst, insts)
+            elif len(insts) > 1:
+                err_add(self.errors, self.inst_pos(insts[1]), 'INST_TOO_MANY',
+                        insts[1].path)
+            if kw == 'list':
+                self.check_keys(csnode, insts)
+                for u, paths in csnode.uniques:
+                    self.check_unique(u, paths, insts)
+            elif kw == 'leaf-list' and csnode.config:
+                seen = set()
+                for i in insts:
+                    if i.value is not None and i.value in seen:
+                        err_add(self.errors, self.inst_pos(i),
+                                'INST_DUPLICATE_VALUE', (i.path, i.value))
+                    seen.add(i.value)
+            if kw in ('container', 'list'):
+                for i in insts:
+                    self.check(i)
+
+    def check_content(self, content, inst):
+        # check the mandatory nodes and choices of `content`, a
+        # SchemaNode or Case, for the instance `inst`
+        path = inst.path or '/'
+        for m in content.mandatory:
+            if self.has_child(inst, m.key):
+                continue
+            if self.config_only and not m.config:
+                continue
+            if m.keyword == 'container':
+                # a non-presence container with mandatory descendants
+                cpath = self.child_path(inst, m.module, m.name)
+                self.check_content(m, Instance(m, inst.pos, cpath, inst.jpath))
+            else:
+                name = m.name
+                if m.module != inst.schema.module:
+                    name = '%s:%s' % (m.module, m.name)
+                err_add(self.errors, self.inst_pos(inst), 'INST_MANDATORY',
+                        (path, name))
+        for choice in content.choices:
+            cases = [c for c in choice.cases
+                     if any(self.has_child(inst, k) for k in c.keys)]
+            if len(cases) > 1:
+                err_add(self.errors, self.inst_pos(inst),
+                        'INST_MULTIPLE_CASES',
+                        (path, choice.name))
+            elif len(cases) == 1:
+                self.check_content(cases[0], inst)
+            elif choice.mandatory:
+                err_add(self.errors, self.inst_pos(inst),
+                        'INST_MANDATORY_CHOICE',
+                        (path, choice.name))
+
+    def check_elements(self, snode, parent, insts):
+        n = len(insts)
+        if n < snode.min_elements:
+            err_add(self.errors, self.inst_pos(insts[0]), 'INST_MIN_ELEMENTS',
+                    (parent.path or '/', n, snode.name, snode.min_elements))
+        if snode.max_elements is not None and n > snode.max_elements:
+            err_add(self.errors, self.inst_pos(insts[snode.max_elements]),
+                    'INST_MAX_ELEMENTS',
+                    (parent.path or '/', n, snode.name, snode.max_elements))
+
+    def check_keys(self, snode, insts):
+        if not snode.keys:
+            return
+        seen = {}
+        for i in insts:
+            values = []
+            for k in snode.keys:
+                v = i.child_value([k])
+                if v is None:
+                    if not self.has_child(i, k):
+                        err_add(self.errors, self.inst_pos(i),
+                                'INST_MISSING_KEY',
+                                (i.path, k[1]))
+                    break
+                values.append(v)
+            else:
+                values = tuple(values)
+                other = seen.get(values)
+                if other is not None:
+                    err_add(self.errors, self.inst_pos(i),
+                            'INST_DUPLICATE_KEY',
+                            (i.path, other.path))
+                else:
+                    seen[values] = i
+
+    def check_unique(self, u, paths, insts):
+        seen = {}
+        for i in insts:
+            values = tuple(i.child_value(p) for p in paths)
+            if None in values:
+                # the constraint applies only if all leafs exist
+                continue
+            other = seen.get(values)
+            if other is not None:
+                err_add(self.errors, self.inst_pos(i), 'INST_NOT_UNIQUE',
+                        (i.path, u.arg, other.path))
+            else:
+                seen[values] = i
+
+    def check_leafrefs(self):
+        for inst in self.leafrefs:
+            if inst.value is None:
+                continue
+            target = inst.schema.leafref
+            if inst.value not in self.target_values.get(id(target), ()):
+                err_add(self.errors, self.inst_pos(inst), 'INST_LEAFREF',
+                        (inst.path, inst.value,
+                         '%s:%s' % (target.module, target.name)))
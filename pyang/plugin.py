@@ -101,6 +101,13 @@ class PyangPlugin(object):
         self.name = name
         self.multiple_modules = False
         self.handle_comments = False
+        self.load_modules = True
+        """if False, the modules are not loaded and validated, and
+        emit_files() is called instead of emit()"""
+        self.output_suffix = None
+        """the suffix of the files written with --output-dir, where
+        emit() is called for one module at a time; if None, the output
+        format cannot be used with --output-dir"""
 
     ## pyang front-end program methods
 
@@ -183,6 +190,26 @@ class PyangPlugin(object):
         have been validated"""
         return
 
+    def post_validate_repository(self, ctx, graph, results):
+        """Called for all plugins with --validate-repository, after the
+        modules have been validated.
+
+        `results` is a list of batch.ModuleResult, and `graph` the
+        depgraph.DependencyGraph of all modules.  With --jobs, this is
+        called in each worker process, with the results of the modules
+        validated by that process."""
+        return
+
+    def emit_files(self, ctx, filenames, fd):
+        """Produce the plugin output for the module files `filenames`,
+        which are not loaded into the context.
+
+        Called instead of emit() if `load_modules` is False after
+        setup_fmt(); the plugin reads the files itself.  Errors added to
+        `ctx.errors` are reported after the output is produced.
+        """
+        return
+
     def emit(self, ctx, modules, fd):
         """Produce the plugin output.
 
@@ -8,6 +8,7 @@ import sys
 import os
 import io
 
+from pyang import batch
 from pyang import context
 from pyang import repository
 from pyang import plugin
@@ -44,6 +45,17 @@ class CheckUpdatePlugin(plugin.PyangPlugin):
                                  help="Old deviation module of the OLDMODULE." \
                                       " This option can be given multiple" \
                                       " times."),
+            optparse.make_option("--check-update-from-dir",
+                                 metavar="OLDDIR",
+                                 dest="check_update_from_dir",
+                                 default=[],
+                                 action="append",
+                                 help="With --validate-repository, verify"
+                                      " that upgrade from the latest"
+                                      " revision of each module in OLDDIR"
+                                      " follows RFC 6020 and 7950 rules."
+                                      " This option can be given multiple"
+                                      " times."),
             optparse.make_option("--check-update-include-structures",
                                  dest="check_update_structures",
                                  action="store_true",
@@ -165,12 +177,89 @@ class CheckUpdatePlugin(plugin.PyangPlugin):
             'CHK_IO_ERROR', 1,
             "error %s: %s")
 
+    def setup_ctx(self, ctx):
+        if (ctx.opts.check_update_from_dir and
+            not ctx.opts.validate_repository):
+            sys.stderr.write("--check-update-from-dir requires"
+                             " --validate-repository\n")
+            sys.exit(1)
+
+    def pre_load_modules(self, ctx):
+        if ctx.opts.check_update_from_dir:
+            # validated before any worker process is forked, so that
+            # the old modules are shared by all workers
+            self.oldmods = load_old_repository(ctx)
+
     def post_validate_ctx(self, ctx, modules):
         if not ctx.opts.check_update_from:
             return
 
         check_update(ctx, modules[0])
 
+    def post_validate_repository(self, ctx, graph, results):
+        if not ctx.opts.check_update_from_dir:
+            return
+
+        check_update_repository(ctx, self.oldmods, graph, results)
+
+def load_old_repository(ctx):
+    """Validate the modules in the --check-update-from-dir directories.
+
+    Returns a dict of modulename:batch.ModuleResult, with the latest
+    revision of each module."""
+    olddirs = ctx.opts.check_update_from_dir
+    oldpath = os.pathsep.join(olddirs + ctx.opts.old_path)
+    oldrepo = repository.FileRepository(oldpath, use_env=False)
+    oldctx = context.Context(oldrepo)
+    oldctx.opts = ctx.opts
+    oldctx.lax_xpath_checks = ctx.lax_xpath_checks
+    oldctx.lax_quote_checks = ctx.lax_quote_checks
+
+    for p in plugin.plugins:
+        p.setup_ctx(oldctx)
+
+    graph, results = batch.validate_repository(
+        oldctx, lambda _name, _rev, handle:
+        batch.in_directories(handle, olddirs))
+    oldmods = {}
+    for res in results:
+        if (res.node.keyword == 'module' and
+            graph.resolve(res.name) == res.node.key):
+            oldmods[res.name] = res
+    return oldmods
+
+def check_update_repository(ctx, oldmods, graph, results):
+    """Check the update of each module in `results` from the module with
+    the same name in `oldmods`.
+
+    Only the latest revision of each module is checked, and only if
+    neither the old nor the new module has errors.  The errors are added
+    to the results, and the outcome is recorded as the "update" member of
+    the module's report."""
+    for res in results:
+        if (res.node.keyword != 'module' or
+            graph.resolve(res.name) != res.node.key):
+            continue
+        old = oldmods.get(res.name)
+        report = {"from": None, "file": None, "checked": False}
+        res.report["update"] = report
+        if old is None:
+            continue
+        report["from"] = "%s@%s" % (old.name, old.revision)
+        report["file"] = old.ref
+        if (res.module is None or old.module is None or
+            has_errors(old.errors) or has_errors(res.errors)):
+            continue
+        n = len(ctx.errors)
+        chk_module(ctx, old.module, res.module)
+        report["checked"] = True
+        res.errors.extend(ctx.errors[n:])
+        res.errors.sort(key=lambda e: (e[0].ref, e[0].line))
+
+def has_errors(errors):
+    return any(error.is_error(error.err_level(etag))
+               for _epos, etag, _eargs in errors)
+
 def check_update(ctx, newmod):
     oldpath = os.pathsep.join(ctx.opts.old_path)
     olddir = os.path.dirname(ctx.opts.check_update_from)
@@ -228,6 +317,8 @@ def check_update(ctx, newmod):
 
 def chk_module(ctx, oldmod, newmod):
 
+    newindex = index_stmts(newmod.substmts, lambda s: (s.keyword, s.arg))
+
     chk_modulename(oldmod, newmod, ctx)
 
     chk_namespace(oldmod, newmod, ctx)
@@ -247,17 +338,17 @@ def chk_module(ctx, oldmod, newmod):
         chk_grouping(olds, newmod, ctx)
 
     for olds in oldmod.search('rpc'):
-        chk_rpc(olds, newmod, ctx)
+        chk_rpc(olds, newmod, ctx, newindex)
 
     for olds in oldmod.search('notification'):
-        chk_notification(olds, newmod, ctx)
+        chk_notification(olds, newmod, ctx, newindex)
 
     for olds in oldmod.search('extension'):
         chk_extension(olds, newmod, ctx)
 
     if ctx.opts.check_update_structures:
         for olds in oldmod.search((sxmod, 'structure')):
-            chk_structure(olds, newmod, ctx)
+            chk_structure(olds, newmod, ctx, newindex)
     chk_augment(oldmod, newmod, ctx)
 
     chk_i_children(oldmod, newmod, ctx)
@@ -339,20 +430,20 @@ def chk_grouping(olds, newmod, ctx):
         return
     chk_i_children(olds, news, ctx)
 
-def chk_rpc(olds, newmod, ctx):
-    news = chk_stmt(olds, newmod, ctx)
+def chk_rpc(olds, newmod, ctx, newindex=None):
+    news = chk_stmt(olds, newmod, ctx, newindex)
     if news is None:
         return
     chk_i_children(olds, news, ctx)
 
-def chk_notification(olds, newmod, ctx):
-    news = chk_stmt(olds, newmod, ctx)
+def chk_notification(olds, newmod, ctx, newindex=None):
+    news = chk_stmt(olds, newmod, ctx, newindex)
     if news is None:
         return
     chk_i_children(olds, news, ctx)
 
-def chk_structure(olds, newmod, ctx):
-    news = chk_stmt(olds, newmod, ctx)
+def chk_structure(olds, newmod, ctx, newindex=None):
+    news = chk_stmt(olds, newmod, ctx, newindex)
     if news is None:
         return
     chk_i_children(olds, news, ctx)
@@ -383,26 +474,26 @@ def chk_augment(oldmod, newmod, ctx):
     # group augment of same target together, and compare with all
     # augment of same target in newmod
     targets = {}
+    oldaugments = {}
     for olds in oldmod.search('augment'):
-        if olds.arg in targets:
-            targets[olds.arg].extend(olds.i_children)
-        else:
-            targets[olds.arg] = list(olds.i_children) # copy
+        oldaugments.setdefault(olds.arg, []).append(olds)
+        targets.setdefault(olds.arg, []).extend(olds.i_children)
+    # this is not quite correct; it should be ok to change the
+    # prefix, so augmenting /x:a in the old module, but /y:a in the
+    # new module, if x and y are prefixes to the same module, should
+    # be ok.
+    newtargets = {}
+    for news in newmod.search('augment'):
+        newtargets.setdefault(news.arg, []).extend(news.i_children)
     for t in targets:
-        newchs = []
-        # this is not quite correct; it should be ok to change the
-        # prefix, so augmenting /x:a in the old module, but /y:a in the
-        # new module, if x and y are prefixes to the same module, should
-        # be ok.
-        for news in newmod.search('augment', arg=t):
-            newchs.extend(news.i_children)
-
+        newchs = newtargets.get(t, [])
         if len(newchs) == 0:
-            for olds in oldmod.search('augment', arg=t):
+            for olds in oldaugments[t]:
                 err_def_removed(olds, newmod, ctx)
         else:
+            newindex = index_stmts(newchs)
             for oldch in targets[t]:
-                chk_children(oldch, newchs, newmod, ctx)
+                chk_children(oldch, newindex, newmod, ctx)
 
 def chk_stmt_definitions(olds, newp, ctx, definitions):
     news = None
@@ -415,8 +506,11 @@ def chk_stmt_definitions(olds, newp, ctx, definitions):
     chk_if_feature(olds, news, ctx)
     return news
 
-def chk_stmt(olds, newp, ctx):
-    news = newp.search_one(olds.keyword, arg = olds.arg)
+def chk_stmt(olds, newp, ctx, newindex=None):
+    if newindex is None:
+        news = newp.search_one(olds.keyword, arg = olds.arg)
+    else:
+        news = newindex.get((olds.keyword, olds.arg))
     if news is None:
         err_def_removed(olds, newp, ctx)
         return None
@@ -424,25 +518,35 @@ def chk_stmt(olds, newp, ctx):
     chk_if_feature(olds, news, ctx)
     return news
 
+def index_stmts(stmts, key=lambda s: s.arg):
+    """Return a dict of key(s):s for the first statement s in `stmts`
+    with each key.
+
+    The default key is the argument; old and new children are matched
+    on their argument only, so that a changed keyword is reported as
+    such, and not as a removed node."""
+    index = {}
+    for s in stmts:
+        index.setdefault(key(s), s)
+    return index
+
 def chk_i_children(old, new, ctx):
+    newindex = index_stmts(new.i_children)
     for oldch in old.i_children:
-        chk_child(oldch, new, ctx)
+        chk_children(oldch, newindex, new, ctx)
 
-    old_child_args = [oldch.arg for oldch in old.i_children]
-    added_new_children = [new_child for new_child in new.i_children if new_child.arg not in old_child_args]
-    for newch in added_new_children:
-        if statements.is_mandatory_node(newch):
+    old_child_args = set(oldch.arg for oldch in old.i_children)
+    for newch in new.i_children:
+        if (newch.arg not in old_child_args and
+            statements.is_mandatory_node(newch)):
             err_add(ctx.errors, newch.pos, 'CHK_NEW_MANDATORY', newch.arg)
 
 def chk_child(oldch, newp, ctx):
-    chk_children(oldch, newp.i_children, newp, ctx)
-
-def chk_children(oldch, newchs, newp, ctx):
-    newch = None
-    for ch in newchs:
-        if ch.arg == oldch.arg:
-            newch = ch
-            break
+    chk_children(oldch, index_stmts(newp.i_children), newp, ctx)
+
+def chk_children(oldch, newindex, newp, ctx):
+    """`newindex` is the new children of `newp`, from index_stmts()"""
+    newch = newindex.get(oldch.arg)
     if newch is None:
         err_def_removed(oldch, newp, ctx)
         return
@@ -753,27 +857,29 @@ def chk_string(old, new, oldts, newts, ctx):
 
 def chk_enumeration(old, new, oldts, newts, ctx):
     # verify that all old enums are still in new, with the same values
+    newenums = dict(newts.enums)
     for name, val in oldts.enums:
-        n = util.keysearch(name, 0, newts.enums)
+        n = newenums.get(name)
         if n is None:
             err_add(ctx.errors, new.pos, 'CHK_DEF_REMOVED',
                     ('enum', name, old.pos))
-        elif n[1] != val:
+        elif n != val:
             errcode = verrcode('CHK_ENUM_VALUE_CHANGED', new)
             err_add(ctx.errors, new.pos, errcode,
-                    (name, val, n[1]))
+                    (name, val, n))
 
 def chk_bits(old, new, oldts, newts, ctx):
     # verify that all old bits are still in new, with the same positions
+    newbits = dict(newts.bits)
     for name, pos in oldts.bits:
-        n = util.keysearch(name, 0, newts.bits)
+        n = newbits.get(name)
         if n is None:
             err_add(ctx.errors, new.pos, 'CHK_DEF_REMOVED',
                     ('bit', name, old.pos))
-        elif n[1] != pos:
+        elif n != pos:
             errcode = verrcode('CHK_BIT_POSITION_CHANGED', new)
             err_add(ctx.errors, new.pos, errcode,
-                    (name, pos, n[1]))
+                    (name, pos, n))
 
 def chk_binary(old, new, oldts, newts, ctx):
     # FIXME: see types.py; we can't check the length
@@ -1,12 +1,16 @@
 """Makefile dependency rule output plugin
 
+The dependencies can also be output as a graph, in DOT or JSON.
 """
 
+import io
+import json
 import optparse
 import os.path
 
 from pyang import plugin
 from pyang import error
+from pyang import batch
 
 def pyang_plugin_init():
     plugin.register_plugin(DependPlugin())
@@ -39,6 +43,18 @@ class DependPlugin(plugin.PyangPlugin):
                                  dest="depend_include_path",
                                  action="store_true",
                                  help="Include file path in the prerequisites"),
+            optparse.make_option("--depend-format",
+                                 dest="depend_format",
+                                 type="choice",
+                                 choices=["make", "dot", "json"],
+                                 default="make",
+                                 help="Output Makefile rules (default), a"
+                                 " DOT graph, or the graph as JSON"),
+            optparse.make_option("--depend-from-headers",
+                                 dest="depend_from_headers",
+                                 action="store_true",
+                                 help="Read only the module headers, and"
+                                 " do not validate the modules"),
             optparse.make_option("--depend-ignore-module",
                                  dest="depend_ignore",
                                  default=[],
@@ -52,6 +68,8 @@ class DependPlugin(plugin.PyangPlugin):
     def add_output_format(self, fmts):
         self.multiple_modules = True
         fmts['depend'] = self
+    def setup_fmt(self, ctx):
+        self.load_modules = not ctx.opts.depend_from_headers
     def emit(self, ctx, modules, fd):
         # cannot do this unless everything is ok for our module
         modulenames = [m.arg for m in modules]
@@ -60,48 +78,142 @@ class DependPlugin(plugin.PyangPlugin):
                 error.is_error(error.err_level(etag))):
                 raise error.EmitError("%s contains errors" % epos.top.arg)
         emit_depend(ctx, modules, fd)
+    def emit_files(self, ctx, filenames, fd):
+        modules = []
+        for filename in filenames:
+            try:
+                with io.open(filename, "r", encoding="utf-8") as f:
+                    text = f.read()
+            except (IOError, UnicodeDecodeError) as ex:
+                raise error.EmitError("error %s: %s" % (filename, ex))
+            module = ctx.parse_header(filename, text)
+            if module is None:
+                raise error.EmitError("%s contains errors" % filename)
+            modules.append(module)
+        emit_depend(ctx, modules, fd)
 
 def emit_depend(ctx, modules, fd):
-    for module in modules:
+    graph = batch.dependency_graph(ctx, modules)
+    roots = []
+    for m in modules:
+        key = graph.add_module(m).key
+        if key not in roots:
+            roots.append(key)
+    prereqs = make_prereqs(ctx, graph)
+    if ctx.opts.depend_recurse:
+        # the graph has the given modules and what they depend on
+        closures = graph.closures(prereqs)
+    else:
+        closures = None
+    if ctx.opts.depend_format == 'make':
+        emit_make(ctx, graph, roots, prereqs, closures, fd)
+        return
+    # the graph of the given modules and their prerequisites
+    keys = set(roots)
+    for key in roots:
+        if closures is not None:
+            keys.update(closures[key])
+        else:
+            keys.update(prereqs(key))
+    keys = [key for key in graph.topological_order()
+            if key in keys and not is_ignored(ctx, graph, key)]
+    if ctx.opts.depend_format == 'dot':
+        emit_dot(ctx, graph, keys, prereqs, fd)
+    else:
+        emit_json(ctx, graph, keys, prereqs, closures, fd)
+
+def make_prereqs(ctx, graph):
+    """Return a function which returns the keys of the direct
+    prerequisites of a key, according to the options"""
+    def prereqs(key):
+        res = graph.dependencies(
+            key, includes=not ctx.opts.depend_no_submodules)
+        if ctx.opts.depend_from_submodules:
+            for sub in graph.dependencies(key, imports=False):
+                res.extend(dep for dep in
+                           graph.dependencies(sub, includes=False)
+                           if dep not in res)
+        return res
+    return prereqs
+
+def is_ignored(ctx, graph, key):
+    return graph.nodes[key].name in ctx.opts.depend_ignore
+
+def filename(ctx, node):
+    if ctx.opts.depend_include_path:
+        if ctx.opts.depend_extension is None:
+            return node.ref
+        basename = os.path.splitext(node.ref)[0]
+        return '%s%s' % (basename, ctx.opts.depend_extension)
+    return '%s%s' % (node.name, ctx.opts.depend_extension or '')
+
+def emit_make(ctx, graph, roots, prereqs, closures, fd):
+    filenames = {}
+    for key in roots:
         if ctx.opts.depend_target is None:
-            fd.write('%s :' % module.pos.ref)
+            target = graph.nodes[key].ref
         else:
-            fd.write('%s :' % ctx.opts.depend_target)
-        prereqs = []
-        add_prereqs(ctx, module, prereqs)
-        for i in prereqs:
-            if i in ctx.opts.depend_ignore:
-                continue
-            if ctx.opts.depend_include_path:
-                m = ctx.get_module(i)
-                if ctx.opts.depend_extension is None:
-                    filename = m.pos.ref
+            target = ctx.opts.depend_target
+        if closures is not None:
+            deps = closures[key]
+        else:
+            deps = prereqs(key)
+        line = [target, ':']
+        for dep in deps:
+            name = filenames.get(dep)
+            if name is None:
+                if is_ignored(ctx, graph, dep):
+                    name = ''
                 else:
-                    basename = os.path.splitext(m.pos.ref)[0]
-                    filename = '%s%s' % (basename, ctx.opts.depend_extension)
-                fd.write(' %s' % filename)
+                    name = filename(ctx, graph.nodes[dep])
+                filenames[dep] = name
+            if name:
+                line.append(name)
+        fd.write(' '.join(line) + '\n')
+
+def emit_dot(ctx, graph, keys, prereqs, fd):
+    fd.write('digraph depend {\n')
+    for key in keys:
+        node = graph.nodes[key]
+        shape = 'box' if node.keyword == 'module' else 'ellipse'
+        fd.write('  "%s" [label="%s", shape=%s];\n' %
+                 (node, filename(ctx, node), shape))
+    included = set(keys)
+    for key in keys:
+        node = graph.nodes[key]
+        includes = graph.dependencies(key, imports=False)
+        for dep in prereqs(key):
+            if dep not in included:
+                continue
+            if dep in includes:
+                attrs = ' [style=dashed]'
             else:
-                if ctx.opts.depend_extension is None:
-                    ext = ""
-                else:
-                    ext = ctx.opts.depend_extension
-                fd.write(' %s%s' % (i, ext))
-        fd.write('\n')
+                attrs = ''
+            fd.write('  "%s" -> "%s"%s;\n' % (node, graph.nodes[dep], attrs))
+    fd.write('}\n')
 
-def add_prereqs(ctx, module, prereqs):
-    new = [(i.arg, i.search_one("revision-date")) for i in module.search("import") if i.arg not in prereqs]
-    if not ctx.opts.depend_no_submodules:
-        new += [(i.arg, i.search_one("revision-date")) for i in module.search("include")
-                if i.arg not in prereqs and i.arg not in new]
-    if ctx.opts.depend_from_submodules:
-        for i in module.search("include"):
-            subm = ctx.get_module(i.arg)
-            if subm is not None:
-                new += [(i.arg, i.search_one("revision-date")) for i in subm.search("import")
-                        if i.arg not in prereqs and i.arg not in new]
-    prereqs.extend(i[0] for i in new)
-    if ctx.opts.depend_recurse:
-        for modulename, revision_date in new:
-            revision = revision_date.arg if revision_date is not None else None
-            m = ctx.get_module(modulename, revision)
-            add_prereqs(ctx, m, prereqs)
+def emit_json(ctx, graph, keys, prereqs, closures, fd):
+    included = set(keys)
+    if closures is not None:
+        reverse_closures = graph.closures(reverse=True)
+    mods = []
+    for key in keys:
+        node = graph.nodes[key]
+        if closures is not None:
+            deps = closures[key]
+            dependents = reverse_closures[key]
+        else:
+            deps = prereqs(key)
+            dependents = graph.dependents(key)
+        mods.append({
+            "name": node.name,
+            "revision": node.revision,
+            "keyword": node.keyword,
+            "file": node.ref,
+            "dependencies": [str(graph.nodes[k]) for k in deps
+                             if k in included],
+            "dependents": [str(graph.nodes[k]) for k in dependents
+                           if k in included],
+        })
+    json.dump({"modules": mods}, fd, indent=2)
+    fd.write("\n")
@@ -293,15 +293,16 @@ class FlattenPlugin(plugin.PyangPlugin):
         )
 
     def emit(self, ctx, modules, fd):
-        output_writer = csv.DictWriter(
-            fd,
-            fieldnames=self.__field_names,
-            dialect=ctx.opts.flatten_csv_dialect,
-        )
+        output_writer = csv.writer(fd, dialect=ctx.opts.flatten_csv_dialect)
         if not ctx.opts.flatten_no_header:
-            output_writer.writeheader()
+            output_writer.writerow(self.__field_names)
+        # The paths are computed from the cached path of the parent node
+        self.__qualified_names = {}
+        self.__paths = {}
         for module in sorted(modules, key=lambda m: m.arg):
             self.output_module(ctx, module, output_writer)
+        self.__qualified_names = {}
+        self.__paths = {}
 
     def output_module(
         self,
@@ -326,11 +327,7 @@ class FlattenPlugin(plugin.PyangPlugin):
             module_children = module_children + deviated_module_children
         module_children = sorted(
             module_children,
-            key=lambda child: statements.get_xpath(
-                child,
-                prefix_to_module=(not ctx.opts.flatten_prefix_in_xpath),
-                qualified=ctx.opts.flatten_qualified_in_xpath,
-            ),
+            key=lambda child: self.get_xpath(ctx, child),
         )
         for child in module_children:
             self.output_child(
@@ -356,11 +353,8 @@ class FlattenPlugin(plugin.PyangPlugin):
         )
         # Keys map to self.__field_names for CSV output
         output_content = {
-            "xpath": statements.get_xpath(
-                child,
-                prefix_to_module=(not ctx.opts.flatten_prefix_in_xpath),
-                qualified=ctx.opts.flatten_qualified_in_xpath,
-                with_keys=ctx.opts.flatten_keys_in_xpath,
+            "xpath": self.get_xpath(
+                ctx, child, with_keys=ctx.opts.flatten_keys_in_xpath
             )
         }
         # Sometimes we won't have the full set of YANG models...
@@ -416,10 +410,9 @@ class FlattenPlugin(plugin.PyangPlugin):
             output_content["status"] = status
         if ctx.opts.flatten_resolve_leafref:
             if primitive_type == "leafref":
-                output_content["resolved_leafref"] = statements.get_xpath(
+                output_content["resolved_leafref"] = self.get_xpath(
+                    ctx,
                     child.i_leafref.i_target_node,
-                    prefix_to_module=(not ctx.opts.flatten_prefix_in_xpath),
-                    qualified=ctx.opts.flatten_qualified_in_xpath,
                     with_keys=ctx.opts.flatten_keys_in_xpath,
                 )
             else:
@@ -458,7 +451,9 @@ class FlattenPlugin(plugin.PyangPlugin):
         if not any(output_filters):
             # We want to traverse the entire tree for output
             # Simply don't output what we don't want, don't stop processing
-            output_writer.writerow(output_content)
+            output_writer.writerow(
+                [output_content[name] for name in self.__field_names]
+            )
         if hasattr(child, "i_children"):
             self.output_module(
                 ctx, child, output_writer, deviated, override_flag, child_keys
@@ -491,24 +486,82 @@ class FlattenPlugin(plugin.PyangPlugin):
             #    statements.get_xpath(node, prefix_to_module=True))
             return "ro", None
 
+    def get_qualified_name(self, stmt):
+        """Returns (module name, prefix, name, keys) of the node, as in
+        statements.mk_path_list.
+        """
+        qualified_name = self.__qualified_names.get(stmt)
+        if qualified_name is None:
+            qualified_name = (
+                stmt.i_module.arg,
+                stmt.i_module.i_prefix,
+                stmt.arg,
+                statements.get_keys(stmt),
+            )
+            self.__qualified_names[stmt] = qualified_name
+        return qualified_name
+
+    def get_path(self, stmt, qualified, prefix_to_module, with_keys,
+                 mod_prefix=False):
+        """Same as statements.mk_path_str, with prefix_onchange=True,
+        but computed from the cached path of the parent node.
+        If mod_prefix is True, outputs module and prefix for each node.
+        Returns (path, last prefix).
+        """
+        cache_key = (stmt, qualified, prefix_to_module, with_keys, mod_prefix)
+        path = self.__paths.get(cache_key)
+        if path is not None:
+            return path
+        if stmt.keyword in ("case", "input", "output"):
+            path = self.get_path(
+                stmt.parent, qualified, prefix_to_module, with_keys,
+                mod_prefix
+            )
+        else:
+            if stmt.parent.keyword in ("module", "submodule"):
+                parent_path, last_prefix = "", None
+            else:
+                parent_path, last_prefix = self.get_path(
+                    stmt.parent, qualified, prefix_to_module, with_keys,
+                    mod_prefix
+                )
+            module_name, prefix, node_name, node_keys = (
+                self.get_qualified_name(stmt)
+            )
+            if mod_prefix:
+                xpath_element = "%s:%s:%s" % (module_name, prefix, node_name)
+            elif qualified or prefix != last_prefix:
+                xpath_element = "%s:%s" % (
+                    module_name if prefix_to_module else prefix,
+                    node_name,
+                )
+            else:
+                xpath_element = node_name
+            if with_keys and node_keys:
+                xpath_element += "".join(
+                    "[%s]" % node_key for node_key in node_keys
+                )
+            path = ("%s/%s" % (parent_path, xpath_element), prefix)
+        self.__paths[cache_key] = path
+        return path
+
+    def get_xpath(self, ctx, stmt, with_keys=False):
+        """Same as statements.get_xpath with the XPath options."""
+        return self.get_path(
+            stmt,
+            ctx.opts.flatten_qualified_in_xpath,
+            not ctx.opts.flatten_prefix_in_xpath,
+            with_keys,
+        )[0]
+
     def get_mod_prefix_path(self, stmt, with_keys=False):
         """Duplicate statements.mk_path_str,
         but output module and prefix both in path.
         """
-        resolved_names = statements.mk_path_list(stmt)
-        xpath_elements = []
-        for index, resolved_name in enumerate(resolved_names):
-            module_name, prefix, node_name, node_keys = resolved_name
-            xpath_element = "%s:%s:%s" % (module_name, prefix, node_name)
-            if with_keys and node_keys:
-                for node_key in node_keys:
-                    xpath_element = "%s[%s]" % (xpath_element, node_key)
-            xpath_elements.append(xpath_element)
-        return "/%s" % "/".join(xpath_elements)
-  
+        return self.get_path(stmt, True, False, with_keys, mod_prefix=True)[0]
+
     def get_root_module(self, ctx, stmt):
-        xpath = statements.get_xpath(stmt,
-                            prefix_to_module=(not ctx.opts.flatten_prefix_in_xpath),
-                            qualified=ctx.opts.flatten_qualified_in_xpath,
-                            with_keys=ctx.opts.flatten_keys_in_xpath)
+        xpath = self.get_xpath(
+            ctx, stmt, with_keys=ctx.opts.flatten_keys_in_xpath
+        )
         return xpath.split('/')[1]
@@ -0,0 +1,502 @@
+"""Static HTML site output plugin
+
+Renders each module and submodule as an HTML page in a directory, with
+links to the pages of the imported and included modules, and to the
+typedefs, groupings, identities and augmented nodes they use, found
+through the resolved i_typedef, i_grouping, i_identity and
+i_target_node references of the validated modules.
+
+The pages are rendered for the modules given on the command line and
+all modules they depend on.  The site is built incrementally: a page
+is rendered again only if its module, or any module it depends on, has
+changed, as recorded by the hashes of their contents in the file
+.pyang-site.json in the site directory.
+"""
+
+import hashlib
+import io
+import json
+import optparse
+import os
+from xml.sax.saxutils import escape, quoteattr
+
+from pyang import plugin
+from pyang import error
+from pyang import batch
+from pyang import util
+
+SITE_VERSION = 1
+"""changed when the pages are rendered differently, so that a site
+built by another version is rendered again"""
+
+state_file = '.pyang-site.json'
+css_file = 'pyang-site.css'
+
+def pyang_plugin_init():
+    plugin.register_plugin(HTMLSitePlugin())
+
+class HTMLSitePlugin(plugin.PyangPlugin):
+    def add_opts(self, optparser):
+        optlist = [
+            optparse.make_option("--html-site-dir",
+                                 dest="html_site_dir",
+                                 metavar="DIR",
+                                 help="Write the pages of the site to DIR"),
+            ]
+        g = optparser.add_option_group("HTML site output specific options")
+        g.add_options(optlist)
+
+    def add_output_format(self, fmts):
+        self.multiple_modules = True
+        self.load_modules = False
+        fmts['html-site'] = self
+
+    def emit_files(self, ctx, filenames, fd):
+        sitedir = ctx.opts.html_site_dir
+        if sitedir is None:
+            raise error.EmitError("--html-site-dir must be given")
+        modules = []
+        texts = {}
+        for filename in filenames:
+            try:
+                with io.open(filename, "r", encoding="utf-8") as f:
+                    text = f.read()
+            except (IOError, UnicodeDecodeError) as ex:
+                raise error.EmitError("error %s: %s" % (filename, ex))
+            module = ctx.parse_header(filename, text)
+            if module is None:
+                raise error.EmitError("%s contains errors" % filename)
+            modules.append(module)
+            texts[os.path.abspath(filename)] = text
+        graph = batch.dependency_graph(ctx, modules)
+
+        in_repository = set()
+        for modulename in ctx.revs:
+            for _rev, handle in ctx.revs[modulename]:
+                if handle is not None:
+                    in_repository.add(
+                        os.path.abspath(batch.handle_filename(handle)))
+        for filename in texts:
+            if filename not in in_repository:
+                raise error.EmitError("%s is not in the search path" %
+                                      os.path.relpath(filename))
+
+        site = build_state(graph, texts)
+        pages = dict((entry["file"], page) for page, entry in site.items())
+        old = load_state(sitedir)
+        stale = set(entry["file"] for page, entry in site.items()
+                    if (old.get(page) != entry or
+                        not os.path.exists(os.path.join(sitedir, page))))
+
+        if not os.path.isdir(sitedir):
+            os.makedirs(sitedir)
+        rendered = []
+        if stale:
+            # the errors in the modules are not reported
+            nerrors = len(ctx.errors)
+            def post_validate(ctx, _graph, results):
+                # called in each process that validated modules, so that
+                # the pages are rendered in parallel
+                for res in results:
+                    filename = os.path.abspath(res.ref)
+                    if res.module is not None and filename in stale:
+                        page = pages[filename]
+                        Page(ctx, res.module, page, site).write(sitedir)
+                        res.report["site"] = page
+            _graph, results = batch.validate_repository(
+                ctx, lambda _name, _rev, handle:
+                os.path.abspath(batch.handle_filename(handle)) in stale,
+                jobs=ctx.opts.jobs, post_validate=post_validate)
+            del ctx.errors[nerrors:]
+            rendered = [res.report["site"] for res in results
+                        if "site" in res.report]
+        for page in list(site):
+            if site[page]["file"] in stale and page not in rendered:
+                # not rendered, e.g., since the module cannot be parsed;
+                # it is tried again in the next build
+                del site[page]
+        for page in old:
+            if page not in site:
+                path = os.path.join(sitedir, page)
+                if os.path.exists(path):
+                    os.remove(path)
+
+        write_index(sitedir, site)
+        with io.open(os.path.join(sitedir, css_file), "w",
+                     encoding="utf-8") as f:
+            f.write(css)
+        save_state(sitedir, site)
+        for page in sorted(rendered):
+            fd.write(page + '\n')
+
+def page_name(name, revision):
+    if revision == 'unknown':
+        return '%s.html' % name
+    return '%s@%s.html' % (name, revision)
+
+def build_state(graph, texts):
+    """Return a dict of page:entry for the modules in `graph`.
+
+    Each entry is a dict with the module's "file", "name", "revision",
+    "keyword", and "hash", the hash of the contents of the module and of
+    all modules it depends on.  A submodule's page also depends on the
+    module it belongs to, since they are validated together.
+    """
+    digests = {}
+    for key, node in graph.nodes.items():
+        filename = os.path.abspath(node.ref)
+        text = texts.get(filename)
+        if text is None:
+            with io.open(filename, "r", encoding="utf-8") as f:
+                text = f.read()
+        digests[key] = hashlib.sha1(text.encode('utf-8')).hexdigest()
+    site = {}
+    for key in sorted(graph.nodes):
+        node = graph.nodes[key]
+        keys = [key]
+        if node.keyword == 'submodule' and node.belongs_to is not None:
+            owner = graph.resolve(node.belongs_to)
+            if owner is not None:
+                keys.append(owner)
+        h = hashlib.sha1(str(SITE_VERSION).encode('utf-8'))
+        for k in sorted(keys + graph.closure(keys)):
+            h.update(('%s@%s %s\n' % (k[0], k[1], digests[k])).encode('utf-8'))
+        page = page_name(node.name, node.revision)
+        if page not in site:
+            site[page] = {
+                "file": os.path.abspath(node.ref),
+                "name": node.name,
+                "revision": node.revision,
+                "keyword": node.keyword,
+                "hash": h.hexdigest(),
+            }
+    return site
+
+def load_state(sitedir):
+    """Return the pages recorded by save_state(), or an empty dict if
+    there are none, or if they were recorded by another version."""
+    path = os.path.join(sitedir, state_file)
+    if not os.path.exists(path):
+        return {}
+    with io.open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != SITE_VERSION:
+        return {}
+    return data["pages"]
+
+def save_state(sitedir, site):
+    path = os.path.join(sitedir, state_file)
+    with io.open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"version": SITE_VERSION, "pages": site}, f,
+                  sort_keys=True, indent=1)
+    os.rename(path + ".tmp", path)
+
+def write_index(sitedir, site):
+    with io.open(os.path.join(sitedir, 'index.html'), "w",
+                 encoding="utf-8") as f:
+        f.write(header('Modules'))
+        f.write('<h1>Modules</h1>\n<ul>\n')
+        for page in sorted(site, key=lambda p: (site[p]["name"],
+                                                site[p]["revision"])):
+            entry = site[page]
+            rev = ''
+            if entry["revision"] != 'unknown':
+                rev = ' ' + escape(entry["revision"])
+            f.write('<li>%s <a href=%s>%s</a>%s</li>\n' %
+                    (entry["keyword"], quoteattr(page),
+                     escape(entry["name"]), rev))
+        f.write('</ul>\n</body>\n</html>\n')
+
+def header(title):
+    return ('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+            '<title>%s</title>\n'
+            '<link rel="stylesheet" href="%s">\n</head>\n<body>\n' %
+            (escape(title), css_file))
+
+def kwstr(keyword):
+    if util.is_prefixed(keyword):
+        return '%s:%s' % keyword
+    return keyword
+
+# the statements in the tree of a grouping
+data_keywords = ('container', 'leaf', 'leaf-list', 'list', 'choice', 'case',
+                 'anydata', 'anyxml', 'uses', 'action', 'notification',
+                 'input', 'output')
+
+class Page(object):
+    """The page of the validated (sub)module `module`"""
+
+    def __init__(self, ctx, module, page, site):
+        self.ctx = ctx
+        self.module = module
+        self.page = page
+        self.site = site
+        self.out = []
+
+    def write(self, sitedir):
+        self.render()
+        path = os.path.join(sitedir, self.page)
+        with io.open(path, "w", encoding="utf-8") as f:
+            f.write(''.join(self.out))
+
+    def w(self, s):
+        self.out.append(s)
+
+    def href(self, module, anchor=None):
+        """Return the link to `anchor` on the page of `module`, or None
+        if the module has no page in the site"""
+        page = page_name(module.arg, util.get_latest_revision(module))
+        if page not in self.site:
+            return None
+        if page == self.page:
+            page = ''
+        if anchor is not None:
+            page = '%s#%s' % (page, anchor)
+        return page
+
+    def link(self, text, href):
+        if href is None:
+            return escape(text)
+        return '<a href=%s>%s</a>' % (quoteattr(href), escape(text))
+
+    def definition_link(self, text, stmt):
+        # only top-level definitions have anchors
+        if stmt is None or stmt.parent.keyword not in ('module', 'submodule'):
+            return escape(text)
+        return self.link(text, self.href(stmt.parent, '%s-%s' %
+                                         (stmt.keyword, stmt.arg)))
+
+    def node_link(self, text, node):
+        if node is None:
+            return escape(text)
+        page_module, anchor = node_anchor(node)
+        if page_module is None:
+            return escape(text)
+        return self.link(text, self.href(page_module, anchor))
+
+    def render(self):
+        module = self.module
+        self.w(header('%s %s' % (module.keyword, module.arg)))
+        self.w('<p class="nav"><a href="index.html">Modules</a></p>\n')
+        self.w('<h1>%s %s</h1>\n' % (module.keyword, escape(module.arg)))
+        self.render_header()
+        self.render_description(module)
+        self.render_imports()
+        self.render_definitions('feature', 'Features')
+        self.render_definitions('identity', 'Identities')
+        self.render_definitions('typedef', 'Typedefs')
+        self.render_definitions('grouping', 'Groupings')
+        nodes = [ch for ch in getattr(module, 'i_children', [])
+                 if ch.parent is module]
+        if nodes:
+            self.w('<h2>Data nodes</h2>\n')
+            self.render_tree(nodes)
+        self.render_augments()
+        self.w('</body>\n</html>\n')
+
+    def render_header(self):
+        module = self.module
+        self.w('<dl class="header">\n')
+        for keyword in ('yang-version', 'namespace', 'prefix'):
+            stmt = module.search_one(keyword)
+            if stmt is not None:
+                self.w('<dt>%s</dt><dd>%s</dd>\n' % (keyword,
+                                                      escape(stmt.arg)))
+        belongs_to = module.search_one('belongs-to')
+        if belongs_to is not None:
+            owner = self.ctx.get_module(belongs_to.arg)
+            href = None if owner is None else self.href(owner)
+            self.w('<dt>belongs-to</dt><dd>%s</dd>\n' %
+                   self.link(belongs_to.arg, href))
+        for rev in module.search('revision'):
+            self.w('<dt>revision</dt><dd>%s</dd>\n' % escape(rev.arg))
+        self.w('</dl>\n')
+
+    def render_description(self, stmt):
+        descr = stmt.search_one('description')
+        if descr is not None:
+            self.w('<div class="descr">%s</div>\n' % escape(descr.arg))
+
+    def render_imports(self):
+        module = self.module
+        imports = module.search('import')
+        if imports:
+            self.w('<h2>Imports</h2>\n<ul>\n')
+            for imp in imports:
+                prefix = imp.search_one('prefix')
+                target = None
+                if prefix is not None:
+                    target = util.prefix_to_module(module, prefix.arg,
+                                                   imp.pos, [])
+                href = None if target is None else self.href(target)
+                self.w('<li>%s%s</li>\n' % (
+                    self.link(imp.arg, href),
+                    '' if prefix is None else
+                    ' (prefix %s)' % escape(prefix.arg)))
+            self.w('</ul>\n')
+        includes = module.search('include')
+        if includes:
+            self.w('<h2>Includes</h2>\n<ul>\n')
+            for inc in includes:
+                rev = inc.search_one('revision-date')
+                target = self.ctx.get_module(inc.arg,
+                                             None if rev is None else rev.arg)
+                href = None if target is None else self.href(target)
+                self.w('<li>%s</li>\n' % self.link(inc.arg, href))
+            self.w('</ul>\n')
+
+    def render_definitions(self, keyword, title):
+        stmts = self.module.search(keyword)
+        if not stmts:
+            return
+        self.w('<h2>%s</h2>\n<dl>\n' % title)
+        for stmt in stmts:
+            self.w('<dt id=%s>%s</dt>\n<dd>' %
+                   (quoteattr('%s-%s' % (keyword, stmt.arg)),
+                    escape(stmt.arg)))
+            if keyword == 'identity':
+                for base in stmt.search('base'):
+                    self.w('base %s<br>\n' % self.definition_link(
+                        base.arg, getattr(base, 'i_identity', None)))
+            elif keyword == 'typedef':
+                self.w('%s<br>\n' % self.type_str(stmt.search_one('type')))
+            elif keyword == 'grouping':
+                self.render_grouping(stmt)
+            self.render_description(stmt)
+            self.w('</dd>\n')
+        self.w('</dl>\n')
+
+    def render_grouping(self, stmt):
+        # the statements as they are written, without anchors, since the
+        # nodes are defined where the grouping is used
+        children = [ch for ch in stmt.substmts if ch.keyword in data_keywords]
+        if not children:
+            return
+        self.w('<ul class="tree">\n')
+        for ch in children:
+            self.w('<li>%s %s' % (kwstr(ch.keyword), self.stmt_str(ch)))
+            self.render_grouping(ch)
+            self.w('</li>\n')
+        self.w('</ul>\n')
+
+    def render_augments(self):
+        augments = self.module.search('augment')
+        if not augments:
+            return
+        self.w('<h2>Augments</h2>\n<dl>\n')
+        for aug in augments:
+            self.w('<dt>augment %s</dt>\n<dd>' %
+                   self.node_link(aug.arg,
+                                  getattr(aug, 'i_target_node', None)))
+            self.render_description(aug)
+            self.render_tree(getattr(aug, 'i_children', []), aug)
+            self.w('</dd>\n')
+        self.w('</dl>\n')
+
+    def render_tree(self, nodes, augment=None):
+        # the nodes added by other augment statements, and the implicit
+        # input and output nodes without children, are not rendered
+        nodes = [n for n in nodes
+                 if ((not is_augmented(n) or n.i_augment is augment) and
+                     (n.keyword not in ('input', 'output') or
+                      getattr(n, 'i_children', [])))]
+        if not nodes:
+            return
+        self.w('<ul class="tree">\n')
+        for node in nodes:
+            _module, anchor = node_anchor(node)
+            s = self.stmt_str(node)
+            self.w('<li id=%s>%s%s' % (quoteattr(anchor), kwstr(node.keyword),
+                                       ' ' + s if s else ''))
+            self.render_tree(getattr(node, 'i_children', []))
+            self.w('</li>\n')
+        self.w('</ul>\n')
+
+    def stmt_str(self, stmt):
+        """Return the html of the argument and the main properties of
+        the schema node or uses statement `stmt`"""
+        if stmt.keyword == 'uses':
+            return self.definition_link(stmt.arg,
+                                        getattr(stmt, 'i_grouping', None))
+        if stmt.keyword in ('input', 'output'):
+            return ''
+        s = '<b>%s</b>' % escape(stmt.arg)
+        type_ = stmt.search_one('type')
+        if type_ is not None:
+            s += ' ' + self.type_str(type_)
+        key = stmt.search_one('key')
+        if key is not None:
+            s += ' [%s]' % escape(key.arg)
+        groupings = []
+        for u in getattr(stmt, 'i_uses', []):
+            grouping = getattr(u, 'i_grouping', None)
+            if grouping is not None and grouping not in groupings:
+                groupings.append(grouping)
+        if groupings:
+            s += ' <span class="uses">from %s</span>' % ', '.join(
+                self.definition_link(g.arg, g) for g in groupings)
+        return s
+
+    def type_str(self, type_):
+        if type_ is None:
+            return ''
+        s = self.definition_link(type_.arg,
+                                 getattr(type_, 'i_typedef', None))
+        members = type_.search('type')
+        if members:
+            s += ' (%s)' % ' | '.join(self.type_str(t) for t in members)
+        bases = type_.search('base')
+        if bases:
+            s += ' (base %s)' % ', '.join(
+                self.definition_link(b.arg, getattr(b, 'i_identity', None))
+                for b in bases)
+        return s
+
+def is_augmented(node):
+    # a node added by an augment statement at the top level of a
+    # (sub)module, which is rendered on the page of that (sub)module
+    aug = getattr(node, 'i_augment', None)
+    return aug is not None and aug.parent.keyword != 'uses'
+
+def node_anchor(node):
+    """Return (module, anchor), where `module` is the (sub)module on
+    whose page the schema node `node` is rendered, and `anchor` the id
+    of the node on the page.
+
+    The anchor is the path of the node, where each node is qualified
+    with its module name, and includes choice, case, input and output
+    nodes, so that it is unique.
+    """
+    names = []
+    module = None
+    n = node
+    while n is not None and n.keyword not in ('module', 'submodule'):
+        names.append('%s:%s' % (n.i_module.i_modulename,
+                                n.arg if n.arg is not None else n.keyword))
+        if module is None and is_augmented(n):
+            module = n.i_augment.parent
+        elif module is None and n.parent.keyword in ('module', 'submodule'):
+            module = n.parent
+        n = n.parent
+    names.reverse()
+    return module, 'node-' + '/'.join(names)
+
+css = """body {
+  font-family: sans-serif;
+}
+ul.tree {
+  list-style-type: none;
+  padding-left: 1.5em;
+}
+div.descr {
+  white-space: pre-wrap;
+  color: #444444;
+}
+span.uses {
+  color: #777777;
+}
+dt {
+  font-weight: bold;
+  margin-top: 0.5em;
+}
+"""
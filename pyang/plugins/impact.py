@@ -0,0 +1,94 @@
+"""Impact analysis output plugin
+
+Lists what in the modules in the search path is impacted by changes to
+the given modules, or to some of their definitions, see pyang.impact.
+"""
+
+import io
+import optparse
+import os
+
+from pyang import plugin
+from pyang import error
+from pyang import batch
+from pyang import impact
+
+def pyang_plugin_init():
+    plugin.register_plugin(ImpactPlugin())
+
+class ImpactPlugin(plugin.PyangPlugin):
+    def add_opts(self, optparser):
+        optlist = [
+            optparse.make_option("--impact-definition",
+                                 dest="impact_definitions",
+                                 metavar="NAME",
+                                 default=[],
+                                 action="append",
+                                 help="Only list what uses the typedef or"
+                                 " grouping NAME in the given modules."
+                                 " This option can be given multiple"
+                                 " times."),
+            optparse.make_option("--impact-index",
+                                 dest="impact_index",
+                                 metavar="FILE",
+                                 help="Keep the index of the modules in"
+                                 " the search path in FILE, so that only"
+                                 " changed modules are validated again"),
+            ]
+        g = optparser.add_option_group("Impact output specific options")
+        g.add_options(optlist)
+
+    def add_output_format(self, fmts):
+        self.multiple_modules = True
+        self.load_modules = False
+        fmts['impact'] = self
+
+    def emit_files(self, ctx, filenames, fd):
+        modulenames = []
+        for filename in filenames:
+            try:
+                with io.open(filename, "r", encoding="utf-8") as f:
+                    text = f.read()
+            except (IOError, UnicodeDecodeError) as ex:
+                raise error.EmitError("error %s: %s" % (filename, ex))
+            module = ctx.parse_header(filename, text)
+            if module is None:
+                raise error.EmitError("%s contains errors" % filename)
+            if module.keyword == 'submodule':
+                b = module.search_one('belongs-to')
+                if b is None:
+                    raise error.EmitError("%s contains errors" % filename)
+                modulenames.append(b.arg)
+            else:
+                modulenames.append(module.arg)
+        # the errors in the modules in the search path are not reported
+        nerrors = len(ctx.errors)
+
+        indexfile = ctx.opts.impact_index
+        if indexfile is not None and os.path.exists(indexfile):
+            index = impact.Index.load(indexfile)
+        else:
+            index = impact.Index()
+        index.update(ctx, ctx.opts.jobs)
+        if indexfile is not None:
+            index.save(indexfile)
+        del ctx.errors[nerrors:]
+
+        definitions = ctx.opts.impact_definitions or None
+        emit_impact(index.impact(modulenames, definitions), fd)
+
+def emit_impact(impacted, fd):
+    for filename, entry, defs, nodes in impacted:
+        fd.write('%s %s\n' % (entry["name"], os.path.relpath(filename)))
+        for defid, d, used in defs:
+            fd.write('  %s %s (%s) uses %s\n' %
+                     (d["keyword"], defid, location(d), ' '.join(used)))
+        for node, used in nodes:
+            fd.write('  %s (%s) uses %s\n' %
+                     (node["path"], location(node), ' '.join(used)))
+
+def location(d):
+    # a definition or node in a submodule is in the submodule's file
+    if "file" in d:
+        return '%s line %d' % (os.path.relpath(d["file"]), d["line"])
+    return 'line %d' % d["line"]
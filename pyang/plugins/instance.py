@@ -0,0 +1,54 @@
+"""Instance data validation plugin
+
+Validates XML or JSON instance documents against the validated
+modules, see pyang.instance.
+"""
+
+import optparse
+
+from pyang import plugin
+from pyang import instance
+
+def pyang_plugin_init():
+    plugin.register_plugin(InstancePlugin())
+
+class InstancePlugin(plugin.PyangPlugin):
+    def add_opts(self, optparser):
+        optlist = [
+            optparse.make_option("--instance",
+                                 dest="instance_files",
+                                 metavar="FILE",
+                                 default=[],
+                                 action="append",
+                                 help="Validate the XML or JSON instance"
+                                 " document FILE against the modules."
+                                 " This option can be given multiple"
+                                 " times."),
+            optparse.make_option("--instance-format",
+                                 dest="instance_format",
+                                 type="choice",
+                                 choices=["xml", "json"],
+                                 help="The format of the instance"
+                                 " documents, xml or json.  By default"
+                                 " it is guessed from the file"
+                                 " extension."),
+            optparse.make_option("--instance-target",
+                                 dest="instance_target",
+                                 type="choice",
+                                 choices=["data", "config"],
+                                 default="data",
+                                 help="The kind of instance documents,"
+                                 " data (default) or config.  State data"
+                                 " is not allowed in config."),
+            ]
+        g = optparser.add_option_group("Instance validation options")
+        g.add_options(optlist)
+
+    def post_validate_ctx(self, ctx, modules):
+        if not ctx.opts.instance_files:
+            return
+        schema = instance.compile_schema(ctx, modules)
+        for filename in ctx.opts.instance_files:
+            schema.validate(ctx.errors, filename, filename,
+                            ctx.opts.instance_format,
+                            ctx.opts.instance_target)
@@ -28,13 +28,6 @@ import xml.etree.ElementTree as ET
 from pyang import plugin, error
 from pyang.util import unique_prefixes
 
-ss = ET.Element("stylesheet",
-                {"version": "1.0",
-                 "xmlns": "http://www.w3.org/1999/XSL/Transform",
-                 "xmlns:nc": "urn:ietf:params:xml:ns:netconf:base:1.0",
-                 "xmlns:en": "urn:ietf:params:xml:ns:netconf:notification:1.0"})
-"""Root element of the output XSLT stylesheet."""
-
 type_class = dict((t,"unquoted") for t in
                   ("boolean", "int8", "int16", "int32",
                    "uint8", "uint16", "uint32"))
@@ -76,6 +69,13 @@ class JsonXslPlugin(plugin.PyangPlugin):
         for m in modules:
             self.top_names.extend([c.arg for c in m.i_children if
                                    c.keyword not in ("rpc", "notification")])
+        # root element of the output XSLT stylesheet
+        ss = self.ss = ET.Element(
+            "stylesheet",
+            {"version": "1.0",
+             "xmlns": "http://www.w3.org/1999/XSL/Transform",
+             "xmlns:nc": "urn:ietf:params:xml:ns:netconf:base:1.0",
+             "xmlns:en": "urn:ietf:params:xml:ns:netconf:notification:1.0"})
         tree = ET.ElementTree(ss)
         ET.SubElement(ss, "output", method="text")
         xsltdir = os.environ.get("PYANG_XSLT_DIR",
@@ -97,15 +97,13 @@ class JsonXslPlugin(plugin.PyangPlugin):
         """Process data nodes, RPCs and notifications in a single module."""
         for ann in yam.search(("ietf-yang-metadata", "annotation")):
             self.process_annotation(ann)
-        for ch in yam.i_children[:]:
+        for ch in yam.i_children:
             if ch.keyword == "rpc":
                 self.process_rpc(ch)
             elif ch.keyword == "notification":
                 self.process_notification(ch)
-            else:
-                continue
-            yam.i_children.remove(ch)
-        self.process_children(yam, "//nc:*", 1)
+        self.process_children(yam, "//nc:*", 1,
+                              omit=("rpc", "notification"))
 
     def process_annotation(self, ann):
         """Process metadata annotation."""
@@ -139,15 +137,18 @@ class JsonXslPlugin(plugin.PyangPlugin):
             self.xsl_withparam("nsid", ntf.i_module.i_modulename + ":", ct)
         self.process_children(ntf, p, 2)
 
-    def process_children(self, node, path, level, parent=None):
+    def process_children(self, node, path, level, parent=None, omit=()):
         """Process all children of `node`.
 
         `path` is the Xpath of `node` which is used in the 'select'
-        attribute of XSLT templates.
+        attribute of XSLT templates.  Children with a keyword in
+        `omit` are skipped.
         """
         data_parent = parent if parent else node
         chs = node.i_children
         for ch in chs:
+            if ch.keyword in omit:
+                continue
             if ch.keyword in ["choice", "case"]:
                 self.process_children(ch, path, level, node)
                 continue
@@ -225,7 +226,7 @@ class JsonXslPlugin(plugin.PyangPlugin):
 
     def xsl_template(self, name):
         """Construct an XSLT 'template' element matching `name`."""
-        return ET.SubElement(ss, "template" , match = name)
+        return ET.SubElement(self.ss, "template" , match = name)
 
     def xsl_text(self, text, parent):
         """Construct an XSLT 'text' element containing `text`.
@@ -4,6 +4,9 @@ to the YANG module(s).
 """
 
 import optparse
+import os
+import io
+import json
 
 from pyang import plugin
 from pyang import statements
@@ -27,6 +30,12 @@ class JSTreePlugin(plugin.PyangPlugin):
             optparse.make_option("--jstree-path",
                                  dest="jstree_path",
                                  help="Subtree to print"),
+            optparse.make_option("--jstree-shard-dir",
+                                 dest="jstree_shard_dir",
+                                 metavar="DIR",
+                                 help="""Write the children of each node
+                                       to a file in DIR, loaded by the
+                                       page when the node is expanded"""),
             ]
 
         g = optparser.add_option_group("JSTree output specific options")
@@ -42,9 +51,14 @@ class JSTreePlugin(plugin.PyangPlugin):
                 path = path[1:]
         else:
             path = None
+        if ctx.opts.jstree_shard_dir is not None:
+            os.makedirs(ctx.opts.jstree_shard_dir, exist_ok=True)
+        typestrings.clear()
         emit_header(modules, fd, ctx)
         emit_css(fd, ctx)
         emit_js(fd, ctx)
+        if ctx.opts.jstree_shard_dir is not None:
+            emit_shard_js(fd, ctx)
         emit_bodystart(modules, fd, ctx)
         emit_tree(modules, fd, ctx, path)
         emit_footer(fd, ctx)
@@ -188,6 +202,85 @@ function expandAllRows() {
 </script>
 """)
 
+def shard_url(ctx):
+    """Return the URL of the shard directory, relative to the page"""
+    if ctx.opts.outfile is not None:
+        pagedir = os.path.dirname(os.path.abspath(ctx.opts.outfile))
+    else:
+        pagedir = os.getcwd()
+    url = os.path.relpath(os.path.abspath(ctx.opts.jstree_shard_dir),
+                          pagedir)
+    return url.replace(os.sep, '/')
+
+def emit_shard_js(fd, ctx):
+    # The rows of the children of a node are in the file <id>.js in the
+    # shard directory, where <id> is the id of the node's row.  The file
+    # is loaded the first time the node is expanded, or when all nodes
+    # are expanded.
+    fd.write("""
+<script language="javascript1.2">
+var shardDir = """ + json.dumps(shard_url(ctx)) + """;
+var toggleLoadedRows = toggleRows;
+var expandLoadedRows = expandAllRows;
+
+function loadShard(row, done) {
+  row.setAttribute("data-loaded", "");
+  var script = document.createElement("script");
+  script.src = shardDir + "/" + row.id + ".js";
+  // a node without children has no file
+  script.onload = script.onerror = done;
+  document.body.appendChild(script);
+}
+
+toggleRows = function(elm) {
+  var row = elm.parentNode.parentNode.parentNode;
+  if (row.getAttribute("data-loaded") != null) {
+    toggleLoadedRows(elm);
+    return;
+  }
+  loadShard(row, function() { toggleLoadedRows(elm); });
+}
+
+expandAllRows = function() {
+  // load the rows of all folders, one level at a time, then show them
+  var rows = document.getElementsByTagName("TR");
+  var unloaded = [];
+  for (var i = 0; i < rows.length; i++) {
+    var r = rows[i];
+    var folder = r.getElementsByTagName("A")[0];
+    if (r.id != "" && r.getAttribute("data-loaded") == null &&
+        folder != null && folder.getAttribute("onclick") != null) {
+      unloaded.push(r);
+    }
+  }
+  if (unloaded.length == 0) {
+    expandLoadedRows();
+    return;
+  }
+  var pending = unloaded.length;
+  for (var j = 0; j < unloaded.length; j++) {
+    loadShard(unloaded[j], function() {
+      pending--;
+      if (pending == 0) {
+        expandAllRows();
+      }
+    });
+  }
+}
+
+function jstreeShard(id, rows) {
+  var row = document.getElementById(id);
+  row.insertAdjacentHTML("afterend", rows);
+  // hide the new rows, toggleLoadedRows() shows them
+  for (var r = row.nextElementSibling;
+       r != null && matchStart(r.id, id + "-", false);
+       r = r.nextElementSibling) {
+    r.style.display = "none";
+  }
+}
+</script>
+""")
+
 def emit_header(modules, fd, ctx):
     title = ""
     for m in modules:
@@ -307,7 +400,8 @@ def emit_tree(modules, fd, ctx, path):
             #fd.write("<td>module</td><td></td><td></td><td></td><td></td></tr>\n")
 
             # print_children(chs, module, fd, '  ', path, 'data', depth, llen)
-            print_children(chs, module, fd, ' ', path, ctx, 2)
+            print_subtree(chs, module, fd, ' ', path, ctx, 2,
+                          str(levelcnt[1]))
 
         rpcs = module.search('rpc')
         if path is not None:
@@ -330,7 +424,8 @@ def emit_tree(modules, fd, ctx, path):
                             </div>
                          </td> \n""" %(levelcnt[1],prstr))
             fd.write("<td></td><td></td><td></td><td></td><td></td></tr>\n")
-            print_children(rpcs, module, fd, ' ', path, ctx, 2)
+            print_subtree(rpcs, module, fd, ' ', path, ctx, 2,
+                          str(levelcnt[1]))
 
         notifs = module.search('notification')
         if path is not None:
@@ -351,13 +446,30 @@ def emit_tree(modules, fd, ctx, path):
                            </div>
                         </td> \n""" %(levelcnt[1],prstr))
             fd.write("<td></td><td></td><td></td><td></td><td></td></tr>\n")
-            print_children(notifs, module, fd, ' ', path, ctx, 2)
+            print_subtree(notifs, module, fd, ' ', path, ctx, 2,
+                          str(levelcnt[1]))
 
 
 def print_children(i_children, module, fd, prefix, path, ctx, level=0):
     for ch in i_children:
         print_node(ch, module, fd, prefix, path, ctx, level)
 
+def print_subtree(i_children, module, fd, prefix, path, ctx, level, rowid):
+    """Print the rows of the children of the row `rowid`.  With
+    --jstree-shard-dir, they are written to the row's shard file
+    instead of `fd`."""
+    if ctx.opts.jstree_shard_dir is None:
+        print_children(i_children, module, fd, prefix, path, ctx, level)
+        return
+    if not i_children:
+        return
+    buf = io.StringIO()
+    print_children(i_children, module, buf, prefix, path, ctx, level)
+    filename = os.path.join(ctx.opts.jstree_shard_dir, rowid + '.js')
+    with open(filename, 'w', encoding='utf-8') as shard:
+        shard.write('jstreeShard("%s", %s);\n' %
+                    (rowid, json.dumps(buf.getvalue())))
+
 def print_node(s, module, fd, prefix, path, ctx, level=0):
 
     fontstarttag = ""
@@ -495,10 +607,7 @@ def print_node(s, module, fd, prefix, path, ctx, level=0):
             chs = [ch for ch in chs
                    if ch.arg == path[0]]
             path = path[1:]
-        if s.keyword in ['choice', 'case']:
-            print_children(chs, module, fd, prefix, path, ctx, level)
-        else:
-            print_children(chs, module, fd, prefix, path, ctx, level)
+        print_subtree(chs, module, fd, prefix, path, ctx, level, idstring)
 
 def get_status_str(s):
     status = s.search_one('status')
@@ -524,7 +633,18 @@ def get_typename(s):
     else:
         return ''
 
+# typestring() of each type statement, cleared by each emit
+typestrings = {}
+
 def typestring(node):
+    t = node.search_one('type')
+    if t is None:
+        return ""
+    if t not in typestrings:
+        typestrings[t] = get_typestring(node)
+    return typestrings[t]
+
+def get_typestring(node):
 
     def get_nontypedefstring(node):
         s = ""
@@ -72,6 +72,7 @@ class SampleXMLSkeletonPlugin(plugin.PyangPlugin):
     def add_output_format(self, fmts):
         self.multiple_modules = True
         fmts['sample-xml-skeleton'] = self
+        self.output_suffix = '.xml'
 
     def emit(self, ctx, modules, fd):
         """Main control function.
@@ -106,15 +107,6 @@ class SampleXMLSkeletonPlugin(plugin.PyangPlugin):
             "list": self.list,
             "leaf-list": self.leaf_list
         }
-        self.ns_uri = {}
-        for yam in modules:
-            if yam.keyword == 'module':
-                self.ns_uri[yam] = yam.search_one("namespace").arg
-                for imp in yam.search('import'):
-                    iyam = ctx.get_module(imp.arg)
-                    if iyam:
-                        self.ns_uri[iyam] = iyam.search_one("namespace").arg
-
         self.top = etree.Element(
             self.doctype,
             {"xmlns": "urn:ietf:params:xml:ns:netconf:base:1.0"})
@@ -212,7 +204,10 @@ class SampleXMLSkeletonPlugin(plugin.PyangPlugin):
         res = etree.SubElement(parent, node.arg)
         mm = node.main_module()
         if mm != module:
-            res.attrib["xmlns"] = self.ns_uri.get(mm, "urn:UNKNOWN")
+            # mm may also be a module which augments one of the modules
+            # emitted, without being one of them itself
+            ns = mm.search_one("namespace")
+            res.attrib["xmlns"] = ns.arg if ns is not None else "urn:UNKNOWN"
             module = mm
         return res, module, path
 
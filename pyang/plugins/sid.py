@@ -70,6 +70,12 @@ class SidPlugin(plugin.PyangPlugin):
                          dest="extra_sid_range",
                          help="Add an extra SID range during "
                          "a .sid file update."),
+            optparse.make_option("--sid-batch",
+                         action="store",
+                         type="string",
+                         dest="sid_batch",
+                         help="Generate, update or check the .sid files "
+                         "of all modules listed in a file."),
             ]
 
         g = optparser.add_option_group("SID file specific options")
@@ -91,6 +97,8 @@ class SidPlugin(plugin.PyangPlugin):
             nbr_option_specified += 1
         if ctx.opts.check_sid_file is not None:
             nbr_option_specified += 1
+        if ctx.opts.sid_batch is not None:
+            nbr_option_specified += 1
         if nbr_option_specified == 0:
             return
         if nbr_option_specified > 1:
@@ -98,6 +106,9 @@ class SidPlugin(plugin.PyangPlugin):
                 "on .sid file can be requested.\n")
             return
 
+        if ctx.opts.sid_batch is not None:
+            process_batch(ctx, ctx.opts.sid_batch)
+
         fatal_error = False
         for _, etag, _ in ctx.errors:
             if not error.is_warning(error.err_level(etag)):
@@ -107,67 +118,193 @@ class SidPlugin(plugin.PyangPlugin):
             sys.stderr.write("Invalid YANG module\n")
             return
 
-        sid_file = SidFile()
-
-        if ctx.opts.sid_registration_info:
-            sid_file.sid_registration_info = True
-
-        if ctx.opts.generate_sid_file is not None:
-            sid_file.range = ctx.opts.generate_sid_file
-            sid_file.is_consistent = False
-            sid_file.sid_file_created = True
-
-        if ctx.opts.update_sid_file is not None:
-            sid_file.input_file_name = ctx.opts.update_sid_file
-            sid_file.update = True
-
-        if ctx.opts.check_sid_file is not None:
-            sid_file.input_file_name = ctx.opts.check_sid_file
-            sid_file.check_consistency = True
-            if not sid_file.sid_registration_info:
-                print("Checking consistency of '%s'"
-                      % sid_file.input_file_name)
-
-        if ctx.opts.extra_sid_range is not None:
-            if ctx.opts.update_sid_file is not None:
-                sid_file.extra_range = ctx.opts.extra_sid_range
-            else:
-                sys.stderr.write("An extra SID range can be specified " +
-                    "only during a .sid file update.\n")
-                return
-
-        if ctx.opts.list_sid:
-            sid_file.list_content = True
+        sid_file = make_sid_file(ctx, ctx.opts.generate_sid_file,
+                                 ctx.opts.update_sid_file,
+                                 ctx.opts.check_sid_file,
+                                 ctx.opts.extra_sid_range)
+        if sid_file is None:
+            return
 
-        if ctx.opts.finalize_sid:
-            print("Will mark unstable allocations finalized")
-            sid_file.check_consistency = False
-            sid_file.is_consistent = False
-            sid_file.finalize_sid  = True
+        if process_module(sid_file, modules[0]):
+            sys.exit(0)
+        sys.exit(1)
 
-        try:
-            sid_file.process_sid_file(modules[0])
-
-        except SidParsingError as e:
-            sys.stderr.write("ERROR, %s\n" % e)
-        except SidFileError as e:
-            sys.stderr.write("ERROR in '%s', %s\n" %
-                             (sid_file.input_file_name, e))
-        except EnvironmentError as e:
-            if e.errno == errno.ENOENT:
-                sys.stderr.write("ERROR, file '%s' not found\n"
-                                 % e.filename)
-            else:
-                sys.stderr.write("ERROR, in file '%s' " % e.filename)
-        except JSONDecodeError as e:
-            sys.stderr.write("ERROR in '%s', %s\n"
-                             % (sid_file.input_file_name, e))
-        except ValueError as e:
-            sys.stderr.write("ERROR in '%s', invalid JSON content\n"
-                             % sid_file.input_file_name)
+def make_sid_file(ctx, generate_range, update_file, check_file, extra_range):
+    """Create a SidFile for one of the three operations, with the
+    other options from the command line.  Returns None if the options
+    are invalid."""
+    sid_file = SidFile()
+
+    if ctx.opts.sid_registration_info:
+        sid_file.sid_registration_info = True
+
+    if generate_range is not None:
+        sid_file.range = generate_range
+        sid_file.is_consistent = False
+        sid_file.sid_file_created = True
+
+    if update_file is not None:
+        sid_file.input_file_name = update_file
+        sid_file.update = True
+
+    if check_file is not None:
+        sid_file.input_file_name = check_file
+        sid_file.check_consistency = True
+        if not sid_file.sid_registration_info:
+            print("Checking consistency of '%s'"
+                  % sid_file.input_file_name)
+
+    if extra_range is not None:
+        if update_file is not None:
+            sid_file.extra_range = extra_range
         else:
-            sys.exit(0)
+            sys.stderr.write("An extra SID range can be specified " +
+                "only during a .sid file update.\n")
+            return None
+
+    if ctx.opts.list_sid:
+        sid_file.list_content = True
+
+    if ctx.opts.finalize_sid:
+        print("Will mark unstable allocations finalized")
+        sid_file.check_consistency = False
+        sid_file.is_consistent = False
+        sid_file.finalize_sid  = True
+
+    return sid_file
+
+def process_module(sid_file, module):
+    """Process the .sid file of `module`.  Errors are printed on stderr.
+    Returns True on success."""
+    try:
+        sid_file.process_sid_file(module)
+
+    except SidParsingError as e:
+        sys.stderr.write("ERROR, %s\n" % e)
+    except SidFileError as e:
+        sys.stderr.write("ERROR in '%s', %s\n" %
+                         (sid_file.input_file_name, e))
+    except EnvironmentError as e:
+        if e.errno == errno.ENOENT:
+            sys.stderr.write("ERROR, file '%s' not found\n"
+                             % e.filename)
+        else:
+            sys.stderr.write("ERROR, in file '%s' " % e.filename)
+    except JSONDecodeError as e:
+        sys.stderr.write("ERROR in '%s', %s\n"
+                         % (sid_file.input_file_name, e))
+    except ValueError as e:
+        sys.stderr.write("ERROR in '%s', invalid JSON content\n"
+                         % sid_file.input_file_name)
+    else:
+        return True
+    return False
+
+batch_operations = ('generate', 'update', 'check')
+
+def read_batch_file(filename):
+    """Read a batch file, with one line per module:
+
+      <module>[@<revision>] generate {count | <entry-point>:<size>}
+      <module>[@<revision>] update <sid-file> [{count | <entry-point>:<size>}]
+      <module>[@<revision>] check <sid-file>
+
+    Empty lines and lines starting with '#' are ignored.
+
+    Returns a list of (line, modulename, revision, operation, argument,
+    extra-range)."""
+    entries = []
+    with open(filename, encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            if (len(fields) < 3 or fields[1] not in batch_operations or
+                    len(fields) > (4 if fields[1] == 'update' else 3)):
+                raise SidParsingError("%s:%d: expected '<module> "
+                                      "{generate | update | check} "
+                                      "<argument>'" % (filename, lineno))
+            modulename, _, revision = fields[0].partition('@')
+            extra_range = fields[3] if len(fields) == 4 else None
+            entries.append((lineno, modulename, revision or None,
+                            fields[1], fields[2], extra_range))
+    return entries
+
+def find_module(ctx, modulename, revision):
+    """Return the validated module `modulename`, by default its latest
+    revision, or None if the module is not in the context."""
+    found = None
+    for (name, rev), module in ctx.modules.items():
+        if (name != modulename or module is None or
+                revision is not None and rev != revision):
+            continue
+        if rev == 'unknown':
+            rev = ''
+        if found is None or rev > found[0]:
+            found = (rev, module)
+    return found[1] if found is not None else None
+
+def module_errors(ctx, module):
+    """Return the errors reported in `module` and its submodules"""
+    res = []
+    for epos, etag, eargs in ctx.errors:
+        top = epos.top
+        if top is not None and (
+                top is module or
+                getattr(top, 'i_modulename', None) == module.arg):
+            res.append((epos, etag, eargs))
+    return res
+
+def process_batch(ctx, filename):
+    """Process the .sid files of all modules listed in the batch file
+    `filename`.  All modules are validated in `ctx`, so modules they
+    share are validated once.  Exits with status 1 if any module
+    failed."""
+    try:
+        entries = read_batch_file(filename)
+    except SidParsingError as e:
+        sys.stderr.write("ERROR, %s\n" % e)
         sys.exit(1)
+    except EnvironmentError as e:
+        sys.stderr.write("ERROR, file '%s' not found\n" % e.filename)
+        sys.exit(1)
+
+    failed = []
+    for lineno, modulename, revision, operation, arg, extra_range in entries:
+        name = modulename if revision is None else \
+               '%s@%s' % (modulename, revision)
+        print("\n=== %s" % name)
+        module = find_module(ctx, modulename, revision)
+        if module is None:
+            sys.stderr.write("ERROR, %s:%d: module '%s' not found\n"
+                             % (filename, lineno, name))
+            failed.append(name)
+            continue
+
+        errors = module_errors(ctx, module)
+        fatal_error = False
+        for _, etag, _ in errors:
+            if not error.is_warning(error.err_level(etag)):
+                fatal_error = True
+        if fatal_error or errors and operation == 'check':
+            sys.stderr.write("Invalid YANG module '%s'\n" % name)
+            failed.append(name)
+            continue
+
+        sid_file = make_sid_file(
+            ctx,
+            arg if operation == 'generate' else None,
+            arg if operation == 'update' else None,
+            arg if operation == 'check' else None,
+            extra_range)
+        if sid_file is None or not process_module(sid_file, module):
+            failed.append(name)
+
+    print("\n%d module(s) processed, %d failed"
+          % (len(entries), len(failed)))
+    for name in failed:
+        print("  %s" % name)
+    sys.exit(1 if failed else 0)
 
 def print_help():
     print("""
@@ -184,6 +321,7 @@ pyang [--sid-list] --sid-generate-file {count | entry-point:size} yang-filename
 pyang [--sid-list] --sid-update-file sid-filename yang-filename
       [--sid-extra-range {count | entry-point:size}]
 pyang [--sid-list] --sid-check-file sid-filename yang-filename
+pyang [--sid-list] --sid-batch batch-filename yang-filename...
 
 
 OPTIONS
@@ -279,6 +417,30 @@ OPTIONS
 
   $ pyang --sid-update-file toaster@2009-11-20.sid
           toaster@2009-12-28.yang --sid-extra-range count
+
+--sid-batch
+
+  The .sid files of many YANG modules can be generated, updated or checked
+  in one run with the --sid-batch option. All YANG modules are validated
+  together, so that the modules they import are validated only once.
+
+  The batch file lists one module per line, followed by the operation and
+  its arguments. Empty lines and lines starting with # are ignored.
+
+    <module>[@<revision>] generate {count | entry-point:size}
+    <module>[@<revision>] update sid-filename [{count | entry-point:size}]
+    <module>[@<revision>] check sid-filename
+
+  The last field of an update is an optional extra SID range, see
+  --sid-extra-range. The result of each module is printed, followed by a
+  summary.
+
+  For example:
+
+  $ cat sids.txt
+  toaster generate 20000:100
+  example update example@2020-01-01.sid
+  $ pyang --sid-batch sids.txt toaster@2009-11-20.yang example@2021-01-01.yang
 """)
 
 ############################################################
@@ -306,6 +468,10 @@ class SidFile:
         self.count = False
         self.node_highest = 0
         self.content = {}
+        # Indexes of the items in self.content['item'], which is kept in
+        # the .sid file order
+        self.items_by_key = {}
+        self.items_by_sid = {}
         self.module_name = ''
         self.module_revision = ''
         self.output_file_name = ''
@@ -667,12 +833,16 @@ class SidFile:
         for item in self.content['item']:
             # Set to 'd' deleted, updated to 'o' if present in .yang file
             item['lifecycle'] = 'd'
+        self.index_items()
 
         self.merge_item('module', self.module_name)
 
         for name in module.i_ctx.modules:
-            if module.i_ctx.modules[name].keyword == 'submodule':
-                self.merge_item('module', module.i_ctx.modules[name].arg)
+            submodule = module.i_ctx.modules[name]
+            # the context may contain the submodules of other modules
+            if (submodule.keyword == 'submodule' and
+                    submodule.i_modulename == self.module_name):
+                self.merge_item('module', submodule.arg)
 
         for feature in module.i_features:
             self.merge_item('feature', feature)
@@ -793,16 +963,28 @@ class SidFile:
 
         return prefix + path
 
-    def merge_item(self, namespace, identifier):
+    ########################################################
+    # Index the items by (namespace, identifier) and by sid
+    def index_items(self):
+        self.items_by_key = {}
+        self.items_by_sid = {}
         for item in self.content['item']:
-            if (namespace == item['namespace'] and
-                    identifier == item['identifier']):
-                item['lifecycle'] = 'o' # Item already assigned
-                return
-        self.content['item'].append(collections.OrderedDict(
+            self.items_by_key.setdefault(
+                (item['namespace'], item['identifier']), item)
+            if item['sid'] != -1:
+                self.items_by_sid[item['sid']] = item
+
+    def merge_item(self, namespace, identifier):
+        item = self.items_by_key.get((namespace, identifier))
+        if item is not None:
+            item['lifecycle'] = 'o' # Item already assigned
+            return
+        item = collections.OrderedDict(
             [('namespace', namespace), ('identifier', identifier),
              ('status', 'unstable'),
-             ('sid', -1), ('lifecycle', 'n')]))
+             ('sid', -1), ('lifecycle', 'n')])
+        self.content['item'].append(item)
+        self.items_by_key[(namespace, identifier)] = item
         self.is_consistent = False
 
     ########################################################
@@ -893,7 +1075,7 @@ class SidFile:
         unassigned = [item for item in items if item['sid'] == -1]
         if not unassigned:
             return
-        used = sorted(item['sid'] for item in items if item['sid'] != -1)
+        used = sorted(self.items_by_sid)
         needed = len(unassigned)
         source = self.gen_sids(used)
 
@@ -901,6 +1083,7 @@ class SidFile:
             try:
                 item['sid'] = next(source)
                 item['status'] = 'unstable'
+                self.items_by_sid[item['sid']] = item
             except StopIteration:
                 raise SidParsingError(
                     "The current SID range(s) are exhausted, %d extra SID(s) "
@@ -909,10 +1092,7 @@ class SidFile:
             needed -= 1
 
     def sid_used(self, sid):
-        for item in self.content['item']:
-            if item['sid'] == sid:
-                return True
-        return False
+        return sid in self.items_by_sid
 
     def gen_sids(self, used):
         ranges = sorted((arange['entry-point'], arange['size'])
@@ -1053,16 +1233,15 @@ class SidFile:
         return size
 
     def number_of_unassigned_yang_items(self):
-        return len([0 for item in self.content['item'] if item['sid'] == -1])
+        return len(self.content['item']) - len(self.items_by_sid)
 
     def number_of_sids_used(self):
-        return len([0 for item in self.content['item'] if item['sid'] != -1])
+        return len(self.items_by_sid)
 
     def number_of_sids_used_in_range(self, entry_point, size):
         low = entry_point
         high = low + size
-        return len([0 for item in self.content['item']
-                if low <= item['sid'] < high])
+        return len([0 for sid in self.items_by_sid if low <= sid < high])
 
     ########################################################
     def print_registration_information(self, module):
@@ -1087,7 +1266,8 @@ class SidFile:
 
         for name in module.i_ctx.modules:
             submodule = module.i_ctx.modules[name]
-            if submodule.keyword == 'submodule':
+            if (submodule.keyword == 'submodule' and
+                    submodule.i_modulename == self.module_name):
                 submodules.append('%s@%s.yang'
                                 % (submodule.arg, submodule.i_latest_revision))
 
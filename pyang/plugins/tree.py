@@ -23,6 +23,7 @@ class TreePlugin(plugin.PyangPlugin):
     def add_output_format(self, fmts):
         self.multiple_modules = True
         fmts['tree'] = self
+        self.output_suffix = '.tree'
 
     def add_opts(self, optparser):
         optlist = [
@@ -89,8 +90,10 @@ class TreePlugin(plugin.PyangPlugin):
                 path = path[1:]
         else:
             path = None
+        fd = util.BufferedWriter(fd)
         emit_tree(ctx, modules, fd, ctx.opts.tree_depth,
                   ctx.opts.tree_line_length, path)
+        fd.flush()
 
 def print_help():
     print("""
@@ -146,6 +149,8 @@ def emit_tree(ctx, modules, fd, depth, llen, path):
             printed_header.append(None)
 
     printed_header = []
+    # the widths of the choice and case nodes, computed once
+    widths = {}
 
     for module in modules:
         if printed_header:
@@ -165,7 +170,8 @@ def emit_tree(ctx, modules, fd, depth, llen, path):
             print_header(module)
             print_children(chs, module, fd, '', chpath, 'data', depth, llen,
                            ctx.opts.tree_no_expand_uses,
-                           prefix_with_modname=ctx.opts.modname_prefix)
+                           prefix_with_modname=ctx.opts.modname_prefix,
+                           widths=widths)
 
         mods = [module]
         for i in module.search('include'):
@@ -194,7 +200,8 @@ def emit_tree(ctx, modules, fd, depth, llen, path):
                     print_children(augment.i_children, m, fd,
                                    '  ', path, mode, depth, llen,
                                    ctx.opts.tree_no_expand_uses,
-                                   prefix_with_modname=ctx.opts.modname_prefix)
+                                   prefix_with_modname=ctx.opts.modname_prefix,
+                                   widths=widths)
 
         rpcs = [ch for ch in module.i_children
                 if ch.keyword == 'rpc']
@@ -210,7 +217,8 @@ def emit_tree(ctx, modules, fd, depth, llen, path):
             fd.write("\n  rpcs:\n")
             print_children(rpcs, module, fd, '  ', rpath, 'rpc', depth, llen,
                            ctx.opts.tree_no_expand_uses,
-                           prefix_with_modname=ctx.opts.modname_prefix)
+                           prefix_with_modname=ctx.opts.modname_prefix,
+                           widths=widths)
 
         notifs = [ch for ch in module.i_children
                   if ch.keyword == 'notification']
@@ -227,7 +235,8 @@ def emit_tree(ctx, modules, fd, depth, llen, path):
             print_children(notifs, module, fd, '  ', npath,
                            'notification', depth, llen,
                            ctx.opts.tree_no_expand_uses,
-                           prefix_with_modname=ctx.opts.modname_prefix)
+                           prefix_with_modname=ctx.opts.modname_prefix,
+                           widths=widths)
 
         if ctx.opts.tree_print_groupings:
             section_delimiter_printed = False
@@ -241,7 +250,8 @@ def emit_tree(ctx, modules, fd, depth, llen, path):
                     print_children(g.i_children, m, fd,
                                    '  ', path, 'grouping', depth, llen,
                                    ctx.opts.tree_no_expand_uses,
-                                   prefix_with_modname=ctx.opts.modname_prefix)
+                                   prefix_with_modname=ctx.opts.modname_prefix,
+                                   widths=widths)
 
         if ctx.opts.tree_print_yang_data:
             yds = module.search(('ietf-restconf', 'yang-data'))
@@ -256,7 +266,8 @@ def emit_tree(ctx, modules, fd, depth, llen, path):
                     print_children(yd.i_children, module, fd, '  ', path,
                                    'yang-data', depth, llen,
                                    ctx.opts.tree_no_expand_uses,
-                                   prefix_with_modname=ctx.opts.modname_prefix)
+                                   prefix_with_modname=ctx.opts.modname_prefix,
+                                   widths=widths)
 
         if ctx.opts.tree_print_structures:
             sxs = module.search(('ietf-yang-structure-ext', 'structure'))
@@ -272,7 +283,8 @@ def emit_tree(ctx, modules, fd, depth, llen, path):
                     print_children(sx.i_children, module, fd, '  ', path,
                                    'structure', depth, llen,
                                    ctx.opts.tree_no_expand_uses,
-                                   prefix_with_modname=ctx.opts.modname_prefix)
+                                   prefix_with_modname=ctx.opts.modname_prefix,
+                                   widths=widths)
 
             sxs = module.search(('ietf-yang-structure-ext',
                                  'augment-structure'))
@@ -288,7 +300,8 @@ def emit_tree(ctx, modules, fd, depth, llen, path):
                     print_children(sx.i_children, module, fd, '  ', path,
                                    'structure', depth, llen,
                                    ctx.opts.tree_no_expand_uses,
-                                   prefix_with_modname=ctx.opts.modname_prefix)
+                                   prefix_with_modname=ctx.opts.modname_prefix,
+                                   widths=widths)
 
 
 def unexpand_uses(i_children):
@@ -340,15 +353,23 @@ def print_path(pre, post, path, fd, llen):
         print_comps(pre, p, True)
 
 def print_children(i_children, module, fd, prefix, path, mode, depth,
-                   llen, no_expand_uses, width=0, prefix_with_modname=False):
+                   llen, no_expand_uses, width=0, prefix_with_modname=False,
+                   widths=None):
     if depth == 0:
         if i_children:
             fd.write(prefix + '     ...\n')
         return
+    if widths is None:
+        widths = {}
     def get_width(w, chs):
         for ch in chs:
             if ch.keyword in ['choice', 'case']:
-                nlen = 3 + get_width(0, ch.i_children)
+                # the width of a choice or case is needed at each level
+                # above it, up to the closest data node
+                key = (ch, module.i_modulename)
+                nlen = widths.get(key)
+                if nlen is None:
+                    nlen = widths[key] = 3 + get_width(0, ch.i_children)
             else:
                 if ch.i_module.i_modulename == module.i_modulename:
                     nlen = len(ch.arg)
@@ -383,10 +404,12 @@ def print_children(i_children, module, fd, prefix, path, mode, depth,
                 mode = 'output'
             print_node(ch, module, fd, newprefix, path, mode, depth, llen,
                        no_expand_uses, width,
-                       prefix_with_modname=prefix_with_modname)
+                       prefix_with_modname=prefix_with_modname,
+                       widths=widths)
 
 def print_node(s, module, fd, prefix, path, mode, depth, llen,
-               no_expand_uses, width, prefix_with_modname=False):
+               no_expand_uses, width, prefix_with_modname=False,
+               widths=None):
 
     line = "%s%s--" % (prefix[0:-1], get_status_str(s))
 
@@ -485,11 +508,13 @@ def print_node(s, module, fd, prefix, path, mode, depth, llen,
         if s.keyword in ['choice', 'case']:
             print_children(chs, module, fd, prefix, path, mode, depth,
                            llen, no_expand_uses, width - 3,
-                           prefix_with_modname=prefix_with_modname)
+                           prefix_with_modname=prefix_with_modname,
+                           widths=widths)
         else:
             print_children(chs, module, fd, prefix, path, mode, depth, llen,
                            no_expand_uses,
-                           prefix_with_modname=prefix_with_modname)
+                           prefix_with_modname=prefix_with_modname,
+                           widths=widths)
 
 def get_status_str(s):
     status = s.search_one('status')
@@ -32,6 +32,18 @@ class Repository(object):
         Raises `ReadError`
         """
 
+    def open_module_from_handle(self, handle):
+        """Return the raw YIN module text as a binary file
+
+        Returns (`ref`, `fd`) if the module is a YIN module which can be
+        read from the binary file object `fd`, and None otherwise, in
+        which case the module is read with get_module_from_handle().
+        The caller closes `fd`.
+
+        Raises `ReadError`
+        """
+        return None
+
     class ReadError(Exception):
         """Signals that an error occured during module retrieval"""
 
@@ -160,3 +172,15 @@ class FileRepository(Repository):
         if in_format is None:
             in_format = util.guess_format(text)
         return absfilename, in_format, text
+
+    def open_module_from_handle(self, handle):
+        in_format, absfilename = handle
+        if in_format != 'yin':
+            return None
+        try:
+            fd = io.open(absfilename, "rb")
+        except IOError as ex:
+            raise self.ReadError("%s: %s" % (absfilename, ex))
+        if self.verbose:
+            util.report_file_read(absfilename)
+        return absfilename, fd
@@ -1,14 +1,16 @@
 #! /usr/bin/env python
 import argparse
 import codecs
+import io
 import json
 import numbers
 import re
 import sys
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
 
-
-
+DRIVER_MAGIC = "json2xml-driver-2"
+"""Tag of a precompiled driver, see `compile_driver()`."""
 
 class Error(Exception):
     """Abstract base class for exceptions in this program."""
@@ -84,6 +86,209 @@ class JSONError(Error):
     def __str__(self):
         return "%s" % self.path
 
+class LateAnnotationError(Error):
+    """
+    Exception raised in streaming mode for an annotation of a node that
+    has already been written.
+    """
+
+    def __str__(self):
+        return Error.__str__(self) + (
+            " - annotation must precede the following containers and lists"
+            " (required with --stream)")
+
+def compile_driver(jtox, outfile):
+    """Write the driver `jtox` in the precompiled form to `outfile`.
+
+    The precompiled form is a JSON object with the members "driver",
+    which is `DRIVER_MAGIC`, and "objects", a table of the lists and
+    objects of the driver structure, in which equal subtrees (e.g.,
+    from groupings, and type specifications) are stored only once.
+    Each item of the table is {"l": [values]} for a list, or
+    {"d": [[key, value], ...]} for an object, where a value which is a
+    list or an object is given as [index] of an earlier item.  The last
+    item is the driver.  It is smaller than the JSON text produced by
+    the jtox plugin, and the loaded driver uses less memory.
+    """
+    objects = []
+    _tabulate(_share(jtox, {}), objects, {})
+    outfile.write(json.dumps({"driver": DRIVER_MAGIC, "objects": objects},
+                             separators=(",", ":")))
+
+def _share(obj, memo):
+    # return an object equal to `obj`, where equal lists and dicts are
+    # replaced by the same object
+    if isinstance(obj, list):
+        obj = [_share(o, memo) for o in obj]
+        key = ("list",) + tuple(_share_key(o) for o in obj)
+    elif isinstance(obj, dict):
+        obj = dict((k, _share(obj[k], memo)) for k in obj)
+        key = ("dict",) + tuple((k, _share_key(obj[k])) for k in obj)
+    else:
+        return obj
+    return memo.setdefault(key, obj)
+
+def _share_key(obj):
+    if isinstance(obj, (list, dict)):
+        # a shared object, kept alive by the memo
+        return id(obj)
+    return (type(obj), obj)
+
+def _tabulate(obj, objects, index):
+    # add the lists and dicts in `obj` to the table `objects`, children
+    # first, and return the value of `obj` in an item of the table
+    if not isinstance(obj, (list, dict)):
+        return obj
+    i = index.get(id(obj))
+    if i is None:
+        if isinstance(obj, list):
+            item = {"l": [_tabulate(o, objects, index) for o in obj]}
+        else:
+            item = {"d": [[k, _tabulate(obj[k], objects, index)]
+                          for k in obj]}
+        i = index[id(obj)] = len(objects)
+        objects.append(item)
+    return [i]
+
+def _untabulate(objects):
+    # return the driver from the table `objects`, see compile_driver()
+    res = []
+    for item in objects:
+        if "l" in item:
+            res.append([res[v[0]] if isinstance(v, list) else v
+                        for v in item["l"]])
+        else:
+            res.append(dict((k, res[v[0]] if isinstance(v, list) else v)
+                            for k, v in item["d"]))
+    return res[-1]
+
+def load_driver(infile):
+    """Return the driver from `infile`, either in the JSON form produced
+    by the jtox plugin or in the precompiled form."""
+    data = json.loads(infile.read().decode("utf-8"))
+    if isinstance(data, dict) and "driver" in data:
+        if data["driver"] != DRIVER_MAGIC:
+            raise ValueError("invalid precompiled driver")
+        try:
+            return _untabulate(data["objects"])
+        except (KeyError, IndexError, TypeError, ValueError):
+            raise ValueError("invalid precompiled driver")
+    return data
+
+class JSONReader(object):
+    """Read a JSON document incrementally from a text file.
+
+    Objects and arrays can be read member by member with `members()`
+    and `items()`, other values are read as a whole with `read_value()`.
+    """
+
+    ws_re = re.compile(r"[ \t\n\r]*")
+
+    def __init__(self, fp, chunk_size=65536):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.offset = 0
+        """offset of `self.buf` in the document"""
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self):
+        """Read more input; return False at the end of the input."""
+        if self.eof:
+            return False
+        # read at least as much as is buffered, so that a long value is
+        # decoded a few times only
+        chunk = self.fp.read(max(self.chunk_size, len(self.buf) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+        self.offset += self.pos
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def error(self, msg, pos=None):
+        if pos is None:
+            pos = self.pos
+        return JSONError("%s: char %d" % (msg, self.offset + pos))
+
+    def peek(self):
+        """Skip whitespace and return the next character, or "" at the
+        end of the input."""
+        while True:
+            self.pos = self.ws_re.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise self.error("Expecting '%s'" % char)
+        self.pos += 1
+
+    def read_value(self):
+        """Read the next value completely and return it."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError as e:
+                if self.fill():
+                    continue
+                raise self.error(getattr(e, "msg", "Invalid value"),
+                                 getattr(e, "pos", None))
+            # a number may continue in the next chunk
+            if end < len(self.buf) or not self.fill():
+                self.pos = end
+                return value
+
+    def members(self):
+        """Generate the member names of the next object.
+
+        The caller has to read the value of each member before
+        continuing with the next one.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise self.error("Expecting property name")
+            name = self.read_value()
+            self.expect(":")
+            yield name
+            char = self.peek()
+            if char not in ",}":
+                raise self.error("Expecting ',' delimiter")
+            self.pos += 1
+            if char == "}":
+                return
+
+    def items(self):
+        """Generate the indices of the items of the next array.
+
+        The caller has to read each item before continuing with the next
+        one.
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        i = 0
+        while True:
+            yield i
+            char = self.peek()
+            if char not in ",]":
+                raise self.error("Expecting ',' delimiter")
+            self.pos += 1
+            if char == "]":
+                return
+            i += 1
+
 
 class Translator (object):
     """Translate JSON to XML according to a YANG data model.
@@ -404,6 +609,254 @@ class Translator (object):
             return result
         return str(value)
 
+class StreamTranslator(Translator):
+    """Translate JSON to XML incrementally.
+
+    The JSON document is read with `JSONReader`, and the XML text is
+    written as soon as possible, without building ElementTree elements.
+    Containers and lists are read member by member and entry by entry;
+    each list entry and each leaf, leaf-list and anyxml value is read as
+    a whole.  The memory used is thus bounded by the largest list entry
+    rather than by the size of the document.
+
+    Leaves, leaf-lists and anyxml nodes of a container are written when
+    a child container or list begins, or at the end of the container.
+    Their annotations, as well as the "@" member of the container, must
+    appear before that point, otherwise `LateAnnotationError` is raised.
+
+    Instance variables:
+
+    - `self.write`: function that writes a string to the output
+    """
+
+    nc_uri = "urn:ietf:params:xml:ns:netconf:base:1.0"
+
+    def __init__(self, jtox, write):
+        Translator.__init__(self, jtox)
+        self.write = write
+
+    def xml_qname(self, mod_name, node_name):
+        """Return the qualified node name as written to the output."""
+        return "%s:%s" % (self.prefix[mod_name], node_name)
+
+    def translate_stream(self, json_file, target):
+        """Translate the JSON document read from `json_file`, and write
+        it as an XML document with the root element nc:`target`.
+
+        All namespaces are declared in the root element.
+        """
+        reader = JSONReader(json_file)
+        qname = "nc:" + target
+        xmlns = [' xmlns:nc="%s"' % self.nc_uri]
+        for m in sorted(self.prefix):
+            xmlns.append(' xmlns:%s=%s'
+                         % (self.prefix[m], self.xml_attr(self.uri[m])))
+        self.write("<?xml version='1.0' encoding='utf-8'?>\n")
+        self.stream_obj(reader, None, self.tree, qname, "/", "".join(xmlns))
+        if reader.peek() != "":
+            raise reader.error("Extra data")
+
+    def stream_obj(self, reader, ns, node, qname, path, xmlns=""):
+        """Read an object from `reader` and write it as element `qname`.
+
+        The start tag is delayed until the first child container or
+        list, so that the "@" member may appear anywhere before.
+        """
+        started = False
+        attrs = ""
+        pending = {}
+        annots = {}
+        written = set()
+
+        def flush():
+            if not started:
+                self.write("<%s%s%s>" % (qname, xmlns, attrs))
+            for key in pending:
+                value, mod_name, node_spec, qn, new_path = pending[key]
+                self.write("".join(self.xml_member(
+                    value, annots.get(key), mod_name, node_spec, qn,
+                    new_path)))
+                written.add(key)
+            pending.clear()
+
+        for key in reader.members():
+            new_path = path + key
+            if key[0] == "@":
+                value = reader.read_value()
+                if key == "@":
+                    if started:
+                        raise LateAnnotationError(new_path)
+                    attrs = self.xml_annotations(value, ns, path)
+                elif key[1:] in written:
+                    raise LateAnnotationError(new_path)
+                else:
+                    annots[key[1:]] = value
+                continue
+            tag, mod_name, node_spec = self.node_lookup(key, ns, node, new_path)
+            qn = self.xml_qname(mod_name, tag)
+            if node_spec[0] == "container":
+                flush()
+                started = True
+                if reader.peek() != "{":
+                    raise NodeTypeError(new_path, "container")
+                self.stream_obj(reader, mod_name, node_spec[1], qn,
+                                new_path + "/")
+            elif node_spec[0] == "list":
+                flush()
+                started = True
+                if reader.peek() != "[":
+                    raise NodeTypeError(new_path, "list")
+                for i in reader.items():
+                    child = reader.read_value()
+                    if not isinstance(child, dict):
+                        raise NodeTypeError(new_path, "list entry")
+                    self.write("".join(self.xml_element(
+                        child, mod_name, node_spec[1], qn,
+                        new_path + "/%d/" % i, node_spec[2])))
+            else:
+                # as with json.load(), the last duplicate member wins
+                pending[key] = (reader.read_value(), mod_name, node_spec, qn,
+                                new_path)
+        flush()
+        self.write("</%s>" % qname)
+
+    def xml_element(self, json_obj, ns, node, qname, path, keys=()):
+        """Return the XML text of `json_obj` as element `qname`, as a
+        list of strings.
+
+        The children `keys` (list entry keys) are moved to the
+        beginning, in order.
+        """
+        attrs = ""
+        children = []
+        for key in json_obj:
+            if key[0] == "@":
+                if key == "@":
+                    attrs = self.xml_annotations(json_obj["@"], ns, path)
+                continue
+            new_path = path + key
+            tag, mod_name, node_spec = self.node_lookup(key, ns, node, new_path)
+            qn = self.xml_qname(mod_name, tag)
+            children.append((qn, self.xml_member(
+                json_obj[key], json_obj.get("@" + key), mod_name, node_spec,
+                qn, new_path)))
+        for k in reversed(keys):
+            kqn = self.xml_qname(*k)
+            for i, child in enumerate(children):
+                if child[0] == kqn:
+                    break
+            else:
+                raise MissingKeyError(path, k)
+            children.insert(0, children.pop(i))
+        res = ["<", qname, attrs, ">"]
+        for child in children:
+            res.extend(child[1])
+        res.append("</%s>" % qname)
+        return res
+
+    def xml_member(self, value, annot, mod_name, node_spec, qname, path):
+        """Return the XML text of member `value`, as a list of strings.
+
+        `annot` is the value of the member's annotation, if any.
+        """
+        def check_val(cond, ytyp):
+            if not cond:
+                raise NodeTypeError(path, ytyp)
+
+        def is_array(val):
+            return isinstance(val, list) and val != [None]
+
+        def is_scalar(val):
+            return not (is_array(val) or isinstance(val, dict))
+
+        if node_spec[0] == "container":
+            check_val(isinstance(value, dict), "container")
+            return self.xml_element(value, mod_name, node_spec[1], qname,
+                                    path + "/")
+        res = []
+        if node_spec[0] == "list":
+            check_val(is_array(value), "list")
+            for i, child in enumerate(value):
+                check_val(isinstance(child, dict), "list entry")
+                res.extend(self.xml_element(child, mod_name, node_spec[1],
+                                            qname, path + "/%d/" % i,
+                                            node_spec[2]))
+        elif node_spec[0] == "leaf":
+            check_val(is_scalar(value), "leaf")
+            res.append(self.xml_leaf(value, node_spec[1], mod_name, qname,
+                                     path, annot))
+        elif node_spec[0] == "leaf-list":
+            check_val(is_array(value), "leaf-list")
+            aarr = annot if annot is not None else []
+            la = len(aarr)
+            for i, child in enumerate(value):
+                check_val(is_scalar(child), "leaf-list entry")
+                aobj = aarr[i] if i < la else None
+                res.append(self.xml_leaf(child, node_spec[1], mod_name,
+                                         qname, path + "/%d" % i, aobj))
+        elif node_spec[0] == "anyxml":
+            attrs = ""
+            if annot:
+                attrs = self.xml_annotations(annot, mod_name, path)
+            res.append("<%s%s>" % (qname, attrs))
+            if isinstance(value, dict):
+                self.xml_anyxml(value, res)
+            else:
+                res.append(escape(str(value)))
+            res.append("</%s>" % qname)
+        return res
+
+    def xml_annotations(self, annot_obj, mod_name, path):
+        """Return the XML attributes for the annotation object."""
+        if not isinstance(annot_obj, dict):
+            raise InvalidAnnotationObjectError(path)
+        res = []
+        for ann in annot_obj:
+            try:
+                atyp = self.annots[ann]
+            except KeyError:
+                raise InvalidAnnotationError(path, ann)
+            aval = self.text_value(annot_obj[ann], atyp, mod_name, path)
+            if aval is None :
+                tsp = atyp[0] if isinstance(atyp, list) else atyp
+                raise DataTypeError(path + "/@" + ann, tsp, annot_obj[ann])
+            m, a = ann.split(":")
+            res.append(" %s=%s" % (self.xml_qname(m, a), self.xml_attr(aval)))
+        return "".join(res)
+
+    def xml_leaf(self, value, ytyp, mod_name, qname, path, annot_obj):
+        """Return the XML text of the leaf with `value`."""
+        tval = self.text_value(value, ytyp, mod_name, path)
+        if tval is None :
+            tsp = ytyp[0] if isinstance(ytyp, list) else ytyp
+            raise DataTypeError(path, tsp, value)
+        attrs = ""
+        if annot_obj:
+            attrs = self.xml_annotations(annot_obj, mod_name, path)
+        if tval == "":
+            return "<%s%s />" % (qname, attrs)
+        return "<%s%s>%s</%s>" % (qname, attrs, escape(tval), qname)
+
+    def xml_anyxml(self, obj, res):
+        """Append the XML text of anyxml content `obj` to `res`."""
+        for ch in obj:
+            cobj = obj[ch]
+            if not isinstance(cobj, list):
+                cobj = [cobj]
+            for eob in cobj:
+                res.append("<%s>" % ch)
+                if isinstance(eob, dict):
+                    self.xml_anyxml(eob, res)
+                else:
+                    res.append(escape(str(eob)))
+                res.append("</%s>" % ch)
+
+    @staticmethod
+    def xml_attr(value):
+        """Return `value` quoted as an XML attribute value."""
+        return '"%s"' % escape(value, {'"': "&quot;", "\n": "&#10;",
+                                       "\r": "&#13;", "\t": "&#09;"})
+
 def main():
     """Parse arguments, open files, create and run the translator."""
     parser = argparse.ArgumentParser(
@@ -411,29 +864,60 @@ def main():
     parser.add_argument("jtox", metavar="driver_file", action="store",
                         help="driver file produced by YANG plugin 'jtox'")
     parser.add_argument("json", metavar='json_file', action="store",
+                        nargs="?",
                         help="JSON instance document (or '-' for standard input)")
     parser.add_argument("-t", "--target", action="store", default="data",
                         help="type of the resulting XML document (default: data)")
     parser.add_argument("-o", "--output", action="store",
                         help="output file (default: standard output)")
+    parser.add_argument("-s", "--stream", action="store_true",
+                        help="translate incrementally, without reading the "
+                        "whole JSON document into memory")
+    parser.add_argument("-c", "--compile", metavar="compiled_file",
+                        action="store",
+                        help="write the driver in the precompiled form to "
+                        "compiled_file and exit")
     args = parser.parse_args()
     if args.target not in ["data", "config"]:
         sys.stderr.write("%s: error: unknown target '%s'\n" % (parser.prog, args.target))
         return 2
+    if args.json is None and args.compile is None:
+        sys.stderr.write("%s: error: json_file is required\n" % parser.prog)
+        return 2
     try:
-        dfile = codecs.open(args.jtox, encoding="utf-8")
+        with open(args.jtox, "rb") as dfile:
+            jtox = load_driver(dfile)
+        if args.compile is not None:
+            with open(args.compile, "w", encoding="utf-8") as cfile:
+                compile_driver(jtox, cfile)
+            return 0
         jfile = sys.stdin \
             if args.json == "-" else codecs.open(args.json, encoding="utf-8")
-        outfile = sys.stdout if args.output is None else open(args.output, "wb")
-        jtox = json.load(dfile)
+        if args.stream:
+            outfile = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8") \
+                if args.output is None \
+                else open(args.output, "w", encoding="utf-8")
+        else:
+            outfile = sys.stdout if args.output is None \
+                else open(args.output, "wb")
     except IOError as e:
         sys.stderr.write("%s: error: %s: '%s'\n" %
                          (parser.prog, e.strerror, e.filename))
         return 1
     except ValueError as e:
-        sys.stderr.write("%s: error: %s\n" %
-                         (parser.prog, e.message))
+        sys.stderr.write("%s: error: %s: %s\n" %
+                         (parser.prog, args.jtox, e))
         return 1
+    if args.stream:
+        trans = StreamTranslator(jtox, outfile.write)
+        try:
+            trans.translate_stream(jfile, args.target)
+        except Error as e:
+            sys.stderr.write("%s: %s\n" % (parser.prog, e))
+            return e.return_value
+        finally:
+            outfile.flush()
+        return 0
     nc_uri = "urn:ietf:params:xml:ns:netconf:base:1.0"
     ET.register_namespace("nc", nc_uri)
     root_el = ET.Element("{%s}%s" % (nc_uri, args.target))
@@ -6,6 +6,8 @@ import optparse
 import io
 import shutil
 import codecs
+import json
+import multiprocessing
 from pathlib import Path
 
 import pyang
@@ -13,6 +15,7 @@ from pyang import plugin
 from pyang import error
 from pyang import util
 from pyang import hello
+from pyang import batch
 from pyang import context
 from pyang import repository
 from pyang import statements
@@ -106,6 +109,12 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
                              dest="ignore_errors",
                              action="store_true",
                              help="Ignore all errors.  Use with care."),
+        optparse.make_option("--aggregate-errors",
+                             dest="aggregate_errors",
+                             action="store_true",
+                             help="Report an error in a grouping once, " \
+                             "with the number of times it was reported, " \
+                             "instead of once per use of the grouping."),
         optparse.make_option("--canonical",
                              dest="canonical",
                              action="store_true",
@@ -135,6 +144,13 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
                              dest="outfile",
                              help="Write the output to OUTFILE instead " \
                              "of stdout."),
+        optparse.make_option("--output-dir",
+                             dest="output_dir",
+                             metavar="DIR",
+                             help="Write the output for each module to a " \
+                             "file in DIR, with the same name as the " \
+                             "module's file, and a suffix given by the " \
+                             "output format."),
         optparse.make_option("-O", "--overwrite",
                              dest="overwrite_output_file",
                              action="store_true",
@@ -207,6 +223,22 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
                              help="Pyang will not discard comments; \
                                    has effect if the output plugin can \
                                    handle comments."),
+        optparse.make_option("--validate-repository",
+                             dest="validate_repository",
+                             action="store_true",
+                             help="Validate all modules in the directories " \
+                             "given instead of module filenames (default " \
+                             "the current directory), and print the " \
+                             "result for each module as JSON."),
+        optparse.make_option("-j", "--jobs",
+                             dest="jobs",
+                             type="int",
+                             default=1,
+                             help="With --validate-repository, -f " \
+                             "impact or -f html-site, use JOBS worker " \
+                             "processes to validate modules in parallel. " \
+                             "With --output-dir, use JOBS worker " \
+                             "processes to emit the modules."),
         optparse.make_option("--no-path-recurse",
                              dest="no_path_recurse",
                              action="store_true",
@@ -223,10 +255,21 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
 
     (o, args) = optparser.parse_args()
 
-    if o.outfile is not None and o.format is None:
+    if ((o.outfile is not None or o.output_dir is not None) and
+        o.format is None and not o.validate_repository):
         sys.stderr.write("no format specified\n")
         sys.exit(1)
 
+    if o.output_dir is not None:
+        if o.outfile is not None or o.hello or len(args) == 0:
+            sys.stderr.write("--output-dir needs module filenames, and "
+                             "cannot be used with --output or --hello\n")
+            sys.exit(1)
+        if o.format in fmts and fmts[o.format].output_suffix is None:
+            sys.stderr.write("--output-dir cannot be used with format '%s'\n"
+                             % o.format)
+            sys.exit(1)
+
     filenames = args
 
     # Parse hello if present
@@ -244,6 +287,16 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
             fd = sys.stdin.buffer
         hel = hello.HelloParser().parse(fd)
 
+    if o.validate_repository:
+        if o.hello or o.format is not None or o.transforms:
+            sys.stderr.write("--validate-repository cannot be used with "
+                             "--hello, --format or --transform\n")
+            sys.exit(1)
+        # the directories to validate are also searched for imports
+        repository_dirs = filenames or ['.']
+        o.path = o.path + repository_dirs
+        filenames = []
+
     path = os.pathsep.join(o.path)
 
     # add standard search path
@@ -306,6 +359,69 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
             if error.allow_warning(level):
                 error.error_codes[w] = (4, wstr)
 
+    # set when the modules given on the command line have been loaded
+    modulenames = None
+
+    def is_suppressed_warning(etag):
+        return (error.is_warning(error.err_level(etag)) and
+                etag not in o.errors and
+                'none' in o.warnings and
+                not ('error' in o.warnings and etag not in o.warnings))
+
+    def error_kind(etag):
+        if error.is_error(error.err_level(etag)) or etag in o.errors:
+            return "error"
+        elif 'error' in o.warnings and etag not in o.warnings:
+            return "error"
+        else:
+            return "warning"
+
+    def is_implicit(epos):
+        # true if the error is in a module that was added implicitly
+        # (by import); the code includes submodules
+        return (ctx.implicit_errors is False and
+                modulenames is not None and
+                epos.top is not None and
+                epos.top.arg not in modulenames and
+                (not hasattr(epos.top, 'i_modulename') or
+                 epos.top.i_modulename not in modulenames) and
+                epos.ref not in filenames)
+
+    def keep_error(epos, etag):
+        # called when an error is added; drop errors that will not be
+        # reported.  errors in implicitly added modules are kept, since
+        # some plugins refuse to run if any module has errors
+        if etag in o.ignore_error_tags or is_suppressed_warning(etag):
+            return False
+        if (is_implicit(epos) and
+            error.is_warning(error.err_level(etag)) and
+            (epos.top.keyword == 'module' or
+             hasattr(epos.top, 'i_modulename'))):
+            return False
+        return True
+
+    ctx.set_error_filter(keep_error)
+
+    if o.validate_repository:
+        for p in plugin.plugins:
+            p.pre_load_modules(ctx)
+        def post_validate(ctx, graph, results):
+            for p in plugin.plugins:
+                p.post_validate_repository(ctx, graph, results)
+        _graph, results = batch.validate_repository(
+            ctx, lambda _name, _rev, handle:
+            batch.in_directories(handle, repository_dirs),
+            jobs=o.jobs, post_validate=post_validate)
+        if o.outfile is None:
+            fd = sys.stdout
+        else:
+            fd = io.open(o.outfile, "w", encoding="utf-8")
+        exit_code = emit_repository_results(results, fd, error_kind,
+                                            o.print_error_basename)
+        if o.outfile is not None:
+            fd.close()
+        sys.exit(exit_code)
+
     xform_objs = []
     for transform in o.transforms:
         if transform not in xforms:
@@ -335,6 +451,35 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
     for p in plugin.plugins:
         p.pre_load_modules(ctx)
 
+    if emit_obj is not None and not emit_obj.load_modules:
+        # the plugin reads the files itself, without validating them
+        if o.hello or xform_objs or len(filenames) == 0:
+            sys.stderr.write("--format %s needs module filenames, and "
+                             "cannot be used with --hello or --transform\n"
+                             % o.format)
+            sys.exit(1)
+        if o.outfile is None:
+            fd = sys.stdout
+        else:
+            fd = io.open(o.outfile, "w", encoding="utf-8")
+        try:
+            emit_obj.emit_files(ctx, filenames, fd)
+        except error.EmitError as e:
+            if e.msg != "":
+                sys.stderr.write(e.msg + '\n')
+            sys.exit(e.exit_code)
+        if o.outfile is not None:
+            fd.close()
+        exit_code = 0
+        for epos, etag, eargs in ctx.errors:
+            kind = error_kind(etag)
+            if kind == "error":
+                exit_code = 1
+            sys.stderr.write('%s: %s: %s\n' %
+                             (epos.label(o.print_error_basename), kind,
+                              error.err_to_str(etag, eargs)))
+        sys.exit(exit_code)
+
     exit_code = 0
     modules = []
 
@@ -364,14 +509,20 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
                 modules.append(module)
         if (len(filenames) > 1 and
             emit_obj is not None and
-            not emit_obj.multiple_modules):
+            not emit_obj.multiple_modules and
+            o.output_dir is None):
             sys.stderr.write("too many files to convert\n")
             sys.exit(1)
 
         for filename in filenames:
+            m = syntax.re_filename.search(Path(filename).name)
             try:
-                fd = io.open(filename, "r", encoding="utf-8")
-                text = fd.read()
+                if m is not None and m.group(3) == 'yin':
+                    # the YIN module is parsed while it is read
+                    text = io.open(filename, "rb")
+                else:
+                    fd = io.open(filename, "r", encoding="utf-8")
+                    text = fd.read()
                 if o.verbose:
                     util.report_file_read(filename, "(CL)")
             except IOError as ex:
@@ -381,7 +532,6 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
                 s = str(ex).replace('utf-8', 'utf8')
                 sys.stderr.write("%s: unicode error: %s\n" % (filename, s))
                 sys.exit(1)
-            m = syntax.re_filename.search(Path(filename).name)
             ctx.yin_module_map = {}
             if m is not None:
                 name, rev, in_format = m.groups()
@@ -497,37 +647,37 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
     if o.ignore_errors:
         ctx.errors = []
 
-    for epos, etag, eargs in ctx.errors:
-        if etag in o.ignore_error_tags:
-            continue
-        if (ctx.implicit_errors is False and
-            epos.top is not None and
-            epos.top.arg not in modulenames and
-            (not hasattr(epos.top, 'i_modulename') or
-             epos.top.i_modulename not in modulenames) and
-            epos.ref not in filenames):
-            # this module was added implicitly (by import); skip this error
-            # the code includes submodules
-            continue
+    # errors added before the filter could tell implicitly added modules
+    # apart, or which were added bypassing err_add, are filtered here
+    reported = [(epos, etag, eargs) for epos, etag, eargs in ctx.errors
+                if (etag not in o.ignore_error_tags and
+                    not is_implicit(epos) and
+                    not is_suppressed_warning(etag))]
+
+    if o.aggregate_errors:
+        aggregates = error.aggregate_errors(reported)
+    else:
+        aggregates = []
+        for epos, etag, eargs in reported:
+            agg = error.ErrorAggregate(epos, etag, eargs)
+            agg.add(epos, 0)
+            aggregates.append(agg)
+
+    for agg in aggregates:
+        epos, etag = agg.pos, agg.tag
         elevel = error.err_level(etag)
-        if error.is_warning(elevel) and etag not in o.errors:
-            kind = "warning"
-            if 'error' in o.warnings and etag not in o.warnings:
-                kind = "error"
-                exit_code = 1
-            elif 'none' in o.warnings:
-                continue
-        else:
-            kind = "error"
+        kind = error_kind(etag)
+        if kind == "error":
             exit_code = 1
-        emsg = etag if o.print_error_code else error.err_to_str(etag, eargs)
+        emsg = etag if o.print_error_code else agg.msg()
+        emsg += agg.sites_str(o.print_error_basename)
 
         if o.msg_template is not None:
             try:
                 sys.stderr.write(str(o.msg_template).format(
                     file=epos.ref, line=epos.line,
                     code=etag, type=kind,
-                    msg=error.err_to_str(etag, eargs),
+                    msg=agg.msg() + agg.sites_str(o.print_error_basename),
                     level=elevel) + '\n')
             except KeyError as error_msg:
                 sys.stderr.write(
@@ -535,9 +685,16 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
                 sys.exit(1)
         else:
             sys.stderr.write('%s: %s: %s\n' %
-                             (epos.label(o.print_error_basename), kind, emsg))
+                             (agg.label(o.print_error_basename), kind, emsg))
 
-    if emit_obj is not None and len(modules) > 0:
+    if emit_obj is not None and len(modules) > 0 and o.output_dir is not None:
+        try:
+            emit_to_dir(ctx, emit_obj, modules, o.output_dir, o.jobs)
+        except error.EmitError as e:
+            if e.msg != "":
+                sys.stderr.write(e.msg + '\n')
+            sys.exit(e.exit_code)
+    elif emit_obj is not None and len(modules) > 0:
         tmpfile = None
         if o.outfile is None:
             fd = sys.stdout
@@ -568,6 +725,108 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
 
     sys.exit(exit_code)
 
+def emit_to_dir(ctx, emit_obj, modules, outdir, jobs=1):
+    """Emit each module in `modules` to a file in `outdir`.
+
+    All modules are validated in the same context, so the modules they
+    import are validated once, instead of once per module.  The name of
+    each file is the name of the module's file, with the suffix
+    replaced by the output format's suffix.
+
+    If `jobs` is greater than 1, the modules are emitted in `jobs`
+    worker processes, forked after the modules have been validated."""
+    outfiles = {}
+    for module in modules:
+        name = os.path.splitext(os.path.basename(module.pos.ref))[0]
+        outfile = os.path.join(outdir, name + emit_obj.output_suffix)
+        if outfiles.get(outfile) is module:
+            # the same file was given twice
+            continue
+        if outfile in outfiles:
+            raise error.EmitError("%s and %s would both be written to %s" %
+                                  (outfiles[outfile].pos.ref,
+                                   module.pos.ref, outfile))
+        outfiles[outfile] = module
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+    items = list(outfiles.items())
+    if (jobs > 1 and len(items) > 1 and
+        'fork' in multiprocessing.get_all_start_methods()):
+        global _emit_state
+        _emit_state = (ctx, emit_obj, items)
+        try:
+            mp = multiprocessing.get_context('fork')
+            with mp.Pool(jobs) as pool:
+                failures = pool.map(_emit_worker, range(len(items)),
+                                    max(1, len(items) // (jobs * 4)))
+        finally:
+            _emit_state = None
+        for failure in failures:
+            if failure is not None:
+                raise error.EmitError(*failure)
+    else:
+        for outfile, module in items:
+            emit_file(ctx, emit_obj, module, outfile)
+
+def emit_file(ctx, emit_obj, module, outfile):
+    tmpfile = outfile + ".tmp"
+    fd = io.open(tmpfile, "w", encoding="utf-8")
+    try:
+        emit_obj.emit(ctx, [module], fd)
+    except:
+        fd.close()
+        os.remove(tmpfile)
+        raise
+    fd.close()
+    os.rename(tmpfile, outfile)
+
+# set in the parent process before the worker processes are forked
+_emit_state = None
+
+def _emit_worker(i):
+    # an EmitError is returned as (msg, exit_code), since it cannot be
+    # sent back to the parent process as it is
+    ctx, emit_obj, items = _emit_state
+    outfile, module = items[i]
+    try:
+        emit_file(ctx, emit_obj, module, outfile)
+    except error.EmitError as e:
+        return (e.msg, e.exit_code)
+    return None
+
+def emit_repository_results(results, fd, error_kind, basename=False):
+    """Write the results of batch.validate_repository() as JSON.
+
+    Returns 1 if any module has errors, 0 otherwise."""
+    exit_code = 0
+    mods = []
+    for res in results:
+        errors = []
+        for epos, etag, eargs in res.errors:
+            kind = error_kind(etag)
+            if kind == "error":
+                exit_code = 1
+            errors.append({
+                "position": epos.label(basename),
+                "line": epos.line,
+                "code": etag,
+                "type": kind,
+                "message": error.err_to_str(etag, eargs),
+            })
+        mods.append({
+            "name": res.name,
+            "revision": res.revision,
+            "keyword": res.node.keyword,
+            "file": os.path.basename(res.ref) if basename else res.ref,
+            "dependencies": ["%s@%s" % dep for dep in res.dependencies],
+            "valid": not any(e["type"] == "error" for e in errors),
+            "errors": errors,
+        })
+        mods[-1].update(res.report)
+    json.dump({"modules": mods}, fd, indent=2)
+    fd.write("\n")
+    return exit_code
+
 def parse_features_string(s):
     if s.find(':') == -1:
         return s, []
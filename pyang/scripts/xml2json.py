@@ -0,0 +1,434 @@
+#! /usr/bin/env python
+import argparse
+import json
+import re
+import sys
+
+from lxml import etree
+
+from pyang.scripts.json2xml import (Error, DataTypeError, NodeTypeError,
+                                    InvalidNodeError, InvalidAnnotationError,
+                                    load_driver)
+
+nc_uri = "urn:ietf:params:xml:ns:netconf:base:1.0"
+
+encode_string = json.encoder.encode_basestring
+
+class XMLError(Error):
+    """Exception raised for broken XML input."""
+
+    def __str__(self):
+        return "%s" % self.path
+
+class DocumentError(Error):
+    """Exception raised if the document element is not supported."""
+
+    def __str__(self):
+        return Error.__str__(self) + (
+            " - document element must be data or config"
+            " (possibly inside rpc-reply)")
+
+class AdjacencyError(Error):
+    """
+    Exception raised for entries of a list or leaf-list that are
+    separated by other elements.
+    """
+
+    def __str__(self):
+        return Error.__str__(self) + " - entries must be adjacent"
+
+class Frame(object):
+    """A JSON object being written."""
+
+    def __init__(self, tree, ns, path, level):
+        self.tree = tree
+        """children in the jtox driver structure"""
+        self.ns = ns
+        """current namespace (module name)"""
+        self.path = path
+        self.level = level
+        self.count = 0
+        """number of members written"""
+        self.array = None
+        """member name of the open list or leaf-list array"""
+        self.items = 0
+        """number of items written to the open array"""
+        self.annots = []
+        """annotations of the entries of the open leaf-list"""
+        self.closed = set()
+        """member names of the arrays that have been closed"""
+
+class Translator(object):
+    """Translate XML to JSON according to a YANG data model.
+
+    The XML document is read with `lxml.etree.iterparse`, and the JSON
+    text is written as the elements are parsed.  Elements that have
+    been translated are removed from the tree, so that the memory used
+    does not depend on the size of the document.
+
+    Instance variables:
+
+    - `self.module`: dictionary mapping namespace URIs to module names
+
+    - `self.write`: function that writes a string to the output
+
+    - `self.compact`: if True, no whitespace is written between members
+    """
+
+    ident = "[a-zA-Z_][-_.a-zA-Z0-9]*"
+    iid_re = re.compile(r"""([/\[]\s*)(%s):|'[^']*'|"[^"]*\"""" % ident)
+    int_re = re.compile(r"^[-+]?[0-9]+$")
+    dec_re = re.compile(r"^[-+]?[0-9]+(?:\.([0-9]+))?$")
+
+    def __init__(self, jtox, write, compact=False):
+        self.tree = jtox["tree"]
+        self.annots = jtox["annotations"]
+        self.module = {}
+        for m in jtox["modules"]:
+            self.module[jtox["modules"][m][1]] = m
+        self.tags = {}
+        """cache of element tag:(module name, local name)"""
+        self.write = write
+        self.compact = compact
+
+    def translate(self, xml_file):
+        """Translate the XML document `xml_file` (a file name or a file
+        object) and write the resulting JSON document."""
+        stack = []
+        self.found = False
+        context = etree.iterparse(xml_file, events=("start", "end"),
+                                  remove_comments=True, remove_pis=True)
+        try:
+            for event, elem in context:
+                if event == "start":
+                    stack.append(self.start(elem, stack[-1] if stack else None,
+                                            len(stack)))
+                    continue
+                frame = stack.pop()
+                if frame is None:
+                    # inside anyxml, or the rpc-reply element
+                    continue
+                self.end(elem, frame, stack[-1] if stack else None)
+                # drop the translated elements
+                parent = elem.getparent()
+                elem.clear()
+                if parent is not None:
+                    while elem.getprevious() is not None:
+                        del parent[0]
+        except etree.XMLSyntaxError as e:
+            raise XMLError(e)
+        if not self.found:
+            raise DocumentError("/")
+
+    def start(self, elem, parent, depth):
+        """Handle the start of `elem`, and return its frame.
+
+        `parent` is the frame of the parent element, `depth` the number
+        of ancestors.
+        """
+        if parent is None:
+            if depth == 0 and elem.tag == "{%s}rpc-reply" % nc_uri:
+                return None
+            if depth == 0 or (depth == 1 and
+                               self.is_nc_root(elem.getparent(), "rpc-reply")):
+                if self.is_nc_root(elem, "data", "config"):
+                    self.found = True
+                    self.write("{")
+                    return Frame(self.tree, None, "/", 0)
+                raise DocumentError("/" + etree.QName(elem).localname)
+            # inside anyxml
+            return None
+        if isinstance(parent, tuple):
+            # a leaf, leaf-list or anyxml node
+            return None
+        try:
+            mod_name, local = self.tags[elem.tag]
+        except KeyError:
+            qn = etree.QName(elem)
+            mod_name, local = self.module.get(qn.namespace), qn.localname
+            self.tags[elem.tag] = (mod_name, local)
+        if mod_name is None:
+            raise InvalidNodeError(parent.path + local)
+        name = local if mod_name == parent.ns else "%s:%s" % (mod_name, local)
+        path = parent.path + name
+        try:
+            node_spec = parent.tree[name]
+        except KeyError:
+            raise InvalidNodeError(path)
+        kind = node_spec[0]
+        if parent.array is not None and parent.array != name:
+            self.close_array(parent)
+        if kind == "container":
+            self.member(parent, name)
+            self.write("{")
+            frame = Frame(node_spec[1], mod_name, path + "/",
+                          parent.level + 1)
+            self.object_annotations(elem, frame)
+            return frame
+        if kind in ("list", "leaf-list"):
+            if parent.array is None:
+                if name in parent.closed:
+                    raise AdjacencyError(path)
+                self.member(parent, name)
+                self.write("[")
+                parent.array = name
+                parent.items = 0
+                parent.annots = []
+            if kind == "list":
+                self.item(parent)
+                self.write("{")
+                frame = Frame(node_spec[1], mod_name,
+                              "%s/%d/" % (path, parent.items - 1),
+                              parent.level + 2)
+                self.object_annotations(elem, frame)
+                return frame
+        return (kind, name, node_spec, mod_name, path)
+
+    def end(self, elem, frame, parent):
+        """Handle the end of `elem` with `frame`."""
+        if isinstance(frame, Frame):
+            self.close_array(frame)
+            if frame.count > 0:
+                self.newline(frame.level)
+            if parent is None:
+                self.write("}\n")
+            else:
+                self.write("}")
+            return
+        kind, name, node_spec, mod_name, path = frame
+        if kind == "leaf-list":
+            self.item(parent)
+            self.write(self.json_value(elem.text or "", node_spec[1], elem,
+                                       mod_name, path))
+            parent.annots.append(self.annotations(elem, mod_name, path))
+            return
+        self.member(parent, name)
+        if kind == "leaf":
+            self.write(self.json_value(elem.text or "", node_spec[1], elem,
+                                       mod_name, path))
+        elif kind in ("anyxml", "anydata"):
+            self.write(json.dumps(self.anyxml_value(elem), ensure_ascii=False))
+        else:
+            raise NodeTypeError(path, kind)
+        aobj = self.annotations(elem, mod_name, path)
+        if aobj is not None:
+            self.member(parent, "@" + name)
+            self.write(aobj)
+
+    def close_array(self, frame):
+        """Close the open array of `frame`, if any."""
+        if frame.array is None:
+            return
+        self.newline(frame.level + 1)
+        self.write("]")
+        name = frame.array
+        frame.array = None
+        frame.closed.add(name)
+        if any(a is not None for a in frame.annots):
+            self.member(frame, "@" + name)
+            self.write("[%s]" % ", ".join(
+                "null" if a is None else a for a in frame.annots))
+
+    def member(self, frame, name):
+        """Write the beginning of member `name` of `frame`."""
+        if frame.count > 0:
+            self.write(",")
+        frame.count += 1
+        self.newline(frame.level + 1)
+        self.write('"%s": ' % name)
+
+    def item(self, frame):
+        """Write the beginning of an item of the open array of `frame`."""
+        if frame.items > 0:
+            self.write(",")
+        frame.items += 1
+        self.newline(frame.level + 2)
+
+    def newline(self, level):
+        if not self.compact:
+            self.write("\n" + "  " * level)
+
+    def object_annotations(self, elem, frame):
+        """Write the "@" member of a container or list entry."""
+        aobj = self.annotations(elem, frame.ns, frame.path)
+        if aobj is not None:
+            self.member(frame, "@")
+            self.write(aobj)
+
+    def annotations(self, elem, mod_name, path):
+        """Return the JSON text of the annotations of `elem`, or None."""
+        if not elem.attrib:
+            return None
+        res = []
+        for att, val in elem.attrib.items():
+            qn = etree.QName(att)
+            ann = "%s:%s" % (self.module.get(qn.namespace), qn.localname)
+            try:
+                atyp = self.annots[ann]
+            except KeyError:
+                raise InvalidAnnotationError(path, att)
+            res.append('"%s": %s' % (ann, self.json_value(
+                val, atyp, elem, mod_name, path + "/@" + ann)))
+        return "{%s}" % ", ".join(res)
+
+    def anyxml_value(self, elem):
+        """Return anyxml content of `elem` as a JSON object."""
+        groups = {}
+        for ch in elem:
+            groups.setdefault(etree.QName(ch).localname, []).append(ch)
+        res = {}
+        for name in groups:
+            vals = [self.anyxml_value(ch) if len(ch) else (ch.text or "")
+                    for ch in groups[name]]
+            res[name] = vals if len(vals) > 1 else vals[0]
+        return res
+
+    def json_value(self, text, type_spec, elem, mod_name, path):
+        """Return the JSON text of `text`, the XML value of a leaf or
+        annotation.
+
+        Raise `DataTypeError` if `text` is not a valid value of the
+        datatype specified by `type_spec`.
+        """
+        val = self.typed_value(text, type_spec, elem, mod_name)
+        if val is None:
+            tsp = type_spec[0] if isinstance(type_spec, list) else type_spec
+            raise DataTypeError(path, tsp, text)
+        if val is True:
+            return "true"
+        if val is False:
+            return "false"
+        if isinstance(val, int):
+            return "%d" % val
+        if isinstance(val, list):
+            return "[null]"
+        return encode_string(val)
+
+    def typed_value(self, text, type_spec, elem, mod_name):
+        """Return `text` as the Python value of its JSON representation.
+
+        Return `None` if `text` cannot be represented as an instance of
+        the datatype specified by `type_spec`.
+        """
+        def int_value(bits, unsigned):
+            val = text.strip()
+            if self.int_re.match(val) is None:
+                return None
+            val = int(val)
+            if unsigned:
+                lo = 0
+                hi = 2 ** bits
+            else:
+                hi = 2 ** (bits-1)
+                lo = -hi
+            return val if lo <= val < hi else None
+
+        t = type_spec[0] if isinstance(type_spec, list) else type_spec
+        if t.startswith("int") or t.startswith("uint"):
+            unsigned = t[0] == "u"
+            bits = int(t[4:] if unsigned else t[3:])
+            val = int_value(bits, unsigned)
+            if bits == 64 and val is not None:
+                # 64-bit integers are JSON strings
+                return "%d" % val
+            return val
+        if t == "decimal64":
+            val = text.strip()
+            mo = self.dec_re.match(val)
+            if mo is None or len(mo.group(1) or "") > type_spec[1]:
+                return None
+            return val
+        if t == "boolean":
+            val = text.strip()
+            if val == "true":
+                return True
+            if val == "false":
+                return False
+            return None
+        if t == "empty":
+            return [None] if text.strip() == "" else None
+        if t == "union":
+            for memb in type_spec[1]:
+                val = self.typed_value(text, memb, elem, mod_name)
+                if val is not None:
+                    return val
+            return None
+        if t == "identityref":
+            fst, sep, snd = text.strip().partition(":")
+            if not sep:
+                fst, snd = None, fst
+            m = self.module.get(elem.nsmap.get(fst))
+            return None if m is None else "%s:%s" % (m, snd)
+        if t == "instance-identifier":
+            return self.iid_value(text.strip(), elem)
+        if t == "string":
+            return text
+        return " ".join(text.split())
+
+    def iid_value(self, value, elem):
+        """Return instance identifier `value` with the prefixes replaced
+        by module names, as required in JSON, or None if a prefix is
+        undefined."""
+        if not value.startswith("/"):
+            return None
+        last = [None]
+        def repl(mo):
+            if mo.group(2) is None:
+                # quoted string
+                return mo.group(0)
+            m = self.module.get(elem.nsmap.get(mo.group(2)))
+            if m is None:
+                raise KeyError(mo.group(2))
+            if m == last[0]:
+                return mo.group(1)
+            last[0] = m
+            return "%s%s:" % (mo.group(1), m)
+        try:
+            return self.iid_re.sub(repl, value)
+        except KeyError:
+            return None
+
+    @staticmethod
+    def is_nc_root(elem, *names):
+        return elem is not None and elem.tag in [
+            "{%s}%s" % (nc_uri, n) for n in names]
+
+def main():
+    """Parse arguments, open files, create and run the translator."""
+    parser = argparse.ArgumentParser(
+        description="XML to JSON conversion driven by a YANG data model.")
+    parser.add_argument("jtox", metavar="driver_file", action="store",
+                        help="driver file produced by YANG plugin 'jtox'")
+    parser.add_argument("xml", metavar='xml_file', action="store",
+                        help="XML instance document (or '-' for standard input)")
+    parser.add_argument("-o", "--output", action="store",
+                        help="output file (default: standard output)")
+    parser.add_argument("--compact", action="store_true",
+                        help="write the JSON document without indentation")
+    args = parser.parse_args()
+    try:
+        with open(args.jtox, "rb") as dfile:
+            jtox = load_driver(dfile)
+        xfile = sys.stdin.buffer if args.xml == "-" else open(args.xml, "rb")
+        outfile = sys.stdout if args.output is None \
+            else open(args.output, "w", encoding="utf-8")
+    except IOError as e:
+        sys.stderr.write("%s: error: %s: '%s'\n" %
+                         (parser.prog, e.strerror, e.filename))
+        return 1
+    except ValueError as e:
+        sys.stderr.write("%s: error: %s: %s\n" %
+                         (parser.prog, args.jtox, e))
+        return 1
+    trans = Translator(jtox, outfile.write, args.compact)
+    try:
+        trans.translate(xfile)
+    except Error as e:
+        sys.stderr.write("%s: %s\n" % (parser.prog, e))
+        return e.return_value
+    finally:
+        outfile.flush()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
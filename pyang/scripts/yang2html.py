@@ -5,15 +5,20 @@
 #
 # Works on the syntax level and does thus not include any intelligent
 # links or anything.
+import io
+import os
+import re
 import sys
 import argparse
-from xml.sax.saxutils import escape
+from xml.sax.saxutils import escape, unescape
 
 import pyang
-import pyang.syntax
+from pyang import error
+from pyang import syntax
+from pyang.yang_parser import YangTokenizer
 
 
-usage = """%(prog)s [-o OUTFILE] [-d] [-c] [filename]
+usage = """%(prog)s [-o OUTFILE | --output-dir DIR] [-d] [-c] [filename...]
 
 Add html markup for syntax coloring of YANG modules, or documents
 which contain YANG modules.
@@ -21,6 +26,10 @@ which contain YANG modules.
 Reads a YANG module from <filename> or if no <filename> is given,
 reads from stdin.  The YANG module is formatted as html.
 
+If several filenames are given, the output for each file is written
+to stdout or OUTFILE, or with --output-dir, to a file in DIR with the
+same name as the file and the suffix .html.
+
 If the option -d is given, the input contains an html document.  Everything
 in a 'pre' element with the 'yang' class is converted.
 
@@ -28,12 +37,41 @@ in a 'pre' element with the 'yang' class is converted.
   unformatted yang module
   </pre>
 """
+
+css = """
+<style type="text/css" media="all">
+pre.yang {
+  border: thin solid black;
+  background-color: #eeeeee;
+  color: black;
+  margin: 10px 10px 10px 10px;
+  padding: 10px 10px 10px 10px;
+  line-height: 1.2em;
+}
+span.kw {
+  color: blue;
+}
+span.cmt {
+  color: red;
+}
+span.str {
+  color: green;
+}
+</style>
+    """
+
+begin_yang = '<pre class="yang">'
+end_yang = '</pre>'
+
+re_separator = re.compile(r'\s|[;{}]|//|/\*')
+
 def run():
     parser = argparse.ArgumentParser(usage=usage)
     parser.version = '%(prog)s ' + pyang.__version__
 
-    parser.add_argument("file", metavar="filename", action="store", nargs='?',
-                   help="Read a YANG module from filename or stdin.")
+    parser.add_argument("files", metavar="filename", action="store",
+                   nargs='*',
+                   help="Read YANG modules from filenames or stdin.")
 
     parser.add_argument("-v", "--version", action="version",
                    help="Show version number and exit")
@@ -41,6 +79,10 @@ def run():
     parser.add_argument("-o", "--output", dest="outfile",
                    help="Write the output to OUTFILE instead of stdout.")
 
+    parser.add_argument("--output-dir", dest="outdir",
+                   help="Write the output for each file to a file in"
+                        " OUTDIR.")
+
     parser.add_argument("-d", dest="scan_document", action="store_true",
                    help="Add markup to an existing html document")
 
@@ -50,147 +92,166 @@ def run():
 
     args = parser.parse_args()
 
-    if args.file is None:
-        # read the entire doc into buf
-        buf = ""
-        for line in sys.stdin:
-            buf = buf + line
+    if args.outdir is not None and args.outfile is not None:
+        sys.stderr.write("-o and --output-dir cannot both be given\n")
+        sys.exit(1)
+    if args.outdir is not None and not args.files:
+        sys.stderr.write("--output-dir requires filenames\n")
+        sys.exit(1)
+
+    if args.outfile is None:
+        fd = sys.stdout
     else:
-        filename = args.file
+        fd = io.open(args.outfile, "w", encoding="utf-8")
+
+    if not args.files:
+        markup(sys.stdin.read(), fd, args.scan_document, args.emit_css)
+    for filename in args.files:
         try:
-            fd = open(filename)
-            buf = fd.read()
-        except IOError as ex:
+            with io.open(filename, "r", encoding="utf-8") as f:
+                buf = f.read()
+        except (IOError, UnicodeDecodeError) as ex:
             sys.stderr.write("error %s: %s\n" % (filename, ex))
             sys.exit(1)
+        if args.outdir is None:
+            markup(buf, fd, args.scan_document, args.emit_css)
+        else:
+            outfile = os.path.join(args.outdir,
+                                   os.path.basename(filename) + '.html')
+            with io.open(outfile, "w", encoding="utf-8") as out:
+                markup(buf, out, args.scan_document, args.emit_css)
 
-    if args.outfile is None:
-        fd = sys.stdout
-    else:
-        fd = open(args.outfile, "w+")
+    if args.outfile is not None:
+        fd.close()
 
-    def emit_css():
-        fd.write("""
-<style type="text/css" media="all">
-pre.yang {
-  border: thin solid black;
-  background-color: #eeeeee;
-  color: black;
-  margin: 10px 10px 10px 10px;
-  padding: 10px 10px 10px 10px;
-  line-height: 1.2em;
-}
-span.kw {
-  color: blue;
-}
-span.cmt {
-  color: red;
-}
-span.str {
-  color: green;
-}
-</style>
-    """)
+def markup(buf, fd, scan_document=False, emit_css=False):
+    """Write `buf` with html markup to `fd`.
 
+    If `scan_document` is True, `buf` is an html document, and the
+    contents of the 'pre' elements with the 'yang' class are marked up;
+    otherwise `buf` is a YANG module.  If `emit_css` is True, a style
+    element is written before the first YANG module."""
+    if not scan_document:
+        if emit_css:
+            fd.write(css)
+        fd.write(begin_yang)
+        markup_yang(buf, fd)
+        fd.write(end_yang + '\n')
+        return
     i = 0
-    q = None
-    keyword_next = True
-    begin_yang = '<pre class="yang">'
-
-    if args.scan_document:
-        no_yang = True
-    else:
-        no_yang = False
-        if args.emit_css:
-            args.emit_css = False
-            emit_css()
+    while True:
+        start = buf.find(begin_yang, i)
+        if start == -1:
+            break
+        start += len(begin_yang)
+        end = buf.find(end_yang, start)
+        if end == -1:
+            end = len(buf)
+        fd.write(buf[i:start - len(begin_yang)])
+        if emit_css:
+            emit_css = False
+            fd.write(css)
         fd.write(begin_yang)
+        markup_yang(unescape(buf[start:end]), fd)
+        i = end
+    fd.write(buf[i:])
 
-    while i < len(buf):
-        if no_yang and buf[i:].startswith(begin_yang):
-            no_yang = False
-            fd.write(buf[:i])
-            if args.emit_css:
-                args.emit_css = False
-                emit_css()
-            fd.write(begin_yang)
-            buf = buf[i+len(begin_yang):]
-            i = 0
-            continue
-        elif no_yang:
-            i = i + 1
-            continue
-        elif not no_yang and buf[i:].startswith('</pre>'):
-            no_yang = True
-            continue
-        if q == '"' and buf[i] == '\\':
-            i = i + 2
-            continue
-        if q is not None and buf[i] == q:
-            fd.write("<span class='str'>")
-            fd.write(q)
-            fd.write(escape(buf[:i+1]))
-            fd.write("</span>")
-            buf = buf[i+1:]
-            q = None
-            i = 0
-        elif q is not None:
-            i = i + 1
-            continue
-        if buf[i] == '/' and buf[i+1] == '/':
-            end = buf.find("\n", i)
-            if end == -1:
-                end = len(buf)
-            fd.write(buf[:i])
-            fd.write("<span class='cmt'>")
-            fd.write(escape(buf[i:end]))
-            fd.write("</span>\n")
-            buf = buf[end+1:]
-            i = 0
-        elif buf[i] == '/' and buf[i+1] == '*':
-            end = buf.find("*/", i)
-            if end == -1:
-                end = len(buf)
-            fd.write(buf[:i])
-            fd.write("<span class='cmt'>")
-            fd.write(escape(buf[i:end]))
-            fd.write("*/</span>")
-            buf = buf[end+2:]
-            i = 0
-        elif buf[i] == '"':
-            fd.write(buf[:i])
-            q = '"'
-            buf = buf[i+1:]
-            i = 0
-        elif buf[i] == "'":
-            fd.write(buf[:i])
-            q = "'"
-            buf = buf[i+1:]
-            i = 0
-        elif buf[i].isspace():
-            i = i + 1
-        elif keyword_next:
-            m = pyang.syntax.re_keyword.match(buf, i)
-            if m is not None:
-                kw = m.group()
-                if kw in pyang.syntax.yin_map:
-                    fd.write(buf[:i])
-                    fd.write("<span class='kw'>" + kw + "</span>")
-                    buf = buf[i+len(kw):]
-                    i = 0
-                    keyword_next = False
-                    continue
-            i = i + 1
-        elif buf[i] in ['{', '}', ';']:
-            keyword_next = True
-            i = i + 1
-        else:
-            i = i + 1
+def markup_yang(text, fd):
+    """Write the YANG text `text`, escaped and with html markup, to `fd`.
+
+    The text is read with the YangTokenizer of the YANG parser.  Each
+    token is written when it has been read, as a slice of `text`; the
+    tokenizer's position is a line number and an offset in that line.
+    Text which isn't a keyword where a keyword is expected is written
+    without markup.
+    """
+    lines = text.splitlines(True)
+    starts = [0]
+    for line in lines:
+        starts.append(starts[-1] + len(line))
+    # the errors are not reported
+    tok = YangTokenizer(text, error.Position(''), [])
+    written = [0]
+
+    def here():
+        if tok.pos.line == 0:
+            return 0
+        return starts[tok.pos.line - 1] + tok.offset
 
-    fd.write(buf)
+    def write_to(end, cls=None):
+        if end > written[0]:
+            s = escape(text[written[0]:end])
+            if cls is None:
+                fd.write(s)
+            else:
+                fd.write("<span class='%s'>%s</span>" % (cls, s))
+            written[0] = end
 
-    if not args.scan_document:
-        fd.write('</pre>\n')
+    def skip():
+        # skip whitespace and comments, and return the next character
+        while True:
+            tok.skip(keep_comments=True)
+            write_to(here())
+            if tok.buf.startswith('//'):
+                write_to(here() + len(tok.buf.rstrip('\r\n')), 'cmt')
+                tok.set_buf(len(tok.buf))
+            elif tok.buf.startswith('/*'):
+                try:
+                    i = tok.buf.find('*/')
+                    while i == -1:
+                        tok.readline()
+                        i = tok.buf.find('*/')
+                    tok.set_buf(i + 2)
+                except error.Eof:
+                    write_to(len(text), 'cmt')
+                    raise
+                write_to(here(), 'cmt')
+            else:
+                return tok.buf[0]
+
+    keyword_next = True
+    try:
+        while True:
+            c = skip()
+            start = here()
+            if c in ';{}':
+                tok.set_buf(1)
+                keyword_next = True
+            elif keyword_next:
+                keyword_next = False
+                try:
+                    kw = tok.get_keyword()
+                except error.Abort:
+                    # not a keyword; skip to the next separator
+                    m = re_separator.search(tok.buf,
+                                             1 if here() == start else 0)
+                    tok.set_buf(m.start() if m else len(tok.buf))
+                    continue
+                if kw in syntax.yin_map:
+                    write_to(here(), 'kw')
+            elif c in '"\'':
+                # each quoted string is marked up by itself, not
+                # concatenated with '+' as in tok.get_strings()
+                i = 1
+                while True:
+                    while i < len(tok.buf) and tok.buf[i] != c:
+                        if c == '"' and tok.buf[i] == '\\':
+                            i += 1
+                        i += 1
+                    if i < len(tok.buf):
+                        break
+                    tok.readline()
+                    i = 0
+                tok.set_buf(i + 1)
+                write_to(here(), 'str')
+            else:
+                tok.get_strings()
+                if here() == start:
+                    # a stray '*/'
+                    tok.set_buf(2)
+    except error.Eof:
+        pass
+    write_to(len(text))
 
 if __name__ == "__main__":
     run()
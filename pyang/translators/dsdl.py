@@ -58,6 +58,7 @@ class DSDLPlugin(plugin.PyangPlugin):
     def add_output_format(self, fmts):
         self.multiple_modules = True
         fmts['dsdl'] = self
+        self.output_suffix = '.dsdl'
     def add_opts(self, optparser):
         optlist = [
             optparse.make_option("--dsdl-no-documentation",
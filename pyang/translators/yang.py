@@ -13,6 +13,7 @@ class YANGPlugin(plugin.PyangPlugin):
     def add_output_format(self, fmts):
         fmts['yang'] = self
         self.handle_comments = True
+        self.output_suffix = '.yang'
 
     def add_opts(self, optparser):
         optlist = [
@@ -46,12 +47,19 @@ class YANGPlugin(plugin.PyangPlugin):
         emit_yang(ctx, module, fd)
 
 def emit_yang(ctx, module, fd):
+    """Write `module` as YANG to `fd`.
+
+    The output is collected as a list of strings, which is written to
+    `fd` in one call."""
     link_list = {}
     # make the stmt tree to a link_list, in order to peek the next stmt
     make_link_list(ctx, module, link_list)
     link_list['last'] = None
 
-    emit_stmt(ctx, module, fd, 0, None, None, False, '', '  ', link_list)
+    chunks = []
+    emit_stmt(ctx, module, chunks.append, 0, None, None, False, '', '  ',
+              link_list)
+    fd.write(''.join(chunks))
 
 # always add newline between keyword and argument
 _force_newline_arg = ('description', 'reference', 'contact', 'organization')
@@ -121,14 +129,19 @@ _kwd_class = {
     'module': None,
     'submodule': None,
 }
+# the class of each keyword seen so far, filled in by get_kwd_class()
+_kwd_class_table = dict(_kwd_class)
+
 def get_kwd_class(keyword):
-    if util.is_prefixed(keyword):
-        return 'extension'
-    else:
-        try:
-            return _kwd_class[keyword]
-        except KeyError:
-            return 'body'
+    try:
+        return _kwd_class_table[keyword]
+    except KeyError:
+        if util.is_prefixed(keyword):
+            kwd_class = 'extension'
+        else:
+            kwd_class = 'body'
+        _kwd_class_table[keyword] = kwd_class
+        return kwd_class
 
 _need_quote = (
     " ", "}", "{", ";", '"', "'",
@@ -140,28 +153,30 @@ _need_single_quote = (
     )
 
 def make_link_list(ctx, stmt, link_list):
+    """Link each statement in the tree `stmt` to the next statement in
+    the output, and the pair (stmt, 'substmts') to the substatements of
+    stmt in the order they are printed."""
     if 'last' in link_list:
         link_list[ link_list['last'] ] = stmt
     link_list['last'] = stmt
 
-    if len(stmt.substmts) > 0:
-        if ctx.opts.yang_canonical:
-            substmts = grammar.sort_canonical(stmt.keyword, stmt.substmts)
-        else:
-            substmts = stmt.substmts
-        for i, s in enumerate(substmts, start=1):
-            make_link_list(ctx, s, link_list)
+    if ctx.opts.yang_canonical and len(stmt.substmts) > 1:
+        substmts = grammar.sort_canonical(stmt.keyword, stmt.substmts)
+    else:
+        substmts = stmt.substmts
+    link_list[(stmt, 'substmts')] = substmts
+    for s in substmts:
+        make_link_list(ctx, s, link_list)
 
-def emit_stmt(ctx, stmt, fd, level, prev_kwd, prev_kwd_class, islast,
+def emit_stmt(ctx, stmt, w, level, prev_kwd, prev_kwd_class, islast,
               indent, indentstep, link_list):
     if is_line_end_comment(stmt):
         # line end comments has been printed after last meaningful statement
         return
 
-    if ctx.opts.yang_remove_unused_imports and stmt.keyword == 'import':
-        for p in stmt.parent.i_unused_prefixes:
-            if stmt.parent.i_unused_prefixes[p] == stmt:
-                return
+    if (ctx.opts.yang_remove_unused_imports and stmt.keyword == 'import' and
+        stmt in stmt.parent.i_unused_prefixes.values()):
+        return
 
     max_line_len = ctx.opts.yang_line_length
     if util.is_prefixed(stmt.raw_keyword):
@@ -176,13 +191,13 @@ def emit_stmt(ctx, stmt, fd, level, prev_kwd, prev_kwd_class, islast,
         not ((level == 1 and prev_kwd in
               _keyword_with_trailing_blank_line_toplevel) or
              prev_kwd in _keyword_with_trailing_blank_line)):
-        fd.write('\n')
+        w('\n')
 
     if stmt.keyword == '_comment':
-        emit_comment(stmt.arg, fd, indent)
+        emit_comment(stmt.arg, w, indent)
         return
 
-    fd.write(indent + keywordstr)
+    w(indent + keywordstr)
     arg_on_new_line = False
     if len(stmt.substmts) == 0:
         eol = ';'
@@ -198,29 +213,29 @@ def emit_stmt(ctx, stmt, fd, level, prev_kwd, prev_kwd_class, islast,
             # print with single quotes
             if hasattr(stmt, 'arg_substrings') and len(stmt.arg_substrings) > 1:
                 # the arg was already split into multiple lines, keep them
-                emit_multi_str_arg(keywordstr, stmt.arg_substrings, fd, "'",
+                emit_multi_str_arg(keywordstr, stmt.arg_substrings, w, "'",
                                    indent, indentstep, max_line_len, line_len)
             elif not need_new_line(max_line_len, line_len, stmt.arg):
                 # fits into a single line
-                fd.write(" '" + stmt.arg + "'")
+                w(" '" + stmt.arg + "'")
             else:
                 # otherwise, print on new line, don't check line length
                 # since we can't break the string into multiple lines
-                fd.write('\n' + indent + indentstep)
-                fd.write("'" + stmt.arg + "'")
+                w('\n' + indent + indentstep)
+                w("'" + stmt.arg + "'")
                 arg_on_new_line = True
         elif hasattr(stmt, 'arg_substrings') and len(stmt.arg_substrings) > 1:
             # the arg was already split into multiple lines, keep them
-            emit_multi_str_arg(keywordstr, stmt.arg_substrings, fd, '"',
+            emit_multi_str_arg(keywordstr, stmt.arg_substrings, w, '"',
                                indent, indentstep, max_line_len, line_len)
         elif '\n' in stmt.arg:
             # the arg string contains newlines; print it as double quoted
-            arg_on_new_line = emit_arg(keywordstr, stmt, fd, indent, indentstep,
+            arg_on_new_line = emit_arg(keywordstr, stmt, w, indent, indentstep,
                                        max_line_len, line_len - 1 - len(eol))
         elif stmt.keyword in _keyword_with_path_arg:
             # special code for path argument; pretty-prints a long path with
             # line breaks
-           arg_on_new_line = emit_path_arg(keywordstr, stmt.arg, fd,
+           arg_on_new_line = emit_path_arg(keywordstr, stmt.arg, w,
                                            indent, max_line_len, line_len, eol)
         elif stmt.keyword in grammar.stmt_map:
             (arg_type, _subspec) = grammar.stmt_map[stmt.keyword]
@@ -229,28 +244,25 @@ def emit_stmt(ctx, stmt, fd, level, prev_kwd, prev_kwd_class, islast,
                  not need_quote(stmt.arg))):
                 # minus 2 since we don't quote
                 if not need_new_line(max_line_len, line_len-2, stmt.arg):
-                    fd.write(' ' + stmt.arg)
+                    w(' ' + stmt.arg)
                 else:
-                    fd.write('\n' + indent + indentstep + stmt.arg)
+                    w('\n' + indent + indentstep + stmt.arg)
                     arg_on_new_line = True
             else:
-                arg_on_new_line = emit_arg(keywordstr, stmt, fd,
+                arg_on_new_line = emit_arg(keywordstr, stmt, w,
                                            indent, indentstep,
                                            max_line_len, line_len)
         else:
-            arg_on_new_line = emit_arg(keywordstr, stmt, fd, indent, indentstep,
+            arg_on_new_line = emit_arg(keywordstr, stmt, w, indent, indentstep,
                                        max_line_len, line_len)
-    fd.write(eol)
+    w(eol)
 
     next_stmt = link_list.get(stmt, None)
-    emit_line_end_comments(stmt, next_stmt, link_list, fd, False)
-    fd.write('\n')
+    emit_line_end_comments(stmt, next_stmt, link_list, w, False)
+    w('\n')
 
     if len(stmt.substmts) > 0:
-        if ctx.opts.yang_canonical:
-            substmts = grammar.sort_canonical(stmt.keyword, stmt.substmts)
-        else:
-            substmts = stmt.substmts
+        substmts = link_list[(stmt, 'substmts')]
         if level == 0:
             kwd_class = 'header'
         prev_kwd = None
@@ -268,26 +280,26 @@ def emit_stmt(ctx, stmt, fd, level, prev_kwd, prev_kwd_class, islast,
 #                n = 2
 
             link_list['last'] = s
-            emit_stmt(ctx, s, fd, level + 1, prev_kwd, kwd_class,
+            emit_stmt(ctx, s, w, level + 1, prev_kwd, kwd_class,
                       i == len(substmts),
                       indent + (indentstep * n), indentstep, link_list)
             if not is_line_end_comment(s):
                 kwd_class = get_kwd_class(s.keyword)
                 prev_kwd = s.keyword
-        fd.write(indent + '}')
+        w(indent + '}')
         last_substmt = link_list['last']
         if last_substmt in link_list:
             last_substmt = link_list[last_substmt]
-        emit_line_end_comments(stmt, last_substmt, link_list, fd, True)
-        fd.write('\n')
+        emit_line_end_comments(stmt, last_substmt, link_list, w, True)
+        w('\n')
 
     if (not islast and
         ((level == 1 and stmt.keyword in
           _keyword_with_trailing_blank_line_toplevel) or
          stmt.keyword in _keyword_with_trailing_blank_line)):
-        fd.write('\n')
+        w('\n')
 
-def emit_line_end_comments(stmt, next_stmt, link_list, fd, same_level):
+def emit_line_end_comments(stmt, next_stmt, link_list, w, same_level):
     """
     emit line end comment stmts, there are some cases:
     1. after "{"
@@ -300,7 +312,7 @@ def emit_line_end_comments(stmt, next_stmt, link_list, fd, same_level):
             is_sub_level = next_stmt.stmt_parent == stmt
         if (is_line_end_comment(next_stmt) and
                 (next_stmt.stmt_parent == stmt.stmt_parent or (not same_level and is_sub_level))):
-            fd.write(' ' + next_stmt.arg)
+            w(' ' + next_stmt.arg)
             if next_stmt in link_list:
                 next_stmt = link_list[next_stmt]
             else:
@@ -320,7 +332,7 @@ def need_new_line(max_line_len, line_len, arg):
     else:
         return False
 
-def emit_multi_str_arg(keywordstr, strs, fd, pref_q,
+def emit_multi_str_arg(keywordstr, strs, w, pref_q,
                        indent, indentstep, max_line_len,
                        line_len):
     # we want to align all strings on the same column; check if
@@ -335,29 +347,29 @@ def emit_multi_str_arg(keywordstr, strs, fd, pref_q,
                 need_new_line = True
                 break
     if need_new_line:
-        fd.write('\n' + indent + indentstep)
+        w('\n' + indent + indentstep)
         prefix = (len(indent) - 2) * ' ' + indentstep + '+ '
     else:
-        fd.write(' ')
+        w(' ')
         prefix = indent + ((len(keywordstr) - 1) * ' ') + '+ '
     # print first substring
     (s, q) = strs[0]
     q = select_quote(s, q, pref_q)
     if q == '"':
         s = escape_str(s)
-    fd.write("%s%s%s\n" % (q, s, q))
+    w("%s%s%s\n" % (q, s, q))
     # then print the rest with the prefix and a newline at the end
     for s, q in strs[1:-1]:
         q = select_quote(s, q, pref_q)
         if q == '"':
             s = escape_str(s)
-        fd.write("%s%s%s%s\n" % (prefix, q, s, q))
+        w("%s%s%s%s\n" % (prefix, q, s, q))
     # then print last substring with prefix but no newline
     (s, q) = strs[-1]
     q = select_quote(s, q, pref_q)
     if q == '"':
         s = escape_str(s)
-    fd.write("%s%s%s%s" % (prefix, q, s, q))
+    w("%s%s%s%s" % (prefix, q, s, q))
 
     return need_new_line
 
@@ -387,7 +399,7 @@ def escape_str(s):
     s = s.replace('\t', r'\t')
     return s
 
-def emit_path_arg(keywordstr, arg, fd, indent, max_line_len, line_len, eol):
+def emit_path_arg(keywordstr, arg, w, indent, max_line_len, line_len, eol):
     """Heuristically pretty print a path argument"""
 
     quote = '"'
@@ -395,27 +407,27 @@ def emit_path_arg(keywordstr, arg, fd, indent, max_line_len, line_len, eol):
     arg = escape_str(arg)
 
     if not need_new_line(max_line_len, line_len, arg):
-        fd.write(" " + quote + arg + quote)
+        w(" " + quote + arg + quote)
         return False
 
     num_chars = max_line_len - line_len
     if num_chars <= 0:
         # really small max_line_len; we give up
-        fd.write(" " + quote + arg + quote)
+        w(" " + quote + arg + quote)
         return False
 
     while num_chars > 2 and arg[num_chars - 1:num_chars] != '/':
         num_chars -= 1
     if arg[num_chars - 1:num_chars] == '/':
         num_chars -= 1
-    fd.write(" " + quote + arg[:num_chars] + quote)
+    w(" " + quote + arg[:num_chars] + quote)
     arg = arg[num_chars:]
     keyword_cont = ((len(keywordstr) - 1) * ' ') + '+'
     while arg != '':
         line_len = len(
             "%s%s %s%s%s%s" % (indent, keyword_cont, quote, arg, quote, eol))
         if line_len <= max_line_len:
-            fd.write('\n' + indent + keyword_cont + " " +
+            w('\n' + indent + keyword_cont + " " +
                      quote + arg + quote)
             arg = ''
         else:
@@ -429,11 +441,11 @@ def emit_path_arg(keywordstr, arg, fd, indent, max_line_len, line_len, eol):
             else:
                 # print as much as possible
                 num_chars = len(arg) - (line_len - max_line_len)
-            fd.write('\n' + indent + keyword_cont + " " +
+            w('\n' + indent + keyword_cont + " " +
                      quote + arg[:num_chars] + quote)
             arg = arg[num_chars:]
 
-def emit_arg(keywordstr, stmt, fd, indent, indentstep, max_line_len, line_len):
+def emit_arg(keywordstr, stmt, w, indent, indentstep, max_line_len, line_len):
     """Heuristically pretty print the argument string with double quotes"""
     arg = escape_str(stmt.arg)
     lines = arg.splitlines(True)
@@ -442,10 +454,10 @@ def emit_arg(keywordstr, stmt, fd, indent, indentstep, max_line_len, line_len):
             arg = arg[:-1] + r'\n'
         if (stmt.keyword in _force_newline_arg or
             need_new_line(max_line_len, line_len, arg)):
-            fd.write('\n' + indent + indentstep + '"' + arg + '"')
+            w('\n' + indent + indentstep + '"' + arg + '"')
             return True
         else:
-            fd.write(' "' + arg + '"')
+            w(' "' + arg + '"')
             return False
     else:
         need_nl = False
@@ -461,36 +473,36 @@ def emit_arg(keywordstr, stmt, fd, indent, indentstep, max_line_len, line_len):
                     need_nl = True
                     break
         if need_nl:
-            fd.write('\n' + indent + indentstep)
+            w('\n' + indent + indentstep)
             prefix = indent + indentstep
         else:
-            fd.write(' ')
+            w(' ')
             prefix = indent + len(keywordstr) * ' ' + ' '
-        fd.write('"' + lines[0])
+        w('"' + lines[0])
         for line in lines[1:-1]:
             if line[0] == '\n':
-                fd.write('\n')
+                w('\n')
             else:
-                fd.write(prefix + ' ' + line)
+                w(prefix + ' ' + line)
         # write last line
-        fd.write(prefix + ' ' + lines[-1])
+        w(prefix + ' ' + lines[-1])
         if lines[-1][-1] == '\n':
             # last line ends with a newline, indent the ending quote
-            fd.write(prefix + '"')
+            w(prefix + '"')
         else:
-            fd.write('"')
+            w('"')
         return True
 
-def emit_comment(comment, fd, indent):
+def emit_comment(comment, w, indent):
     lines = comment.splitlines(True)
     for x in lines:
         if x[0] == '*':
-            fd.write(indent + ' ' + x)
+            w(indent + ' ' + x)
         elif x == '\n':
-            fd.write(x)
+            w(x)
         else:
-            fd.write(indent + x)
-    fd.write('\n')
+            w(indent + x)
+    w('\n')
 
 def need_quote(arg):
     for ch in _need_quote:
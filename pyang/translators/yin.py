@@ -6,11 +6,13 @@ from xml.sax.saxutils import escape
 import optparse
 import re
 
+from lxml import etree
+
 from .. import plugin
-from .. import util
 from .. import grammar
 from .. import syntax
 from .. import statements
+from .. import error
 
 yin_namespace = "urn:ietf:params:xml:ns:yang:yin:1"
 
@@ -33,39 +35,57 @@ class YINPlugin(plugin.PyangPlugin):
         g.add_options(optlist)
     def add_output_format(self, fmts):
         fmts['yin'] = self
+        self.output_suffix = '.yin'
     def emit(self, ctx, modules, fd):
         module = modules[0]
         emit_yin(ctx, module, fd)
 
 def emit_yin(ctx, module, fd):
-    fd.write('<?xml version="1.0" encoding="UTF-8"?>\n')
-    fd.write('<%s name="%s"\n' % (module.keyword, module.arg))
-    fd.write(' ' * len(module.keyword) + '  xmlns="%s"' % yin_namespace)
+    """Write `module` as YIN to `fd`.
+
+    The output is collected as a list of strings, which is written to
+    `fd` in one call."""
+    chunks = []
+    w = chunks.append
+    w('<?xml version="1.0" encoding="UTF-8"?>\n')
+    w('<%s name="%s"\n' % (module.keyword, module.arg))
+    w(' ' * len(module.keyword) + '  xmlns="%s"' % yin_namespace)
+    for prefix, uri in module_namespaces(ctx, module):
+        w('\n')
+        w(' ' * len(module.keyword))
+        w('  xmlns:' + prefix + '=' + quoteattr(uri))
+    w('>\n')
+    indents = ['', '  ']
+    for s in substmts(ctx, module):
+        emit_stmt(ctx, module, s, w, 1, indents)
+    w('</%s>\n' % module.keyword)
+    fd.write(''.join(chunks))
 
+def module_namespaces(ctx, module):
+    """Return the list of (prefix, namespace uri) declared in the YIN
+    output of `module`, for its own prefix and for the prefixes of the
+    modules it imports."""
+    res = []
     prefix = module.search_one('prefix')
     if prefix is not None:
         namespace = module.search_one('namespace')
-        fd.write('\n')
-        fd.write(' ' * len(module.keyword))
-        fd.write('  xmlns:' + prefix.arg + '=' +
-                 quoteattr(namespace.arg))
+        res.append((prefix.arg, namespace.arg))
     else:
         belongs_to = module.search_one('belongs-to')
         if belongs_to is not None:
             prefix = belongs_to.search_one('prefix')
             if prefix is not None:
                 # read the parent module in order to find the namespace uri
-                res = ctx.read_module(belongs_to.arg, extra={'no_include':True})
-                if res is not None:
-                    namespace = res.search_one('namespace')
+                mod = ctx.read_module(belongs_to.arg,
+                                      extra={'no_include':True,
+                                             'header_only':True})
+                if mod is not None:
+                    namespace = mod.search_one('namespace')
                     if namespace is None or namespace.arg is None:
                         pass
                     else:
                         # success - namespace found
-                        fd.write('\n')
-                        fd.write(' ' * len(module.keyword))
-                        fd.write('  xmlns:' + prefix.arg + '=' +
-                                 quoteattr(namespace.arg))
+                        res.append((prefix.arg, namespace.arg))
 
     for imp in module.search('import'):
         prefix = imp.search_one('prefix')
@@ -78,85 +98,142 @@ def emit_yin(ctx, module, fd):
             if mod is not None:
                 ns = mod.search_one('namespace')
                 if ns is not None:
-                    fd.write('\n')
-                    fd.write(' ' * len(module.keyword))
-                    fd.write('  xmlns:' + prefix.arg + '=' +
-                             quoteattr(ns.arg))
-    fd.write('>\n')
+                    res.append((prefix.arg, ns.arg))
+    return res
+
+def substmts(ctx, stmt):
     if ctx.opts.yin_canonical:
-        substmts = grammar.sort_canonical(module.keyword, module.substmts)
-    else:
-        substmts = module.substmts
-    for s in substmts:
-        emit_stmt(ctx, module, s, fd, '  ', '  ')
-    fd.write('</%s>\n' % module.keyword)
-
-def emit_stmt(ctx, module, stmt, fd, indent, indentstep):
-    if util.is_prefixed(stmt.raw_keyword):
-        # this is an extension.  need to find its definition
-        (prefix, identifier) = stmt.raw_keyword
-        tag = prefix + ':' + identifier
-        if stmt.i_extension is not None:
-            ext_arg = stmt.i_extension.search_one('argument')
-            if ext_arg is not None:
-                yin_element = ext_arg.search_one('yin-element')
-                if yin_element is not None and yin_element.arg == 'true':
-                    argname = prefix + ':' + ext_arg.arg
-                    argiselem = True
-                else:
-                    # explicit false or no yin-element given
-                    argname = ext_arg.arg
-                    argiselem = False
-            else:
-                argiselem = False
-                argname = None
-        else:
-            argiselem = False
-            argname = None
-    else:
-        (argname, argiselem) = syntax.yin_map[stmt.raw_keyword]
-        tag = stmt.raw_keyword
+        return grammar.sort_canonical(stmt.keyword, stmt.substmts)
+    return stmt.substmts
+
+# (tag, argname, argiselem) of each YANG keyword
+_yin_elements = dict((keyword, (keyword, argname, argiselem))
+                     for keyword, (argname, argiselem)
+                     in syntax.yin_map.items())
+
+def yin_element(stmt):
+    """Return (tag, argname, argiselem) of `stmt` in YIN, where `tag`
+    and `argname` may be prefixed."""
+    try:
+        return _yin_elements[stmt.raw_keyword]
+    except KeyError:
+        pass
+    # this is an extension.  need to find its definition
+    (prefix, identifier) = stmt.raw_keyword
+    tag = prefix + ':' + identifier
+    if stmt.i_extension is not None:
+        ext_arg = stmt.i_extension.search_one('argument')
+        if ext_arg is not None:
+            yin_elem = ext_arg.search_one('yin-element')
+            if yin_elem is not None and yin_elem.arg == 'true':
+                return tag, prefix + ':' + ext_arg.arg, True
+            # explicit false or no yin-element given
+            return tag, ext_arg.arg, False
+    return tag, None, False
+
+def emit_stmt(ctx, module, stmt, w, level, indents):
+    """Write `stmt` at indentation level `level` with `w`.
+
+    `indents` is the list of indentation strings, by level."""
+    while len(indents) < level + 3:
+        indents.append(indents[-1] + '  ')
+    indent = indents[level]
+    (tag, argname, argiselem) = yin_element(stmt)
     if argiselem is False or argname is None:
         if argname is None:
             attr = ''
         else:
-            attr = ' ' + argname + '=' + quoteattr(stmt.arg)
+            attr = ' ' + argname + '=' + _quoteattr(stmt.arg)
         if len(stmt.substmts) == 0:
-            fd.write(indent + '<' + tag + attr + '/>\n')
+            w(indent + '<' + tag + attr + '/>\n')
         else:
-            fd.write(indent + '<' + tag + attr + '>\n')
+            w(indent + '<' + tag + attr + '>\n')
             for s in stmt.substmts:
-                emit_stmt(ctx, module, s, fd, indent + indentstep,
-                          indentstep)
-            fd.write(indent + '</' + tag + '>\n')
+                emit_stmt(ctx, module, s, w, level + 1, indents)
+            w(indent + '</' + tag + '>\n')
     else:
-        fd.write(indent + '<' + tag + '>\n')
+        w(indent + '<' + tag + '>\n')
         if ctx.opts.yin_pretty_strings:
             # since whitespace is significant in XML, the current
             # code is strictly speaking incorrect.  But w/o the whitespace,
             # it looks too ugly.
-            fd.write(indent + indentstep + '<' + argname + '>\n')
-            fd.write(fmt_text(indent + indentstep + indentstep, stmt.arg))
-            fd.write('\n' + indent + indentstep + '</' + argname + '>\n')
-        else:
-            fd.write(indent + indentstep + '<' + argname + '>' + \
-                       escape(stmt.arg) + \
-                       '</' + argname + '>\n')
-        if ctx.opts.yin_canonical:
-            substmts = grammar.sort_canonical(stmt.keyword, stmt.substmts)
+            w(indents[level + 1] + '<' + argname + '>\n')
+            w(fmt_text(indents[level + 2], stmt.arg))
+            w('\n' + indents[level + 1] + '</' + argname + '>\n')
         else:
-            substmts = stmt.substmts
-        for s in substmts:
-            emit_stmt(ctx, module, s, fd, indent + indentstep, indentstep)
-        fd.write(indent + '</' + tag + '>\n')
+            w(indents[level + 1] + '<' + argname + '>' +
+              _escape(stmt.arg) + '</' + argname + '>\n')
+        for s in substmts(ctx, stmt):
+            emit_stmt(ctx, module, s, w, level + 1, indents)
+        w(indent + '</' + tag + '>\n')
+
+_re_text_special = re.compile('[&<>]')
+_re_attr_special = re.compile('[&<>"\n\r\t]')
+
+def _escape(data):
+    # most arguments have nothing to escape
+    if _re_text_special.search(data) is None:
+        return data
+    return escape(data)
+
+def _quoteattr(data):
+    if _re_attr_special.search(data) is None:
+        return '"' + data + '"'
+    return quoteattr(data)
 
 def fmt_text(indent, data):
-    res = []
-    for line in re.split("(\n)", escape(data)):
-        if line == '':
-            continue
-        if line == '\n':
-            res.extend(line)
+    # the lines are indented, except empty lines
+    return '\n'.join([indent + line if line else ''
+                      for line in _escape(data).split('\n')])
+
+def emit_yin_tree(ctx, module):
+    """Return `module` as YIN in an lxml ElementTree.
+
+    The tree is built from the statements, with the same elements and
+    namespaces as the output of emit_yin(), but without whitespace for
+    indentation, and with the arguments as they are, also with
+    --yin-pretty-strings."""
+    nsmap = {None: yin_namespace}
+    for prefix, uri in module_namespaces(ctx, module):
+        nsmap[prefix] = uri
+    root = etree.Element('{%s}%s' % (yin_namespace, module.keyword),
+                         nsmap=nsmap)
+    root.set('name', module.arg)
+    qnames = _QNames(nsmap)
+    for s in substmts(ctx, module):
+        _add_element(ctx, root, s, qnames)
+    return etree.ElementTree(root)
+
+class _QNames(dict):
+    """The Clark notation of each possibly prefixed name, computed when
+    the name is first looked up"""
+
+    def __init__(self, nsmap):
+        dict.__init__(self)
+        self.nsmap = nsmap
+
+    def __missing__(self, name):
+        if ':' not in name:
+            qname = '{%s}%s' % (yin_namespace, name)
         else:
-            res.extend(indent + line)
-    return ''.join(res)
+            (prefix, local_name) = name.split(':', 1)
+            try:
+                qname = '{%s}%s' % (self.nsmap[prefix], local_name)
+            except KeyError:
+                raise error.EmitError("no namespace for the prefix %s in %s"
+                                      % (prefix, name))
+        self[name] = qname
+        return qname
+
+def _add_element(ctx, parent, stmt, qnames):
+    (tag, argname, argiselem) = yin_element(stmt)
+    e = etree.SubElement(parent, qnames[tag])
+    if argiselem is False or argname is None:
+        if argname is not None:
+            e.set(argname, stmt.arg)
+        for s in stmt.substmts:
+            _add_element(ctx, e, s, qnames)
+    else:
+        etree.SubElement(e, qnames[argname]).text = stmt.arg
+        for s in substmts(ctx, stmt):
+            _add_element(ctx, e, s, qnames)
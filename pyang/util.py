@@ -175,3 +175,30 @@ def data_node_up(node):
     if p and p.keyword in skip:
         return closest_ancestor_data_node(p)
     return p
+
+
+class BufferedWriter(object):
+    """A file-like object which collects the strings written to it, and
+    writes them to `fd` in chunks of about `size` characters.
+
+    Plugins which write many small strings can use it to avoid one
+    write() call on the output file per string.  flush() must be called
+    when done; it does not flush `fd`."""
+
+    def __init__(self, fd, size=65536):
+        self.fd = fd
+        self.size = size
+        self._parts = []
+        self._len = 0
+
+    def write(self, s):
+        self._parts.append(s)
+        self._len += len(s)
+        if self._len >= self.size:
+            self.flush()
+
+    def flush(self):
+        if self._parts:
+            self.fd.write(''.join(self._parts))
+            self._parts = []
+            self._len = 0
@@ -3,6 +3,7 @@
 The parser does not check any keywords or grammar.
 """
 import collections
+import re
 import sys
 from . import error
 from . import util
@@ -270,17 +271,39 @@ class YangTokenizer(object):
                     return [(res, '')]
                 i = i + 1
 
+# the statements that are kept by YangParser.parse_header()
+header_keywords = (
+    'yang-version', 'namespace', 'prefix', 'belongs-to',
+    'import', 'include',
+    'organization', 'contact', 'description', 'reference',
+    'revision',
+    'feature',
+)
+
+# the tokens that matter when statements are skipped without being parsed.
+# a lone quote means that a string is not terminated, and a lone '/*' that
+# a comment is not terminated.
+_re_skip_token = re.compile(r'''"(?:[^"\\]|\\.)*"|'[^']*'|//[^\n]*|/\*.*?\*/|/\*|[;{}"']''',
+                            re.DOTALL)
+_re_skip_to_keyword = re.compile(r'(?:\s+|//[^\n]*|/\*.*?\*/)*(%s)' %
+                                 syntax.keyword, re.DOTALL)
+
 class YangParser(object):
     def __init__(self, extra=None):
-        pass
+        """If `extra` contains 'header_only', parse() works like
+        parse_header()."""
+        self.extra = {} if extra is None else extra
 
     def parse(self, ctx, ref, text):
         """Parse the string `text` containing a YANG statement.
 
         Return a Statement on success or None on failure
         """
+        if 'header_only' in self.extra:
+            return self.parse_header(ctx, ref, text)
 
         self.ctx = ctx
+        self.errors = ctx.errors
         self.pos = error.Position(ref)
         self.last_line = 0
         self.top = None
@@ -306,11 +329,127 @@ class YangParser(object):
             pass
         return None
 
+    def parse_header(self, ctx, ref, text):
+        """Parse the header of the (sub)module in the string `text`.
+
+        Only the module's statements in `header_keywords` are parsed; all
+        other statements are skipped without being parsed.  The returned
+        Statement has the attribute `is_header_only` set to True.
+
+        If anything unusual is found, e.g., a syntax error, the whole
+        text is parsed with parse(), and the complete Statement is
+        returned, without `is_header_only`.  Errors are only reported by
+        parse().
+
+        Return a Statement on success or None on failure
+        """
+        self.ctx = ctx
+        self.errors = []
+        self.pos = error.Position(ref)
+        self.last_line = 0
+        self.top = None
+        try:
+            self.tokenizer = YangTokenizer(text, self.pos, self.errors,
+                                           None, False,
+                                           not ctx.lax_quote_checks)
+            stmt = self._parse_header()
+        except (error.Abort, error.Eof):
+            stmt = None
+        if (stmt is None or self.errors or
+            stmt.keyword not in ('module', 'submodule')):
+            return YangParser().parse(ctx, ref, text)
+        stmt.is_header_only = True
+        return stmt
+
+    def _parse_header(self):
+        tokenizer = self.tokenizer
+        keywd = tokenizer.get_keyword()
+        argstrs = tokenizer.get_strings()
+        arg = ''.join([a[0] for a in argstrs])
+        stmt = statements.new_statement(None, None, self.pos, keywd, arg)
+        self.pos.top = stmt
+        self.top = stmt
+        if tokenizer.peek() != '{':
+            return None
+        tokenizer.skip_tok()
+        while tokenizer.peek() != '}':
+            m = syntax.re_keyword.match(tokenizer.buf)
+            if (m is not None and m.group(2) is None and
+                m.group(3) in header_keywords):
+                substmt = self._parse_statement(stmt)
+                stmt.substmts.append(substmt)
+            else:
+                # the body starts here
+                self._scan_body(stmt)
+                break
+        return stmt
+
+    def _scan_body(self, stmt):
+        """Skip the body of the module `stmt`, except for statements in
+        `header_keywords`, which are parsed."""
+        tokenizer = self.tokenizer
+        # the rest of the text, which starts at the current position
+        text = tokenizer.buf + ''.join(tokenizer.lines)
+        line = self.pos.line
+        offset = tokenizer.offset
+        line_start = -offset
+        counted = 0
+        depth = 0
+        stmt_start = 0
+        for m in _re_skip_token.finditer(text):
+            c = text[m.start()]
+            if c == '{':
+                depth += 1
+                continue
+            elif c == '}':
+                if depth == 0:
+                    # end of module
+                    return
+                depth -= 1
+                if depth > 0:
+                    continue
+            elif c == ';':
+                if depth > 0:
+                    continue
+            elif len(m.group()) == 1 or m.group() == '/*':
+                # unterminated string or comment
+                raise error.Abort
+            else:
+                continue
+            # a statement in the body ends here
+            stmt_end = m.end()
+            k = _re_skip_to_keyword.match(text, stmt_start)
+            stmt_start = stmt_end
+            if k is None:
+                raise error.Abort
+            if k.group(3) is not None or k.group(4) not in header_keywords:
+                continue
+            # parse this statement
+            kstart = k.start(1)
+            line += text.count('\n', counted, kstart)
+            counted = kstart
+            nl = text.rfind('\n', 0, kstart)
+            if nl != -1:
+                line_start = nl + 1
+            # keep the statement's offset on its first line, for
+            # multi-line strings
+            prefix = re.sub(r'\S', ' ', text[max(line_start, 0):kstart])
+            if line_start < 0:
+                prefix = ' ' * -line_start + prefix
+            self.pos.line = line - 1
+            self.tokenizer = YangTokenizer(prefix + text[kstart:stmt_end],
+                                           self.pos, self.errors, None,
+                                           False, tokenizer.strict_quoting)
+            self.tokenizer.is_1_1 = tokenizer.is_1_1
+            stmt.substmts.append(self._parse_statement(stmt))
+        # no end of module
+        raise error.Abort
+
     def _parse_statement(self, parent):
         # modification: when the --keep-comments flag is provided,
         # we would like to see if a statement is a comment, and if so
         # treat it differently than we treat keywords further down
-        if self.ctx.keep_comments:
+        if self.tokenizer.keep_comments:
             cmt, is_line_end, is_multi_line = self.tokenizer.get_comment(self.last_line)
             if cmt is not None:
                 stmt = statements.new_statement(self.top,
@@ -358,7 +497,7 @@ class YangParser(object):
         elif tok == ';':
             self.tokenizer.skip_tok() # skip the ';'
         else:
-            error.err_add(self.ctx.errors, self.pos, 'INCOMPLETE_STATEMENT',
+            error.err_add(self.errors, self.pos, 'INCOMPLETE_STATEMENT',
                           (keywd, tok))
             raise error.Abort
         self.last_line = self.pos.line
@@ -8,9 +8,10 @@ from . import util
 
 yin_namespace = "urn:ietf:params:xml:ns:yang:yin:1"
 
-# We're using expat to parse to our own primitive dom-like
-# structure, because we need to keep track of the linenumber per
-# statement.  And expat is easier to work with than minidom.
+# The elements in an extension statement are parsed to our own
+# primitive dom-like structure, because we need to keep track of the
+# linenumber per statement.  And expat is easier to work with than
+# minidom.
 class Element(object):
     def __init__(self, ns, local_name, attrs, pos):
         self.ns = ns
@@ -39,12 +40,24 @@ class Element(object):
         del self.attrs[name]
 
 class YinParser(object):
+    """Parser for YIN (sub)modules.
+
+    The statements are built while the text is parsed, without an
+    intermediate element tree.  Since an extension may be used before
+    it is defined, or before the module which defines it is imported,
+    the elements in an extension statement are kept as Element trees,
+    and turned into statements when the whole text has been parsed.
+    """
 
     ns_sep = "}"
     """namespace separator"""
 
+    chunk_size = 65536
+    """number of bytes read at a time by parse_file()"""
+
     def __init__(self, extra=None):
         self.parser = expat.ParserCreate("UTF-8", self.ns_sep)
+        self.parser.buffer_text = True
         self.parser.CharacterDataHandler = self.char_data
         self.parser.StartElementHandler = self.start_element
         self.parser.EndElementHandler = self.end_element
@@ -66,23 +79,47 @@ class YinParser(object):
 
         Return a Statement on success or None on failure.
         """
+        return self._parse(ctx, ref, lambda p: p.Parse(text.encode('utf-8'),
+                                                       True))
+
+    def parse_file(self, ctx, ref, fd):
+        """Parse the YIN (sub)module read from the binary file `fd`.
 
+        The file is read in chunks of `chunk_size` bytes, so the text
+        is never in memory as a whole.
+
+        Return a Statement on success or None on failure.
+        """
+        def feed(p):
+            while True:
+                data = fd.read(self.chunk_size)
+                p.Parse(data, not data)
+                if not data:
+                    break
+        return self._parse(ctx, ref, feed)
+
+    def _parse(self, ctx, ref, feed):
         self.ctx = ctx
         self.pos = error.Position(ref)
         self.top = None
-        self.top_element = None
 
         self.uri = None
+        self.prefix = None
         self.nsmap = {}
         self.prefixmap = {}
         self.included = []
         self.extensions = {}
+        self.mymodules = []
+        self.header_seen = set()
+        # (parent statement, placeholder, Element) for each extension
+        # statement, in document order
+        self.deferred = []
 
         self.data = ''
-        self.element_stack = []
+        self.stack = []
 
         try:
-            self.parser.Parse(text.encode('utf-8'), True)
+            feed(self.parser)
         except error.Abort:
             return None
         except expat.ExpatError as ex:
@@ -91,8 +128,14 @@ class YinParser(object):
                           str(ex).split(":")[0])
             return None
 
-        self.look_ahead()
-        self.create_statement(self.top_element, None)
+        for parent, placeholder, e in self.deferred:
+            stmt = self.create_statement(e, parent)
+            i = parent.substmts.index(placeholder)
+            if stmt is None:
+                del parent.substmts[i]
+            else:
+                parent.substmts[i] = stmt
+        self.deferred = []
         return self.top
 
     def get_lineno(self):
@@ -101,54 +144,236 @@ class YinParser(object):
         return self.parser.CurrentLineNumber
     lineno = property(get_lineno, doc="parser position")
 
-    # Handlers for Expat events
+    # Handlers for Expat events.  The stack has one entry per open
+    # element:
+    #   ('stmt', stmt, attrs) - a YIN statement
+    #   ('arg', stmt)         - the argument element of stmt
+    #   ('ext', e)            - an Element in an extension statement
+    #   ('skip',)             - an element which is ignored
 
     def start_element(self, name, attrs):
-        name = str(name) # convert from unicode strings
         self.pos.line = self.lineno
         (ns, local_name) = self.split_qname(name)
-        e = Element(ns, local_name, attrs, self.pos)
         if self.data.lstrip() != '':
             error.err_add(self.ctx.errors, self.pos, 'SYNTAX_ERROR',
                           "unexpected element - mixed content")
         self.data = ''
-        if not self.element_stack:
+        pos = self.pos
+        if not self.stack:
             # this is the top-level element
-            self.top_element = e
-            self.element_stack.append(e)
-            # special case - the top-level statement has its argument
-            # as an attribute, so we can save it here
-            try:
-                (argname, _arg_is_elem) = syntax.yin_map[e.local_name]
-                arg = e.find_attribute(argname)
-                # create and save the top-level statement here, so
-                # we get a correct Statement in pos.
-                stmt = statements.new_statement(None, None,
-                                                e.pos, e.local_name, arg)
-                self.top = stmt
-                self.pos.top = stmt
-            except:
-                pass
+            self.start_top(ns, local_name, attrs, pos)
             return
+        frame = self.stack[-1]
+        kind = frame[0]
+        if kind == 'ext':
+            e = Element(ns, local_name, attrs, pos)
+            frame[1].children.append(e)
+            if 'no_extensions' in self.extra:
+                self.stack.append(('skip',))
+            else:
+                self.stack.append(('ext', e))
+        elif kind != 'stmt':
+            self.stack.append(('skip',))
+        elif ns != yin_namespace:
+            # an extension statement
+            parent = frame[1]
+            e = Element(ns, local_name, attrs, pos)
+            # keeps the place of the statement among its siblings
+            placeholder = statements.Statement(self.top, parent, pos, None)
+            parent.substmts.append(placeholder)
+            self.deferred.append((parent, placeholder, e))
+            if 'no_extensions' in self.extra:
+                self.stack.append(('skip',))
+            else:
+                self.stack.append(('ext', e))
         else:
-            parent = self.element_stack[-1]
-            parent.children.append(e)
-            self.element_stack.append(e)
+            parent = frame[1]
+            (_, arg_is_elem) = syntax.yin_map[parent.keyword]
+            if (arg_is_elem is True and parent.arg is None and
+                local_name == syntax.yin_map[parent.keyword][0]):
+                self.stack.append(('arg', parent))
+            else:
+                stmt = self.new_statement(parent, local_name, attrs, pos)
+                if stmt is None:
+                    self.stack.append(('skip',))
+                else:
+                    parent.substmts.append(stmt)
+                    self.stack.append(('stmt', stmt, attrs))
+
+    def start_top(self, ns, local_name, attrs, pos):
+        if ns != yin_namespace:
+            error.err_add(self.ctx.errors, pos,
+                          'MODULE_NOT_IMPORTED', ns)
+            self.stack.append(('skip',))
+            return
+        stmt = self.new_statement(None, local_name, attrs, pos)
+        if stmt is None:
+            self.stack.append(('skip',))
+            return
+        self.top = stmt
+        self.pos.top = stmt
+        self.stack.append(('stmt', stmt, attrs))
+        if stmt.keyword == 'module':
+            # the imports of this module, to detect circular imports
+            if not hasattr(self.ctx, 'yin_module_map'):
+                self.ctx.yin_module_map = {}
+            self.mymodules = self.ctx.yin_module_map.setdefault(stmt.arg, [])
+
+    def new_statement(self, parent, keywd, attrs, pos):
+        """Create the statement for the YIN element `keywd`, with its
+        argument from `attrs` if it is an attribute.
+
+        Return the statement or None if `keywd` is not a YANG keyword.
+        """
+        try:
+            (argname, arg_is_elem) = syntax.yin_map[keywd]
+        except KeyError:
+            error.err_add(self.ctx.errors, pos, 'UNKNOWN_KEYWORD', keywd)
+            return None
+        arg = None
+        if arg_is_elem is False:
+            arg = attrs.pop(argname, None)
+            if arg is None:
+                error.err_add(self.ctx.errors, pos,
+                              'MISSING_ARGUMENT_ATTRIBUTE', (argname, keywd))
+        return statements.new_statement(self.top, parent, pos, keywd, arg)
 
     def char_data(self, data):
         self.data += data
 
     def end_element(self, name):
         self.pos.line = self.lineno
-        e = self.element_stack[-1]
-        e.data = self.data
+        frame = self.stack.pop()
+        kind = frame[0]
+        if kind == 'stmt':
+            stmt = frame[1]
+            (argname, arg_is_elem) = syntax.yin_map[stmt.keyword]
+            if arg_is_elem is True and stmt.arg is None:
+                error.err_add(self.ctx.errors, stmt.pos,
+                              'MISSING_ARGUMENT_ELEMENT',
+                              (argname, stmt.keyword))
+            self.check_attr(stmt.pos, frame[2])
+            if stmt.parent is self.top and stmt.parent is not None:
+                self.end_header_stmt(stmt)
+        elif kind == 'arg':
+            if self.ctx.trim_yin:
+                frame[1].arg = "\n".join([x.strip() for x in
+                                          self.data.strip().splitlines()])
+            else:
+                frame[1].arg = self.data
+        elif kind == 'ext':
+            frame[1].data = self.data
         self.data = ''
-        # end of statement, pop from stack
-        del self.element_stack[-1]
 
-    # Builds the statement tree
+    def end_header_stmt(self, stmt):
+        # To find an extension <smi:oid> we need to find the module
+        # that corresponds to 'smi'.  We get extension's URI from expat,
+        # so we need a map from URI -> module.  This works for
+        # imported modules, but for extensions defined in the local
+        # module we have to check if the extension's URI is
+        # the local URI.
+        #
+        # If we're a submodule, we need to find our module's
+        # namespace, so we need to parse the module :(
+        keywd = stmt.keyword
+        if self.top.keyword not in ('module', 'submodule'):
+            return
+        if keywd in ('namespace', 'prefix', 'belongs-to'):
+            # only the first one is used
+            if keywd in self.header_seen:
+                return
+            self.header_seen.add(keywd)
+        if keywd == 'namespace' and self.top.keyword == 'module':
+            self.uri = stmt.arg
+            if 'prefix' in self.header_seen:
+                self.prefixmap[self.uri] = self.prefix
+        elif keywd == 'prefix' and self.top.keyword == 'module':
+            self.prefix = stmt.arg
+            self.prefixmap[self.uri] = self.prefix
+        elif keywd == 'belongs-to' and self.top.keyword == 'submodule':
+            self.find_module_uri(stmt)
+        elif keywd == 'import':
+            self.add_import(stmt)
+        elif keywd == 'include' and 'no_include' not in self.extra:
+            if stmt.arg is not None:
+                mod = self.ctx.search_module(stmt.pos, stmt.arg)
+                if mod is not None:
+                    self.included.append(mod)
+        elif keywd == 'extension':
+            self.add_extension(stmt)
+
+    def find_module_uri(self, belongs_to):
+        # read the parent module in order to find the namespace uri
+        modname = belongs_to.arg
+        res = self.ctx.read_module(modname, extra={'no_include':True,
+                                                   'no_extensions':True,
+                                                   'header_only':True})
+        if not res:
+            pass
+        elif res == 'not_found':
+            error.err_add(self.ctx.errors, belongs_to.pos,
+                          'MODULE_NOT_FOUND', modname)
+        elif isinstance(res, tuple) and res[0] == 'read_error':
+            error.err_add(self.ctx.errors, belongs_to.pos, 'READ_ERROR',
+                          res[1])
+        else:
+            namespace = res.search_one('namespace')
+            if namespace is None or namespace.arg is None:
+                pass
+            else:
+                # success - save our uri
+                self.uri = namespace.arg
+
+    def add_import(self, stmt):
+        # add the imported module to the context, and to the nsmap
+        modname = stmt.arg
+        if modname is None:
+            return
+        if modname in self.mymodules:
+            # circular import; ignore here and detect in validation
+            return
+        self.mymodules.append(modname)
+        mod = self.ctx.search_module(stmt.pos, modname)
+        if mod is None:
+            return
+        ns = mod.search_one('namespace')
+        if ns is not None and ns.arg is not None:
+            # record the uri->mod mapping
+            self.nsmap[ns.arg] = mod
+            # also record uri->prefix, where prefix
+            # is the *yang* prefix, *not* the XML prefix
+            # (it can be different in theory...)
+            p = stmt.search_one('prefix')
+            if p is not None and p.arg is not None:
+                self.prefixmap[ns.arg] = p.arg
+
+    def add_extension(self, stmt):
+        # record an extension defined locally
+        extname = stmt.arg
+        if extname is None:
+            return
+        arg = stmt.search_one('argument')
+        if arg is None:
+            self.extensions[extname] = (None, None)
+            return
+        argname = arg.arg
+        if argname is None:
+            return
+        arg_is_elem = arg.search_one('yin-element')
+        if arg_is_elem is None:
+            self.extensions[extname] = (False, argname)
+        elif arg_is_elem.arg == 'false':
+            self.extensions[extname] = (False, argname)
+        elif arg_is_elem.arg == 'true':
+            self.extensions[extname] = (True, argname)
+
+    # Builds the statement tree of an extension statement
 
     def create_statement(self, e, parent):
+        """Create the statement for the Element `e` in an extension
+        statement, and its substatements.
+
+        Return the statement or None if it cannot be created."""
         if e.ns == yin_namespace:
             keywd = e.local_name
             try:
@@ -205,14 +430,12 @@ class YinParser(object):
 
         self.check_attr(e.pos, e.attrs)
 
-        if parent is not None:
-            stmt = statements.new_statement(self.top, parent, e.pos, keywd, arg)
-            parent.substmts.append(stmt)
-        else:
-            stmt = self.top
-
+        stmt = statements.new_statement(self.top, parent, e.pos, keywd, arg)
         for ch in e.children:
-            self.create_statement(ch, stmt)
+            substmt = self.create_statement(ch, stmt)
+            if substmt is not None:
+                stmt.substmts.append(substmt)
+        return stmt
 
     def check_attr(self, pos, attrs):
         """Check for unknown attributes."""
@@ -229,115 +452,6 @@ class YinParser(object):
             # FIXME: hmm... is this the right thing to do?
             # these things are supposed to be handled with extensions...
 
-    def look_ahead(self):
-        # To find an extension <smi:oid> we need to find the module
-        # that corresponds to 'smi'.  We get extension's URI from expat,
-        # so we need a map from URI -> module.  This works for
-        # imported modules, but for extensions defined in the local
-        # module we have to check if the extension's URI is
-        # the local URI.
-        #
-        # If we're a submodule, we need to find our module's
-        # namespace, so we need to parse the module :(
-
-        # 1.  find our own namespace URI
-        if self.top_element.local_name == 'module':
-            p = self.top_element.find_child(yin_namespace, 'namespace')
-            if p is not None:
-                self.uri = p.find_attribute('uri')
-            p = self.top_element.find_child(yin_namespace, 'prefix')
-            if p is not None:
-                self.prefixmap[self.uri] = p.find_attribute('value')
-        elif self.top_element.local_name == 'submodule':
-            p = self.top_element.find_child(yin_namespace, 'belongs-to')
-            modname = p.find_attribute('module')
-            # read the parent module in order to find the namespace uri
-            res = self.ctx.read_module(modname, extra={'no_include':True,
-                                                       'no_extensions':True})
-            if not res:
-                pass
-            elif res == 'not_found':
-                error.err_add(self.ctx.errors, p.pos,
-                              'MODULE_NOT_FOUND', modname)
-            elif isinstance(res, tuple) and res[0] == 'read_error':
-                error.err_add(self.ctx.errors, p.pos, 'READ_ERROR', res[1])
-            else:
-                namespace = res.search_one('namespace')
-                if namespace is None or namespace.arg is None:
-                    pass
-                else:
-                    # success - save our uri
-                    self.uri = namespace.arg
-        else:
-            return
-
-        # 2.  read all imports and includes and add the modules to the context
-        #     and to the nsmap.
-        if not hasattr(self.ctx, 'yin_module_map'):
-            self.ctx.yin_module_map = {}
-
-        if self.top.keyword == 'module':
-            if self.top.arg not in self.ctx.yin_module_map:
-                self.ctx.yin_module_map[self.top.arg] = []
-            mymodules = self.ctx.yin_module_map[self.top.arg]
-        else:
-            mymodules = []
-
-        for ch in self.top_element.children:
-            if ch.ns == yin_namespace and ch.local_name == 'import':
-                modname = ch.find_attribute('module')
-                if modname is not None:
-                    if modname in mymodules:
-                        # circular import; ignore here and detect in validation
-                        pass
-                    else:
-                        mymodules.append(modname)
-                        mod = self.ctx.search_module(ch.pos, modname)
-                        if mod is not None:
-                            ns = mod.search_one('namespace')
-                            if ns is not None and ns.arg is not None:
-                                # record the uri->mod mapping
-                                self.nsmap[ns.arg] = mod
-                                # also record uri->prefix, where prefix
-                                # is the *yang* prefix, *not* the XML prefix
-                                # (it can be different in theory...)
-                                p = ch.find_child(yin_namespace, 'prefix')
-                                if p is not None:
-                                    prefix = p.find_attribute('value')
-                                    if prefix is not None:
-                                        self.prefixmap[ns.arg] = prefix
-
-            elif (ch.ns == yin_namespace and ch.local_name == 'include' and
-                  'no_include' not in self.extra):
-                modname = ch.find_attribute('module')
-                if modname is not None:
-                    mod = self.ctx.search_module(ch.pos, modname)
-                    if mod is not None:
-                        self.included.append(mod)
-
-        # 3.  find all extensions defined locally
-        for ch in self.top_element.children:
-            if ch.ns == yin_namespace and ch.local_name == 'extension':
-                extname = ch.find_attribute('name')
-                if extname is None:
-                    continue
-                arg = ch.find_child(yin_namespace, 'argument')
-                if arg is None:
-                    self.extensions[extname] = (None, None)
-                else:
-                    argname = arg.find_attribute('name')
-                    if argname is None:
-                        continue
-                    arg_is_elem = arg.find_child(yin_namespace, 'yin-element')
-                    if arg_is_elem is None:
-                        self.extensions[extname] = (False, argname)
-                        continue
-                    val = arg_is_elem.find_attribute('value')
-                    if val == 'false':
-                        self.extensions[extname] = (False, argname)
-                    elif val == 'true':
-                        self.extensions[extname] = (True, argname)
-
     def find_extension(self, uri, extname):
         def find_in_mod(mod):
             ext = self.search_definition(mod, 'extension', extname)
@@ -80,6 +80,7 @@ setup(name='pyang',
               'pyang = pyang.scripts.pyang_tool:run',
               'yang2html = pyang.scripts.yang2html:run',
               'json2xml = pyang.scripts.json2xml:main',
+              'xml2json = pyang.scripts.xml2json:main',
           ]
       },
       packages=['pyang', 'pyang.plugins', 'pyang.scripts', 'pyang.translators', 'pyang.transforms'],
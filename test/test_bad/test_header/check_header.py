@@ -0,0 +1,47 @@
+"""Compare YangParser.parse_header() with a full parse of each module.
+
+For each file, print whether only the header was parsed, or the whole
+module, and the header statements, or the errors reported.
+"""
+
+import sys
+
+from pyang import context
+from pyang import repository
+from pyang import yang_parser
+
+def new_context():
+    return context.Context(repository.FileRepository(use_env=False))
+
+def tree(stmt):
+    return (stmt.keyword, stmt.arg, [tree(s) for s in stmt.substmts])
+
+def errors(ctx):
+    return ['%s: %s' % (pos, tag) for pos, tag, _args in ctx.errors]
+
+exit_code = 0
+for filename in sys.argv[1:]:
+    with open(filename, encoding='utf-8') as fd:
+        text = fd.read()
+    ctx = new_context()
+    header = yang_parser.YangParser({'header_only': True}).parse(
+        ctx, filename, text)
+    full_ctx = new_context()
+    full = yang_parser.YangParser().parse(full_ctx, filename, text)
+    if header is not None and getattr(header, 'is_header_only', False):
+        print('%s: header' % filename)
+        expected = [tree(s) for s in full.substmts
+                    if s.keyword in yang_parser.header_keywords]
+        if [tree(s) for s in header.substmts] != expected or ctx.errors:
+            print('  differs from the full parse')
+            exit_code = 1
+        for s in header.substmts:
+            print('  %s %s' % (s.keyword, s.arg))
+    else:
+        print('%s: full' % filename)
+        if errors(ctx) != errors(full_ctx):
+            print('  differs from the full parse')
+            exit_code = 1
+        for e in errors(ctx):
+            print('  %s' % e)
+sys.exit(exit_code)
@@ -0,0 +1,83 @@
+"""Validate instances with dsdl.Schemas for the data, config and
+get-reply targets of the ll-* modules.
+
+The good instances are the ones validated by yang2dsdl in this
+directory, ll-<module>-<target>.xml; each bad instance must give an
+error which contains the expected text, from RELAX NG or from
+Schematron.
+"""
+
+import glob
+import re
+import sys
+
+from lxml import etree
+
+from pyang import context
+from pyang import dsdl
+from pyang import repository
+
+nc = 'xmlns:nc="urn:ietf:params:xml:ns:netconf:base:1.0"'
+le = 'xmlns="http://example.com/ll/leaf"'
+
+# (module, target, name, instance, expected text of an error or None)
+cases = []
+# the ll-2mod-* instances are for two modules, and are not matched
+for target in ('data', 'config', 'get-reply'):
+    for filename in sorted(glob.glob('ll-*-%s.xml' % target)):
+        m = re.match(r'(ll-[a-z]+)-%s\.xml$' % target, filename)
+        if m is not None:
+            cases.append((m.group(1), target, filename, filename, None))
+cases += [
+    ('ll-leaf', 'data', 'missing mandatory choice',
+     '<nc:data %s %s><leaf-2>2.71</leaf-2></nc:data>' % (nc, le),
+     'mandatory choice "dummy"'),
+    ('ll-leaf', 'data', 'value out of range',
+     '<nc:data %s %s><leaf-2>4.00</leaf-2><seznam><clef>1</clef></seznam>'
+     '</nc:data>' % (nc, le),
+     'Element data failed to validate content'),
+    ('ll-leaf', 'config', 'state data',
+     '<nc:config %s %s><leaf-2>2.71</leaf-2><seznam><clef>1</clef></seznam>'
+     '</nc:config>' % (nc, le),
+     'Element config failed to validate content'),
+    # the default of leaf-1 is added by DSRL, and fails the must
+    ('ll-leaf', 'config', 'must with a default value',
+     '<nc:config %s %s xmlns:le="http://example.com/ll/leaf">'
+     '<leaf-2>3.10</leaf-2><pointer>/le:leaf-1</pointer>'
+     '</nc:config>' % (nc, le),
+     'Failed assert'),
+    ('ll-leaf', 'get-reply', 'duplicate key',
+     '<nc:rpc-reply message-id="1" %s><nc:data %s><leaf-2>2.71</leaf-2>'
+     '<seznam><clef>1</clef></seznam><seznam><clef>1</clef></seznam>'
+     '</nc:data></nc:rpc-reply>' % (nc, le),
+     'Duplicate key'),
+]
+
+ctx = context.Context(repository.FileRepository('.', use_env=False))
+ctx.trim_yin = False
+modules = {}
+for modname in set(case[0] for case in cases):
+    filename = modname + '.yin'
+    with open(filename, encoding='utf-8') as fd:
+        modules[modname] = ctx.add_module(filename, fd.read())
+ctx.validate()
+
+exit_code = 0
+schemas = {}
+for modname, target, name, instance, expected in cases:
+    if (modname, target) not in schemas:
+        schemas[modname, target] = dsdl.Schemas.from_modules(
+            ctx, [modules[modname]], target)
+    if instance.startswith('<'):
+        instance = etree.ElementTree(etree.fromstring(instance))
+    msgs = schemas[modname, target].validate(instance)
+    if expected is None:
+        ok = msgs == []
+    else:
+        ok = any(expected in msg for msg in msgs)
+    print('%s %s: %s' % (target, name, 'ok' if ok else 'FAIL'))
+    if not ok:
+        for msg in msgs:
+            print('  ' + msg)
+        exit_code = 1
+sys.exit(exit_code)
@@ -0,0 +1,20 @@
+#! /usr/bin/env python
+
+# This program compares two XML files given as parameters, after
+# canonicalization
+
+import sys
+from lxml import etree
+
+if len(sys.argv) != 3:
+    sys.stderr.write("Usage: cmpxml.py xml_file_1 xml_file_2\n")
+    sys.exit(1)
+
+a = etree.tostring(etree.parse(sys.argv[1]), method="c14n")
+b = etree.tostring(etree.parse(sys.argv[2]), method="c14n")
+
+if a != b:
+    sys.stderr.write("XML documents from %s and %s differ.\n" % tuple(sys.argv[1:3]))
+    sys.exit(2)
+
+sys.exit(0)
@@ -0,0 +1,49 @@
+"""Compare the tree from emit_yin_tree() with the output of emit_yin().
+
+This is done for the given modules, and for the modules and submodules
+they import and include.  The output of emit_yin() is parsed without
+the whitespace for indentation, and the canonical XML of the two trees
+must be the same, with and without --yin-canonical.  The tree built
+with --yin-pretty-strings must be the same as without it.
+"""
+
+import io
+import optparse
+import sys
+
+from lxml import etree
+
+from pyang import context
+from pyang import repository
+from pyang.translators import yin
+
+ctx = context.Context(repository.FileRepository('.', use_env=False))
+ctx.trim_yin = False
+for filename in sys.argv[1:]:
+    # as in pyang_tool.py
+    ctx.yin_module_map = {}
+    with open(filename, encoding='utf-8') as fd:
+        ctx.add_module(filename, fd.read(), primary_module=True)
+ctx.validate()
+exit_code = 0
+for pos, tag, _args in ctx.errors:
+    print('%s: %s' % (pos, tag))
+    exit_code = 1
+
+parser = etree.XMLParser(remove_blank_text=True)
+for canonical, pretty in ((False, False), (True, False), (False, True)):
+    for (name, _rev), module in sorted(ctx.modules.items()):
+        ctx.opts = optparse.Values({'yin_canonical': canonical,
+                                    'yin_pretty_strings': False})
+        fd = io.StringIO()
+        yin.emit_yin(ctx, module, fd)
+        expected = etree.fromstring(fd.getvalue().encode('utf-8'), parser)
+        ctx.opts.yin_pretty_strings = pretty
+        tree = yin.emit_yin_tree(ctx, module)
+        if (etree.tostring(tree, method='c14n') !=
+            etree.tostring(expected, method='c14n')):
+            print('%s%s%s: differs' %
+                  (name, ' (canonical)' if canonical else '',
+                   ' (pretty strings)' if pretty else ''))
+            exit_code = 1
+sys.exit(exit_code)